@@ -1,7 +1,24 @@
+"""
+Application Celery du projet.
+
+Files (routage dans settings.CELERY_TASK_ROUTES) :
+    email          e-mails transactionnels (réinitialisation, identifiants), prioritaires
+    notifications  envois groupés des notifications
+    reports        rapports lourds
+    default        maintenance (purges)
+
+Un worker par famille, pour qu'un rapport ne retarde jamais un e-mail de réinitialisation :
+    celery -A school worker -Q email -c 2 --prefetch-multiplier 1
+    celery -A school worker -Q notifications,default -c 4
+    celery -A school worker -Q reports -c 1 --max-tasks-per-child 50
+    celery -A school beat
+"""
 import os
+
 from celery import Celery
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecole.settings')
-app = Celery('ecole')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school.settings')
+
+app = Celery('school')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
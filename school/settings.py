@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from django.utils.translation import gettext_lazy as _
 from decouple import config
+from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,10 +28,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = config('DEBUG')
+DEBUG = config('DEBUG', default=False, cast=bool)
 
-ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1').split(',')  # Par
-ALLOWED_HOSTS=[]
+ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1').split(',')  # Un hôte par école en multi-écoles
 
 # Application definition
 
@@ -47,11 +48,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'schoolcopal.middleware.QueryProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware', 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'schoolcopal.middleware.TenantMiddleware',
+    'schoolcopal.middleware.RoleProfileMiddleware',
+    'schoolcopal.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,6 +94,72 @@ DATABASES = {
 }
 
 
+# Cache partagé par tous les workers : Redis (déjà requis par Celery) par défaut
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.redis.RedisCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='redis://localhost:6379/1'),
+    }
+}
+# Un cache en mémoire locale est propre à chaque processus : une invalidation (déconnexion,
+# mot de passe, désactivation) n'atteindrait pas les autres workers
+SHARED_CACHE = CACHE_BACKEND.rsplit('.', 1)[-1] not in ('LocMemCache', 'DummyCache')
+
+# Sessions lues depuis le cache (écrites aussi en base) si le cache est partagé, sinon en base seule
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + ('cached_db' if SHARED_CACHE else 'db')
+
+# Utilisateur authentifié (et profil Enseignant) mis en cache, invalidé par signaux ; 0 : pas de cache
+AUTHENTICATION_BACKENDS = ['schoolcopal.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=300 if SHARED_CACHE else 0, cast=int)
+
+# École courante résolue par hôte ou par utilisateur, mise en cache (schoolcopal/tenancy.py)
+TENANT_CACHE_TIMEOUT = config('TENANT_CACHE_TIMEOUT', default=600, cast=int)
+
+# Totaux des listes paginées par curseur, mis en cache (schoolcopal/pagination.py)
+PAGINATION_COUNT_TIMEOUT = config('PAGINATION_COUNT_TIMEOUT', default=60, cast=int)
+
+# Réponses des endpoints d'autocomplétion (schoolcopal/views/autocomplete), en secondes
+AUTOCOMPLETE_CACHE_TIMEOUT = config('AUTOCOMPLETE_CACHE_TIMEOUT', default=30, cast=int)
+
+# Choix des filtres latéraux de l'admin Django (schoolcopal/admin.py), en secondes
+ADMIN_FILTER_CACHE_TIMEOUT = config('ADMIN_FILTER_CACHE_TIMEOUT', default=300, cast=int)
+
+# Validité de la version des index d'occupation des emplois du temps (schoolcopal/timetable.py)
+TIMETABLE_INDEX_TIMEOUT = config('TIMETABLE_INDEX_TIMEOUT', default=86400, cast=int)
+
+# Rétention des lignes supprimées logiquement avant compactage, en jours, par modèle
+# (schoolcopal/compaction.py, commande compact_tombstones)
+TOMBSTONE_RETENTION = {
+    'default': config('TOMBSTONE_RETENTION_DAYS', default=90, cast=int),
+    'schoolcopal.note': config('TOMBSTONE_RETENTION_NOTE_DAYS', default=365, cast=int),
+    'schoolcopal.paiement': config('TOMBSTONE_RETENTION_PAIEMENT_DAYS', default=3650, cast=int),
+}
+# Dossier d'export JSON Lines des lignes compactées (vide : pas d'export)
+TOMBSTONE_EXPORT_DIR = config('TOMBSTONE_EXPORT_DIR', default='')
+
+# Tentatives permises par IP et par identifiant : {scope: (tentatives, fenêtre en secondes)}
+# (schoolcopal/ratelimit.py)
+RATE_LIMITS = {
+    'login': (config('RATE_LIMIT_LOGIN', default=10, cast=int), 300),
+    'password_reset': (config('RATE_LIMIT_PASSWORD_RESET', default=5, cast=int), 3600),
+    'password_reset_code': (config('RATE_LIMIT_PASSWORD_RESET_CODE', default=10, cast=int), 900),
+}
+# Proxys de confiance (adresses ou réseaux, ex. 10.0.0.0/8) : derrière eux, l'IP du client est lue
+# dans X-Forwarded-For (schoolcopal/ratelimit.py) ; vide : REMOTE_ADDR seulement
+TRUSTED_PROXIES = [proxy.strip() for proxy in config('TRUSTED_PROXIES', default='').split(',') if proxy.strip()]
+
+
+# Profilage SQL par vue (schoolcopal/profiling.py), désactivé par défaut
+QUERY_PROFILING = config('QUERY_PROFILING', default=False, cast=bool)
+QUERY_PROFILING_WINDOW = 200  # Nombre de mesures conservées par vue
+# Budgets de requêtes par nom d'URL ; dépassement journalisé, ou exception si QUERY_BUDGET_STRICT
+QUERY_BUDGETS = {}
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -164,10 +235,66 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')  # Set in env vars
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')  # Use app password for Gmail
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
 
-# Celery configuration for background tasks (email/SMS sending)
+# Celery configuration for background tasks (email/SMS sending), see school/celery.py
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'UTC'
\ No newline at end of file
+CELERY_TIMEZONE = 'UTC'
+# Exécution immédiate dans le processus (développement sans broker)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+
+# Tâches « fire and forget » : aucun résultat stocké (une tâche peut le réactiver)
+CELERY_TASK_IGNORE_RESULT = True
+# Un worker ne réserve qu'une tâche à la fois : une tâche longue ne bloque pas les suivantes
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = [
+    Queue('email', routing_key='email'),
+    Queue('notifications', routing_key='notifications'),
+    Queue('reports', routing_key='reports'),
+    Queue('default', routing_key='default'),
+]
+# Priorités au sein d'une file (Redis : 0 = la plus haute)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_ROUTES = {
+    'schoolcopal.tasks.send_transactional_email': {'queue': 'email', 'priority': 0},
+    'schoolcopal.tasks.send_reset_code_email': {'queue': 'email', 'priority': 0},
+    'schoolcopal.tasks.send_credentials_email': {'queue': 'email', 'priority': 3},
+    'schoolcopal.tasks.send_pending_notifications': {'queue': 'notifications', 'priority': 5},
+    'schoolcopal.tasks.generate_school_report*': {'queue': 'reports', 'priority': 9},
+    'schoolcopal.tasks.purge_expired_reset_codes': {'queue': 'default', 'priority': 9},
+    'schoolcopal.tasks.compact_tombstones': {'queue': 'reports', 'priority': 9},
+    'schoolcopal.tasks.snapshot_tendances*': {'queue': 'reports', 'priority': 9},
+}
+
+# Tâches périodiques (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-reset-codes': {
+        'task': 'schoolcopal.tasks.purge_expired_reset_codes',
+        'schedule': 3600,
+    },
+    'send-pending-notifications': {
+        'task': 'schoolcopal.tasks.send_pending_notifications',
+        'schedule': 300,
+    },
+    'generate-school-reports': {
+        'task': 'schoolcopal.tasks.generate_school_reports',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'compact-tombstones': {
+        'task': 'schoolcopal.tasks.compact_tombstones',
+        'schedule': crontab(hour=3, minute=0, day_of_week='sunday'),
+    },
+    'snapshot-tendances': {
+        'task': 'schoolcopal.tasks.snapshot_tendances',
+        'schedule': crontab(hour=1, minute=30),
+    },
+}
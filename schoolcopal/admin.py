@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from . import audit, effectifs, search
+from .pagination import CachedCountPaginator
 from .models import (
-    User, Ecole, ClasseScolaire, Eleve, Enseignant,
-    Frequence, Note, Paiement, EmploiDuTemps, Notification, Matiere
+    User, Ecole, AnneeScolaire, ClasseScolaire, Eleve, Enseignant,
+    Frequence, Note, Paiement, EmploiDuTemps, Notification, Matiere, AuditLog, Tendance
 )
 
 # ============================
@@ -14,7 +19,90 @@ from .models import (
 @admin.action(description=_("Marquer comme supprimé (soft delete)"))
 def mark_as_deleted(modeladmin, request, queryset):
     """Action admin pour soft delete en masse."""
-    queryset.update(deleted_at=timezone.now())
+    # update() contourne Eleve.save : effectifs recalculés pour les écoles concernées
+    ecoles = list(queryset.values_list('ecole_id', flat=True).distinct()) if queryset.model is Eleve else []
+    now = timezone.now()
+    with transaction.atomic():
+        # update() contourne aussi les signaux du journal d'audit
+        audit.soft_deleted(queryset, now, request.user)
+        queryset.filter(deleted_at__isnull=True).update(deleted_at=now)
+    if ecoles:
+        effectifs.recompter(Ecole.objects.filter(pk__in=ecoles))
+
+
+class IndexedSearchMixin:
+    """
+    Recherche via l'index (schoolcopal/search.py) au lieu des icontains de search_fields :
+    search_kind est le type d'entrée, search_lookup le champ comparé à son object_id.
+    """
+    search_kind = None
+    search_lookup = 'pk'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(**{f"{self.search_lookup}__in": search.object_ids(search_term, self.search_kind)}), False
+
+
+# ============================
+# CHANGELISTS SUR DE GRANDES TABLES
+# ============================
+
+def cached_filter_choices(key, compute):
+    """Choix d'un filtre latéral, recalculés au plus toutes les ADMIN_FILTER_CACHE_TIMEOUT secondes."""
+    return cache.get_or_set(f"admin-filter:{key}", compute, settings.ADMIN_FILTER_CACHE_TIMEOUT)
+
+
+class CachedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """Filtre sur une relation : choix lus dans la (petite) table liée, mis en cache."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        target = field.remote_field.model
+        return cached_filter_choices(
+            f"{target._meta.label}:{','.join(ordering)}",
+            lambda: [
+                (obj.pk, str(obj))
+                for obj in target._default_manager.filter(deleted_at__isnull=True).order_by(*ordering or ['pk'])
+            ],
+        )
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """
+    Valeurs distinctes d'un champ lues dans la table qui le porte (ex. Matiere.nom pour
+    matiere__nom), et non par jointure sur toute la table de l'admin, puis mises en cache.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        source = field.model
+        self.lookup_choices = cached_filter_choices(
+            f"{source._meta.label}.{field.name}",
+            lambda: list(
+                source._default_manager.filter(deleted_at__isnull=True)
+                .order_by(field.name).values_list(field.name, flat=True).distinct()
+            ),
+        )
+
+
+class ScalableAdminMixin:
+    """
+    Base des admins de l'application, tenable sur des tables de plusieurs millions de lignes :
+    pas de COUNT(*) de la table entière, total de la page mis en cache (CachedCountPaginator),
+    objets supprimés exclus. Les jointures de la changelist passent par list_select_related
+    et les filtres coûteux par les filtres en cache ci-dessus.
+    """
+    show_full_result_count = False
+    paginator = CachedCountPaginator
+    actions = [mark_as_deleted]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+
+class ScalableModelAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    pass
 
 
 # ============================
@@ -22,7 +110,7 @@ def mark_as_deleted(modeladmin, request, queryset):
 # ============================
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     """Admin pour User (tous rôles : admin, enseignant, parent, directeur)."""
 
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -34,13 +122,19 @@ class UserAdmin(BaseUserAdmin):
     )
 
     list_display = ['username', 'role', 'email', 'telephone', 'created_at', 'is_active']
-    list_filter = ['role', 'is_staff', 'is_superuser']
+    list_filter = ['role', 'is_staff', 'is_superuser', ('ecole', CachedRelatedFieldListFilter)]
     search_fields = ['username', 'email', 'telephone']
-    actions = [mark_as_deleted]
     list_per_page = 25
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True)
+    def get_search_results(self, request, queryset, search_term):
+        # Parents et enseignants par l'index ; les autres rôles (peu nombreux) par search_fields
+        if not search_term:
+            return queryset, False
+        indexes = search.search(search_term, kinds=search.INDEXED_ROLES).values('object_id')
+        autres, may_have_duplicates = super().get_search_results(
+            request, queryset.exclude(role__in=search.INDEXED_ROLES), search_term
+        )
+        return queryset.filter(pk__in=indexes) | autres, may_have_duplicates
 
 
 # ============================
@@ -48,16 +142,28 @@ class UserAdmin(BaseUserAdmin):
 # ============================
 
 @admin.register(Ecole)
-class EcoleAdmin(admin.ModelAdmin):
+class EcoleAdmin(ScalableModelAdmin):
     """Admin pour Ecole."""
     list_display = ['nom', 'type', 'adresse', 'nombre_classes', 'created_at', 'is_active']
     list_filter = ['type']
     search_fields = ['nom', 'adresse']
-    actions = [mark_as_deleted]
     list_per_page = 10
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+# ============================
+# ANNEE SCOLAIRE
+# ============================
+
+@admin.register(AnneeScolaire)
+class AnneeScolaireAdmin(ScalableModelAdmin):
+    """Admin pour AnneeScolaire (archivage : commande archive_annees)."""
+    list_display = ['libelle', 'ecole', 'debut', 'fin', 'active', 'cloturee', 'archivee_le']
+    list_filter = ['active', 'cloturee', ('ecole', CachedRelatedFieldListFilter)]
+    list_select_related = ['ecole']
+    search_fields = ['libelle']
+    autocomplete_fields = ['ecole']
+    readonly_fields = ['archivee_le']
+    list_per_page = 25
 
 
 # ============================
@@ -65,57 +171,51 @@ class EcoleAdmin(admin.ModelAdmin):
 # ============================
 
 @admin.register(Matiere)
-class MatiereAdmin(admin.ModelAdmin):
+class MatiereAdmin(ScalableModelAdmin):
     """Admin pour Matiere."""
     list_display = ['nom', 'classe', 'created_at', 'is_active']
-    list_filter = ['classe__niveau', 'classe__ecole__nom']
+    list_filter = ['classe__niveau', ('classe__ecole', CachedRelatedFieldListFilter)]
+    list_select_related = ['classe']
     search_fields = ['nom', 'classe__niveau']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['classe']
     list_per_page = 25
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('classe__ecole')
-
 
 # ============================
 # CLASSE
 # ============================
 
 @admin.register(ClasseScolaire)
-class ClasseScolaireAdmin(admin.ModelAdmin):
+class ClasseScolaireAdmin(ScalableModelAdmin):
     """Admin pour ClasseScolaire."""
     list_display = ['niveau', 'section', 'capacite', 'enseignant', 'ecole', 'created_at', 'is_active']
-    list_filter = ['niveau', 'ecole__nom']
+    list_filter = ['niveau', ('ecole', CachedRelatedFieldListFilter)]
+    list_select_related = ['ecole', 'enseignant__user']
     search_fields = ['niveau', 'section', 'enseignant__user__username']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['ecole']
     list_per_page = 25
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('ecole', 'enseignant')
-
 
 # ============================
 # ELEVE
 # ============================
 
 @admin.register(Eleve)
-class EleveAdmin(admin.ModelAdmin):
+class EleveAdmin(IndexedSearchMixin, ScalableModelAdmin):
     """Admin pour Eleve."""
+    search_kind = 'eleve'
     list_display = ['prenom', 'nom', 'age', 'sexe', 'classe', 'parent_id', 'get_ecole', 'created_at', 'is_active']
-    list_filter = ['sexe', 'classe__niveau', 'classe__ecole__nom', 'parent_id__username']
+    # Le filtre par parent (une entrée par parent) est remplacé par la recherche indexée
+    list_filter = ['sexe', 'classe__niveau', ('ecole', CachedRelatedFieldListFilter)]
+    list_select_related = ['classe', 'parent_id', 'ecole']
     search_fields = ['nom', 'prenom', 'parent_id__username']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['ecole', 'classe', 'parent_id']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True)\
-            .select_related('classe', 'parent_id')\
-            .prefetch_related('classe__ecole')
-
     def get_ecole(self, obj):
-        return obj.classe.ecole.nom if obj.classe and obj.classe.ecole else _("Non assigné")
+        return obj.ecole.nom if obj.ecole_id else _("Non assigné")
     get_ecole.short_description = _("École")
-    get_ecole.admin_order_field = 'classe__ecole__nom'
+    get_ecole.admin_order_field = 'ecole__nom'
 
 
 # ============================
@@ -123,52 +223,48 @@ class EleveAdmin(admin.ModelAdmin):
 # ============================
 
 @admin.register(Enseignant)
-class EnseignantAdmin(admin.ModelAdmin):
+class EnseignantAdmin(IndexedSearchMixin, ScalableModelAdmin):
     """Admin pour Enseignant."""
+    search_kind = 'enseignant'
+    search_lookup = 'user_id'
     list_display = ['user', 'classe', 'salaire', 'created_at', 'is_active']
-    list_filter = ['classe__niveau', 'classe__ecole__nom']
+    list_filter = ['classe__niveau', ('ecole', CachedRelatedFieldListFilter)]
+    list_select_related = ['classe', 'user']
     search_fields = ['user__username', 'user__telephone', 'classe__niveau']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['user', 'classe', 'ecole']
     list_per_page = 25
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('classe', 'user')
-
 
 # ============================
 # FREQUENCE
 # ============================
 
 @admin.register(Frequence)
-class FrequenceAdmin(admin.ModelAdmin):
+class FrequenceAdmin(ScalableModelAdmin):
     """Admin pour Fréquence (présences)."""
     list_display = ['eleve', 'date', 'present', 'raison_absence', 'created_at', 'is_active']
-    list_filter = ['present', 'date', 'eleve__classe__niveau']
+    list_filter = ['present', 'eleve__classe__niveau']
+    list_select_related = ['eleve']
+    date_hierarchy = 'date'
     search_fields = ['eleve__nom', 'eleve__prenom', 'raison_absence']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['eleve']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('eleve__classe')
-
 
 # ============================
 # NOTE
 # ============================
 
 @admin.register(Note)
-class NoteAdmin(admin.ModelAdmin):
+class NoteAdmin(ScalableModelAdmin):
     """Admin pour Note."""
     list_display = ['eleve', 'get_matiere_nom', 'valeur', 'trimestre', 'enseignant', 'created_at', 'is_active']
-    list_filter = ['trimestre', 'matiere__nom', 'eleve__classe__niveau']
+    list_filter = ['trimestre', ('matiere__nom', CachedAllValuesFieldListFilter), 'eleve__classe__niveau']
+    list_select_related = ['eleve', 'matiere', 'enseignant__user', 'enseignant__classe']
     search_fields = ['eleve__nom', 'eleve__prenom', 'matiere__nom']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['eleve', 'matiere', 'enseignant']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True)\
-            .select_related('eleve', 'matiere', 'enseignant')
-
     def get_matiere_nom(self, obj):
         return obj.matiere.nom
     get_matiere_nom.short_description = _("Matière")
@@ -180,47 +276,96 @@ class NoteAdmin(admin.ModelAdmin):
 # ============================
 
 @admin.register(Paiement)
-class PaiementAdmin(admin.ModelAdmin):
+class PaiementAdmin(ScalableModelAdmin):
     """Admin pour Paiement."""
     list_display = ['eleve', 'montant', 'date_paiement', 'statut', 'mode', 'created_at', 'is_active']
-    list_filter = ['statut', 'mode', 'date_paiement']
+    list_filter = ['statut', 'mode']
+    list_select_related = ['eleve']
+    date_hierarchy = 'date_paiement'
     search_fields = ['eleve__nom', 'eleve__prenom']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['eleve']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('eleve')
-
 
 # ============================
 # EMPLOI DU TEMPS
 # ============================
 
 @admin.register(EmploiDuTemps)
-class EmploiDuTempsAdmin(admin.ModelAdmin):
+class EmploiDuTempsAdmin(ScalableModelAdmin):
     """Admin pour EmploiDuTemps."""
-    list_display = ['classe', 'jour', 'heure', 'salle', 'created_at', 'is_active']
+    list_display = ['classe', 'jour', 'heure', 'heure_fin', 'salle', 'matiere', 'created_at', 'is_active']
     list_filter = ['jour', 'classe__niveau']
+    list_select_related = ['classe', 'matiere__classe']
     search_fields = ['classe__niveau', 'salle']
-    actions = [mark_as_deleted]
+    autocomplete_fields = ['classe', 'matiere']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('classe')
-
 
 # ============================
 # NOTIFICATION
 # ============================
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ScalableModelAdmin):
     """Admin pour Notification."""
     list_display = ['destinataire', 'type', 'message', 'envoye', 'created_at', 'is_active']
-    list_filter = ['type', 'envoye', 'created_at']
+    list_filter = ['type', 'envoye']
+    list_select_related = ['destinataire']
+    date_hierarchy = 'created_at'
     search_fields = ['destinataire__username', 'message']
-    actions = [mark_as_deleted]
+    raw_id_fields = ['destinataire']
     list_per_page = 50
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).filter(deleted_at__isnull=True).select_related('destinataire')
+
+# ============================
+# JOURNAL D'AUDIT
+# ============================
+
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    """Admin pour AuditLog, en lecture seule."""
+    list_display = ['created_at', 'model', 'object_id', 'action', 'user']
+    list_filter = ['model', 'action']
+    list_select_related = ['user']
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+    paginator = CachedCountPaginator
+    raw_id_fields = ['user']
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        # Recherche par identifiant de l'objet (index model, object_id)
+        if search_term.strip().isdigit():
+            return queryset.filter(object_id=int(search_term)), False
+        return queryset, False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# ============================
+# TENDANCES
+# ============================
+
+@admin.register(Tendance)
+class TendanceAdmin(admin.ModelAdmin):
+    """Admin pour Tendance, en lecture seule (points recalculés chaque nuit)."""
+    list_display = ['ecole', 'indicateur', 'periode', 'rang', 'valeur', 'effectif', 'calcule_le']
+    list_filter = ['indicateur']
+    list_select_related = ['ecole']
+    date_hierarchy = 'periode'
+    raw_id_fields = ['ecole']
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SchoolcopalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schoolcopal'
+
+    def ready(self):
+        from . import ratelimit, signals  # noqa: F401 (contrôles système, signaux)
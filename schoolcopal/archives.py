@@ -0,0 +1,62 @@
+"""
+Archivage des années scolaires clôturées : les notes, présences et paiements de l'année
+passent, par lots, des tables courantes aux tables d'archive (NoteArchive…), qui gardent
+les mêmes identifiants et restent consultables en lecture seule (relevés, bulletins).
+Les tables courantes ne contiennent plus que l'année en cours et les années non archivées.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Frequence, FrequenceArchive, Note, NoteArchive, Paiement, PaiementArchive
+
+ARCHIVES = {
+    Note: NoteArchive,
+    Frequence: FrequenceArchive,
+    Paiement: PaiementArchive,
+}
+BATCH_SIZE = 2000
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def lignes(annee, model):
+    """Lignes de model pour cette année, lues dans l'archive si l'année est archivée."""
+    source = ARCHIVES[model] if annee.archivee_le else model
+    return source.objects.filter(annee=annee)
+
+
+def deplacer_lot(annee, model, batch_size=BATCH_SIZE):
+    """Copie dans l'archive puis retire de la table courante un lot de lignes ; renvoie sa taille."""
+    archive = ARCHIVES[model]
+    columns = [field.attname for field in archive._meta.concrete_fields]
+    with transaction.atomic():
+        rows = list(model.objects.filter(annee=annee).order_by('pk').values(*columns)[:batch_size])
+        if not rows:
+            return 0
+        archive.objects.bulk_create([archive(**row) for row in rows], ignore_conflicts=True)
+        # Suppression sans signaux ni chargement des objets : les lignes sont déplacées,
+        # pas supprimées (rien ne les référence par clé étrangère)
+        model.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(model.objects.db)
+    return len(rows)
+
+
+def archiver(annee, batch_size=BATCH_SIZE, progress=None):
+    """
+    Archive une année clôturée, lot par lot (une transaction par lot : l'opération peut
+    être interrompue puis reprise). Renvoie {modèle: lignes déplacées}.
+    """
+    if annee.active or not annee.cloturee:
+        raise ArchiveError(f"{annee} : seule une année clôturée peut être archivée.")
+    totals = {}
+    for model in ARCHIVES:
+        total = 0
+        while moved := deplacer_lot(annee, model, batch_size):
+            total += moved
+            if progress:
+                progress(model, total)
+        totals[model] = total
+    annee.archivee_le = timezone.now()
+    annee.save(update_fields=['archivee_le', 'updated_at'])
+    return totals
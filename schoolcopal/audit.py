@@ -0,0 +1,197 @@
+"""
+Journal d'audit des notes et des paiements (AuditLog), en ajout seul.
+
+Les signaux de modèle comparent chaque enregistrement aux valeurs chargées (post_init)
+et déposent les différences dans un tampon propre à la requête ou à la tâche Celery
+(AuditMiddleware, capture()) ; le tampon est écrit en un seul bulk_create à la fin.
+Hors de toute capture (shell, migrations), chaque entrée est écrite aussitôt : les
+suppressions en masse (compactage) doivent s'exécuter dans une capture.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery.signals import task_postrun, task_prerun
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import AuditLog, Note, Paiement
+
+# Champs suivis par modèle (attname : identifiants pour les clés étrangères)
+AUDITED = {
+    Note: ('eleve_id', 'matiere_id', 'valeur', 'trimestre', 'sequence', 'enseignant_id', 'deleted_at'),
+    Paiement: ('eleve_id', 'montant', 'date_paiement', 'statut', 'mode', 'deleted_at'),
+}
+BATCH_SIZE = 2000
+
+_buffer = ContextVar('audit_buffer', default=None)
+
+
+class Buffer:
+    """Entrées en attente et auteur (utilisateur ou fonction le renvoyant)."""
+
+    def __init__(self, user=None):
+        self.entries = []
+        self.user = user
+
+    def user_id(self):
+        user = self.user() if callable(self.user) else self.user
+        return user.pk if user is not None and user.is_authenticated else None
+
+    def flush(self):
+        entries, self.entries = nouvelles(self.entries), []
+        if not entries:
+            return []
+        user_id = self.user_id()
+        for entry in entries:
+            entry.user_id = user_id
+        return AuditLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+def nouvelles(entries):
+    """
+    Entrées sans les suppressions réelles de lignes dont la suppression logique est déjà
+    journalisée : une requête object_id__in par modèle et par lot, pas une par ligne.
+    """
+    tombstones = defaultdict(list)
+    for entry in entries:
+        if getattr(entry, 'tombstone', False):
+            tombstones[entry.model].append(entry.object_id)
+    if not tombstones:
+        return entries
+    journalisees = set()
+    for label, object_ids in tombstones.items():
+        for start in range(0, len(object_ids), BATCH_SIZE):
+            journalisees.update((label, object_id) for object_id in AuditLog.objects.filter(
+                model=label, action='delete', object_id__in=object_ids[start:start + BATCH_SIZE],
+            ).order_by().values_list('object_id', flat=True))
+    return [
+        entry for entry in entries
+        if not (getattr(entry, 'tombstone', False) and (entry.model, entry.object_id) in journalisees)
+    ]
+
+
+@contextmanager
+def capture(user=None):
+    """
+    Regroupe les entrées du bloc et les écrit en un seul bulk_create à la sortie.
+    Sans auteur et dans une capture déjà ouverte (requête, tâche), rejoint celle-ci.
+    """
+    outer = _buffer.get()
+    if outer is not None and user is None:
+        yield outer
+        return
+    buffer = Buffer(user)
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        buffer.flush()
+
+
+def record(instance, action, changes, tombstone=False):
+    entry = AuditLog(
+        model=instance._meta.label_lower, object_id=instance.pk, action=action, changes=changes,
+        created_at=timezone.now(),
+    )
+    entry.tombstone = tombstone
+    buffer = _buffer.get()
+    if buffer is None:
+        AuditLog.objects.bulk_create(nouvelles([entry]))
+    else:
+        buffer.entries.append(entry)
+
+
+def snapshot(instance):
+    """Valeurs suivies chargées sur l'instance, normalisées (un formulaire peut y laisser '1' pour 1)."""
+    meta = instance._meta
+    return {
+        attname: meta.get_field(attname).to_python(instance.__dict__[attname])
+        for attname in AUDITED[type(instance)] if attname in instance.__dict__
+    }
+
+
+def remember(sender, instance, **kwargs):
+    instance._audit_initial = snapshot(instance)
+
+
+def changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = snapshot(instance)
+    initial = {} if created else instance._audit_initial
+    changes = {
+        field: [initial.get(field), value]
+        for field, value in current.items()
+        if created or field in initial and initial[field] != value
+    }
+    instance._audit_initial = current
+    if not changes:
+        return
+    if created:
+        action = 'create'
+    elif initial.get('deleted_at') is None and current.get('deleted_at') is not None:
+        action = 'delete'  # suppression logique
+    else:
+        action = 'update'
+    record(instance, action, changes)
+
+
+def deleted(sender, instance, **kwargs):
+    # Ligne supprimée logiquement (compactage) : écartée à l'écriture si déjà journalisée
+    record(instance, 'delete', {field: [value, None] for field, value in snapshot(instance).items()},
+           tombstone=instance.deleted_at is not None)
+
+
+def soft_deleted(queryset, deleted_at, user=None):
+    """
+    Journalise la suppression logique en masse (queryset.update, sans signaux) des lignes
+    actives du queryset, en un seul bulk_create. À appeler avant l'update.
+    """
+    if queryset.model not in AUDITED:
+        return []
+    label = queryset.model._meta.label_lower
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    entries = [
+        AuditLog(model=label, object_id=pk, action='delete', changes={'deleted_at': [None, deleted_at]},
+                 user_id=user_id, created_at=deleted_at)
+        for pk in queryset.filter(deleted_at__isnull=True).values_list('pk', flat=True)
+    ]
+    return AuditLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+for model in AUDITED:
+    post_init.connect(remember, sender=model, dispatch_uid=f"audit-init-{model.__name__}")
+    post_save.connect(changed, sender=model, dispatch_uid=f"audit-save-{model.__name__}")
+    post_delete.connect(deleted, sender=model, dispatch_uid=f"audit-delete-{model.__name__}")
+
+
+class AuditMiddleware:
+    """Une capture par requête, attribuée à l'utilisateur connecté."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with capture(lambda: getattr(request, 'user', None)):
+            return self.get_response(request)
+
+
+# Une capture par tâche Celery
+_task_tokens = {}
+
+
+@task_prerun.connect
+def start_task_capture(task_id=None, **kwargs):
+    buffer = Buffer()
+    _task_tokens[task_id] = (buffer, _buffer.set(buffer))
+
+
+@task_postrun.connect
+def flush_task_capture(task_id=None, **kwargs):
+    if task_id not in _task_tokens:
+        return
+    buffer, token = _task_tokens.pop(task_id)
+    _buffer.reset(token)
+    buffer.flush()
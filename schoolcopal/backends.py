@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import User
+
+
+def user_cache_key(user_id):
+    """Clé de cache de l'utilisateur authentifié."""
+    return f"auth:user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """Supprime l'utilisateur (et son profil) du cache."""
+    if user_id is not None:
+        cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend qui met en cache l'utilisateur de la session.
+    Le profil Enseignant (et sa classe) est chargé avec l'utilisateur,
+    donc request.user.enseignant_profile ne coûte aucune requête.
+    Le cache est invalidé par les signaux de schoolcopal/signals.py.
+    """
+
+    def get_user(self, user_id):
+        # AUTH_USER_CACHE_TIMEOUT = 0 (cache propre au processus) : lecture en base à chaque requête
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        key = user_cache_key(user_id)
+        user = cache.get(key) if timeout else None
+        if user is None:
+            try:
+                user = User._default_manager.select_related(
+                    'enseignant_profile__classe'
+                ).get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            if timeout:
+                cache.set(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,129 @@
+"""
+Compactage des lignes supprimées logiquement (deleted_at) depuis plus longtemps que la
+durée de rétention de leur modèle (settings.TOMBSTONE_RETENTION) : suppression réelle,
+éventuellement après export JSON Lines, puis VACUUM / ANALYZE pour rendre la place.
+
+Les modèles sont traités des dépendants vers les référencés (notes avant élèves, élèves
+avant classes…) et une ligne encore référencée par une autre (supprimée ou non) par une
+clé étrangère en CASCADE, PROTECT ou DO_NOTHING est laissée en place : le compactage ne
+supprime jamais par cascade une ligne qui n'était pas elle-même supprimée, et les tables
+d'archive (relations DO_NOTHING sans contrainte en base) ne pointent jamais dans le vide.
+Lots ordonnés par clé primaire, une courte transaction par lot dont le journal d'audit est
+écrit en un seul INSERT.
+"""
+import os
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import connection, models, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import audit
+from .models import BaseModel
+
+BATCH_SIZE = 1000
+BLOCKING = (models.CASCADE, models.PROTECT, models.RESTRICT, models.DO_NOTHING)
+
+
+def reverse_relations(model):
+    """Relations inverses du modèle, y compris les cachées (related_name='+')."""
+    return [
+        relation for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)
+    ]
+
+
+def compactable_models():
+    """Modèles à suppression logique de l'application, les dépendants d'abord."""
+    candidates = [
+        model for model in apps.get_app_config('schoolcopal').get_models()
+        if issubclass(model, BaseModel)
+    ]
+    ordered, seen = [], set()
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        for relation in reverse_relations(model):
+            if relation.related_model in candidates and relation.related_model is not model:
+                visit(relation.related_model)
+        ordered.append(model)
+
+    for model in candidates:
+        visit(model)
+    return ordered
+
+
+def retention(model):
+    """Durée de rétention des lignes supprimées du modèle (TOMBSTONE_RETENTION)."""
+    policy = settings.TOMBSTONE_RETENTION
+    return timedelta(days=policy.get(model._meta.label_lower, policy['default']))
+
+
+def tombstones(model, cutoff):
+    """Lignes supprimées avant cutoff et que plus rien ne référence."""
+    queryset = model._base_manager.filter(deleted_at__lt=cutoff)
+    for relation in reverse_relations(model):
+        if relation.on_delete in BLOCKING:
+            field = relation.field
+            queryset = queryset.exclude(Exists(
+                field.model._base_manager.filter(**{field.name: OuterRef(field.target_field.attname)})
+            ))
+    return queryset
+
+
+def export(model, objects, directory):
+    path = os.path.join(directory, f"{model._meta.label_lower}.jsonl")
+    with open(path, 'a', encoding='utf-8') as stream:
+        serializers.serialize('jsonl', objects, stream=stream)
+
+
+def compact_model(model, now=None, batch_size=BATCH_SIZE, export_dir=None):
+    """Supprime réellement les lignes expirées du modèle, par lots ; renvoie leur nombre."""
+    cutoff = (now or timezone.now()) - retention(model)
+    queryset = tombstones(model, cutoff).order_by('pk')
+    total, last = 0, None
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        with transaction.atomic(), audit.capture():
+            objects = list(batch[:batch_size])
+            if not objects:
+                return total
+            if export_dir:
+                export(model, objects, export_dir)
+            # Les relations SET_NULL restantes sont mises à jour par la suppression
+            model._base_manager.filter(pk__in=[obj.pk for obj in objects]).delete()
+        total += len(objects)
+        last = objects[-1].pk
+
+
+def reclaim():
+    """Rend la place libérée au système de fichiers et met à jour les statistiques."""
+    if connection.in_atomic_block:
+        return False
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('VACUUM')
+            cursor.execute('ANALYZE')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('VACUUM ANALYZE')
+        else:
+            return False
+    return True
+
+
+def compact(now=None, batch_size=BATCH_SIZE, export_dir=None, vacuum=True):
+    """Compacte tous les modèles ; renvoie {libellé du modèle: lignes supprimées}."""
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+    report = {
+        model._meta.label_lower: compact_model(model, now, batch_size, export_dir)
+        for model in compactable_models()
+    }
+    if vacuum and any(report.values()):
+        reclaim()
+    return report
@@ -0,0 +1,127 @@
+"""
+Détection des élèves et parents en double.
+
+Élèves : les candidats sont regroupés par clé de blocage (nom normalisé, année de naissance,
+niveau de classe) et seules les paires d'un même bloc sont comparées, par similarité des
+prénoms normalisés (difflib). À la saisie, le bloc est lu par l'index de recherche (nom)
+puis filtré en mémoire : quelques lignes, quelques millisecondes.
+Parents : même e-mail (sans casse) ou même numéro de téléphone (chiffres seuls).
+"""
+import re
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db.models import Q
+
+from .models import Eleve, User
+from .search import object_ids
+from .utils import normaliser
+
+# Similarité des prénoms à partir de laquelle deux élèves d'un même bloc sont signalés
+SEUIL = 0.85
+
+
+class Doublon:
+    """Paire d'élèves (ou de parents) probablement identiques, avec son score (0 à 1)."""
+
+    def __init__(self, premier, second, score):
+        self.premier = premier
+        self.second = second
+        self.score = score
+
+    def __str__(self):
+        return f"{self.premier} ~ {self.second} ({self.score:.2f})"
+
+
+def annee_naissance(date_naissance, age, aujourd_hui=None):
+    """Année de naissance, estimée par l'âge quand la date est inconnue."""
+    if date_naissance:
+        return date_naissance.year
+    if age is None:
+        return None
+    return (aujourd_hui or date.today()).year - age
+
+
+def cle_blocage(nom, date_naissance, age, niveau):
+    return normaliser(nom), annee_naissance(date_naissance, age), niveau
+
+
+def similarite(a, b):
+    """Similarité des prénoms ; nulle si les dates de naissance sont connues et différentes."""
+    if a.date_naissance and b.date_naissance and a.date_naissance != b.date_naissance:
+        return 0.0
+    return SequenceMatcher(None, normaliser(a.prenom), normaliser(b.prenom)).ratio()
+
+
+def candidats(ecole, eleve, seuil=SEUIL):
+    """
+    Élèves actifs de l'école ressemblant à eleve (instance non forcément enregistrée), du
+    plus proche au moins proche. Une requête : bloc lu via l'index de recherche sur le nom.
+    """
+    niveau = eleve.classe.niveau if eleve.classe_id else None
+    cle = cle_blocage(eleve.nom, eleve.date_naissance, eleve.age, niveau)
+    if not cle[0]:
+        return []
+    bloc = (
+        Eleve.objects.for_ecole(ecole).filter(
+            deleted_at__isnull=True, pk__in=object_ids(eleve.nom, 'eleve', ecole),
+            classe__niveau=niveau,
+        )
+        .exclude(pk=eleve.pk).select_related('classe')
+    )
+    doublons = []
+    for autre in bloc:
+        if cle_blocage(autre.nom, autre.date_naissance, autre.age, niveau) != cle:
+            continue
+        score = similarite(eleve, autre)
+        if score >= seuil:
+            doublons.append(Doublon(eleve, autre, score))
+    return sorted(doublons, key=lambda doublon: -doublon.score)
+
+
+def eleves_en_double(ecole, seuil=SEUIL):
+    """Paires d'élèves en double de l'école : comparaisons limitées à chaque bloc."""
+    blocs = defaultdict(list)
+    eleves = Eleve.objects.for_ecole(ecole).filter(deleted_at__isnull=True).select_related('classe').order_by('pk')
+    for eleve in eleves.iterator(chunk_size=2000):
+        niveau = eleve.classe.niveau if eleve.classe_id else None
+        blocs[cle_blocage(eleve.nom, eleve.date_naissance, eleve.age, niveau)].append(eleve)
+    doublons = []
+    for bloc in blocs.values():
+        for premier, second in combinations(bloc, 2):
+            score = similarite(premier, second)
+            if score >= seuil:
+                doublons.append(Doublon(premier, second, score))
+    return sorted(doublons, key=lambda doublon: (-doublon.score, doublon.premier.pk))
+
+
+def telephone(numero):
+    return re.sub(r'\D', '', numero or '')
+
+
+def parents_en_double(ecole):
+    """Paires de parents de l'école partageant un e-mail ou un numéro de téléphone."""
+    blocs = defaultdict(list)
+    parents = User.objects.filter(ecole=ecole, role='parent', deleted_at__isnull=True).order_by('pk')
+    for parent in parents.only('pk', 'username', 'email', 'telephone'):
+        cles = {('email', parent.email.strip().lower()), ('telephone', telephone(parent.telephone))}
+        for cle in cles:
+            if cle[1]:
+                blocs[cle].append(parent)
+    paires = {}
+    for bloc in blocs.values():
+        for premier, second in combinations(bloc, 2):
+            paires[premier.pk, second.pk] = Doublon(premier, second, 1.0)
+    return list(paires.values())
+
+
+def parent_existant(ecole, email):
+    """Parent actif de l'école identifié par cet e-mail (frères et sœurs), sinon None."""
+    email = email.strip()
+    return (
+        User.objects.filter(Q(username__iexact=email) | Q(email__iexact=email))
+        .filter(ecole=ecole, role='parent', deleted_at__isnull=True)
+        .order_by('pk').first()
+    )
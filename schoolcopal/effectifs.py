@@ -0,0 +1,49 @@
+"""
+Recalcul des effectifs (élèves actifs, garçons, filles) d'Ecole et de ClasseScolaire.
+Les compteurs sont tenus à jour par Eleve.save ; les écritures en masse (bulk_create,
+update(), action d'admin) les contournent : recompter() corrige l'écart.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ClasseScolaire, Ecole, Eleve
+
+CHAMPS = {
+    'effectif': Q(),
+    'effectif_garcons': Q(sexe='garcon'),
+    'effectif_filles': Q(sexe='fille'),
+}
+
+
+def comptes(lookup):
+    """{champ: sous-requête du nombre d'élèves actifs dont lookup est la ligne externe}."""
+    return {
+        champ: Coalesce(Subquery(
+            Eleve.objects.filter(condition, deleted_at__isnull=True, **{lookup: OuterRef('pk')})
+            .order_by().values(lookup).annotate(nombre=Count('pk')).values('nombre'),
+            output_field=IntegerField(),
+        ), Value(0))
+        for champ, condition in CHAMPS.items()
+    }
+
+
+def recompter(ecoles=None):
+    """
+    Corrige les compteurs faux des écoles données (toutes par défaut) et de leurs classes.
+    Renvoie {'ecoles': n, 'classes': n} : nombre de lignes corrigées.
+    """
+    corrigees = {}
+    for cle, model, lookup, portee in (
+        ('ecoles', Ecole, 'ecole', 'pk__in'),
+        ('classes', ClasseScolaire, 'classe', 'ecole__in'),
+    ):
+        queryset = model.objects.all() if ecoles is None else model.objects.filter(**{portee: ecoles})
+        reels = {f"reel_{champ}": expression for champ, expression in comptes(lookup).items()}
+        ecart = Q()
+        for champ in CHAMPS:
+            ecart |= ~Q(**{champ: F(f"reel_{champ}")})
+        pks = list(queryset.annotate(**reels).filter(ecart).values_list('pk', flat=True))
+        if pks:
+            model.objects.filter(pk__in=pks).update(**comptes(lookup))
+        corrigees[cle] = len(pks)
+    return corrigees
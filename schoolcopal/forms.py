@@ -2,9 +2,14 @@ from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm, SetPasswordForm
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.template import loader
 from schoolcopal.models import PasswordResetCode, User
 import uuid
 from .models import User, Ecole, ClasseScolaire, Eleve, Enseignant, Matiere, Note
+from . import doublons
+from .tasks import send_transactional_email
+from .widgets import AutocompleteSelect
 
 class CustomAuthenticationForm(AuthenticationForm):
     """Custom authentication form with translated placeholders."""
@@ -31,6 +36,14 @@ class CustomPasswordResetForm(PasswordResetForm):
             raise ValidationError(_("No account is associated with this email address."))
         return email
 
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        """Render here, send from the 'email' Celery queue once the reset code is committed."""
+        subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = loader.render_to_string(html_email_template_name, context) if html_email_template_name else None
+        transaction.on_commit(lambda: send_transactional_email.delay(subject, body, [to_email], html_body))
+
 class CustomSetPasswordForm(SetPasswordForm):
     """Custom form for setting new password."""
     new_password1 = forms.CharField(
@@ -54,20 +67,36 @@ class VerificationCodeForm(forms.Form):
         super().__init__(*args, **kwargs)
 
     def clean_verification_code(self):
-        """Validate the verification code."""
+        """Validate the verification code (one indexed query on the unique code)."""
         code = self.cleaned_data.get('verification_code')
         try:
             uuid_obj = uuid.UUID(code)
-            reset_code = PasswordResetCode.objects.get(code=uuid_obj, user=self.user)
-            if not reset_code.is_valid():
-                raise ValidationError(_("The verification code is invalid or has expired."))
-        except (ValueError, PasswordResetCode.DoesNotExist):
+        except ValueError:
             raise ValidationError(_("Invalid verification code."))
+        if self.user is None or not PasswordResetCode.objects.valid().filter(code=uuid_obj, user=self.user).exists():
+            raise ValidationError(_("The verification code is invalid or has expired."))
         return code
     
 from .models import Eleve, Enseignant, Matiere, ClasseScolaire, User
 
-class EleveForm(forms.ModelForm):
+
+class EcoleFormMixin:
+    """Restreint les champs école et classe à l'école courante (argument ecole)."""
+
+    def __init__(self, *args, ecole=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ecole = ecole
+        if ecole is None:
+            return
+        if 'ecole' in self.fields:
+            self.fields['ecole'].queryset = Ecole.objects.filter(pk=ecole.pk)
+            self.fields['ecole'].initial = ecole.pk
+        if 'classe' in self.fields:
+            self.fields['classe'].queryset = ClasseScolaire.objects.for_ecole(ecole).filter(deleted_at__isnull=True)
+        if isinstance(self.instance, User) and not self.instance.ecole_id:
+            self.instance.ecole = ecole
+
+class EleveForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating Eleve."""
      # ➜ Champs supplémentaires pour le parent
     parent_name = forms.CharField(
@@ -84,6 +113,10 @@ class EleveForm(forms.ModelForm):
         max_length=50,
         required=True
     )
+    ignorer_doublons = forms.BooleanField(
+        label=_("Save even if a similar student exists"),
+        required=False
+    )
     class Meta:
         model = Eleve
         fields = ['ecole', 'classe', 'nom', 'prenom', 'age', 'date_naissance', 'sexe',]
@@ -97,8 +130,55 @@ class EleveForm(forms.ModelForm):
             'sexe': _('Gender'),
             'parent_id': _('Parent'),
         }
+        widgets = {
+            'ecole': AutocompleteSelect('ecole'),
+            'classe': AutocompleteSelect('classe'),
+        }
+
+    def clean_classe(self):
+        """Capacité de la classe, lue dans son compteur d'effectif (pas de COUNT)."""
+        classe = self.cleaned_data.get('classe')
+        deja_inscrit = self.instance.pk and self.instance.classe_id == getattr(classe, 'pk', None) \
+            and self.instance.is_active()
+        if classe and not deja_inscrit and classe.effectif >= classe.capacite:
+            raise ValidationError(
+                _("Class %(classe)s is full (%(capacite)s students).") % {'classe': classe, 'capacite': classe.capacite}
+            )
+        return classe
+
+    def clean_parent_email(self):
+        """L'e-mail sert d'identifiant : il ne peut appartenir qu'à un parent de l'école (frères et sœurs)."""
+        email = self.cleaned_data.get('parent_email')
+        if self.instance.pk:
+            # Mise à jour : l'e-mail du parent lié ne doit pas être celui d'un autre compte
+            deja_pris = User.objects.filter(email__iexact=email).exclude(pk=self.instance.parent_id_id).exists()
+        else:
+            # Création : identifiant libre, ou parent existant de l'école (réutilisé par la vue)
+            deja_pris = doublons.parent_existant(self.ecole, email) is None \
+                and User.objects.filter(username__iexact=email).exists()
+        if deja_pris:
+            raise ValidationError(_("This email is already used by another account."))
+        return email
+
+    def clean(self):
+        """Signale les élèves semblables (doublons.candidats) tant que l'ajout n'est pas confirmé."""
+        cleaned_data = super().clean()
+        if self.ecole is None or self.errors or cleaned_data.get('ignorer_doublons'):
+            return cleaned_data
+        eleve = Eleve(
+            pk=self.instance.pk, nom=cleaned_data.get('nom'), prenom=cleaned_data.get('prenom'),
+            age=cleaned_data.get('age'), date_naissance=cleaned_data.get('date_naissance'),
+            classe=cleaned_data.get('classe'),
+        )
+        similaires = doublons.candidats(self.ecole, eleve)
+        if similaires:
+            raise ValidationError(
+                _("Similar student already registered: %(eleves)s. Check the box to save anyway.")
+                % {'eleves': ', '.join(f"{d.second} ({d.second.classe or '-'})" for d in similaires)}
+            )
+        return cleaned_data
 
-class EnseignantForm(forms.ModelForm):
+class EnseignantForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating Enseignant and its related User."""
 
     # Champs User
@@ -129,6 +209,7 @@ class EnseignantForm(forms.ModelForm):
             "classe": _("Classe assignée"),
             "salaire": _("Salaire"),
         }
+        widgets = {"classe": AutocompleteSelect("classe")}
 
     def clean(self):
         cleaned = super().clean()
@@ -139,18 +220,20 @@ class EnseignantForm(forms.ModelForm):
                 raise forms.ValidationError(_("Les mots de passe ne correspondent pas."))
         return cleaned
 
-class MatiereForm(forms.ModelForm):
+class MatiereForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating Matiere."""
     class Meta:
         model = Matiere
-        fields = ['classe', 'nom', 'description']
+        fields = ['classe', 'nom', 'description', 'heures_hebdo']
         labels = {
             'classe': _('Class'),
             'nom': _('Subject Name'),
             'description': _('Description'),
+            'heures_hebdo': _('Weekly Hours'),
         }
+        widgets = {'classe': AutocompleteSelect('classe')}
 
-class ClasseScolaireForm(forms.ModelForm):
+class ClasseScolaireForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating ClasseScolaire."""
     class Meta:
         model = ClasseScolaire
@@ -162,7 +245,7 @@ class ClasseScolaireForm(forms.ModelForm):
             'capacite': _('Capacity'),
         }
 
-class DirecteurForm(forms.ModelForm):
+class DirecteurForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating Directeur (User with role='directeur')."""
     password1 = forms.CharField(
         label=_("Mot de passe"),
@@ -215,6 +298,8 @@ class NoteForm(forms.ModelForm):
             'sequence': _('Sequence'),
         }
         widgets = {
+            'eleve': AutocompleteSelect('eleve'),
+            'matiere': AutocompleteSelect('matiere'),
             'valeur': forms.NumberInput(attrs={'step': '0.01', 'min': 0, 'max': 20}),
             'trimestre': forms.Select(choices=[('T1', 'Trimester 1'), ('T2', 'Trimester 2'), ('T3', 'Trimester 3')]),
         }
@@ -226,10 +311,12 @@ class NoteForm(forms.ModelForm):
             # Restrict students to those in the teacher's class
             self.fields['eleve'].queryset = Eleve.objects.filter(classe=teacher.classe, deleted_at__isnull=True)
             # Restrict subjects to those in the teacher's class
-            self.fields['matiere'].queryset = Matiere.objects.filter(classe=teacher.classe, deleted_at__isnull=True)
+            self.fields['matiere'].queryset = Matiere.objects.filter(
+                classe=teacher.classe, deleted_at__isnull=True
+            ).select_related('classe')
             
 
-class AdminForm(forms.ModelForm):
+class AdminForm(EcoleFormMixin, forms.ModelForm):
     """Form for creating/updating Admin users."""
     first_name = forms.CharField(label=_("First Name"), required=True)
     last_name = forms.CharField(label=_("Last Name"), required=True)
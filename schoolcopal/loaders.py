@@ -0,0 +1,166 @@
+"""
+Chargeurs groupés : une requête par type de données pour un ensemble d'élèves,
+au lieu d'une requête par élève, matière ou trimestre.
+Notes, présences et paiements : année scolaire en cours seulement.
+Les variantes a* (ASGI) exécutent la même requête par itération asynchrone.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Max, Sum, Value
+
+from .models import AnneeScolaire, ClasseScolaire, Eleve, Frequence, Matiere, Note, Paiement
+
+TRIMESTRES = [1, 2, 3]
+SEQUENCES = range(1, 7)
+
+
+async def alist(queryset):
+    """Évalue un queryset par itération asynchrone (à combiner avec asyncio.gather)."""
+    return [obj async for obj in queryset]
+
+
+def _par(objets, cle):
+    result = defaultdict(list)
+    for objet in objets:
+        result[getattr(objet, cle)].append(objet)
+    return result
+
+
+def _matieres(classe_ids):
+    return Matiere.objects.filter(classe_id__in=classe_ids, deleted_at__isnull=True).order_by('nom')
+
+
+def matieres_par_classe(classe_ids):
+    """{classe_id: [Matiere]} des matières actives des classes données."""
+    return _par(_matieres(classe_ids), 'classe_id')
+
+
+async def amatieres_par_classe(classe_ids):
+    return _par(await alist(_matieres(classe_ids)), 'classe_id')
+
+
+def _notes(eleve_ids):
+    return Note.objects.annee_active().filter(eleve_id__in=eleve_ids, deleted_at__isnull=True).order_by('trimestre', 'sequence', 'id')
+
+
+def notes_par_eleve(eleve_ids):
+    """{eleve_id: [Note]} des notes actives, triées par trimestre puis séquence."""
+    return _par(_notes(eleve_ids), 'eleve_id')
+
+
+async def anotes_par_eleve(eleve_ids):
+    return _par(await alist(_notes(eleve_ids)), 'eleve_id')
+
+
+def _sommes(eleve_ids):
+    return (
+        Note.objects.annee_active().filter(eleve_id__in=eleve_ids, deleted_at__isnull=True)
+        .values('eleve_id', 'trimestre', 'sequence')
+        .annotate(total=Sum('valeur'), nombre=Count('id'))
+        .order_by()
+    )
+
+
+def _moyennes(rows, eleve_ids):
+    sommes = defaultdict(dict)
+    for row in rows:
+        sommes[row['eleve_id']][(row['trimestre'], row['sequence'])] = (row['total'], row['nombre'])
+
+    def moyenne(total, nombre):
+        return round(total / nombre, 2) if nombre else 0
+
+    result = {}
+    for eleve_id in eleve_ids:
+        par_cle = sommes.get(eleve_id, {})
+        averages = {'by_sequence': {}, 'by_trimester': {}}
+        for trimestre in TRIMESTRES:
+            # Les notes sans séquence comptent dans la moyenne du trimestre
+            cles = [valeurs for (t, _), valeurs in par_cle.items() if t == trimestre]
+            averages['by_trimester'][trimestre] = moyenne(sum(c[0] for c in cles), sum(c[1] for c in cles))
+            averages['by_sequence'][trimestre] = {
+                sequence: moyenne(*par_cle.get((trimestre, sequence), (0, 0))) for sequence in SEQUENCES
+            }
+        result[eleve_id] = averages
+    return result
+
+
+def moyennes_par_eleve(eleve_ids):
+    """
+    {eleve_id: {'by_trimester': {t: moyenne}, 'by_sequence': {t: {s: moyenne}}}}
+    calculées en une seule requête agrégée ; 0 quand il n'y a pas de note.
+    """
+    return _moyennes(_sommes(eleve_ids), eleve_ids)
+
+
+async def amoyennes_par_eleve(eleve_ids):
+    return _moyennes(await alist(_sommes(eleve_ids)), eleve_ids)
+
+
+def frequences_par_eleve(eleve_ids, absences_recentes=10):
+    """
+    {eleve_id: {'jours': n, 'absences': n, 'dernieres_absences': [{'date', 'raison'}]}}
+    en deux requêtes : comptage groupé, puis absences (minoritaires) les plus récentes.
+    """
+    result = {eleve_id: {'jours': 0, 'absences': 0, 'dernieres_absences': []} for eleve_id in eleve_ids}
+    rows = (
+        Frequence.objects.annee_active().filter(eleve_id__in=eleve_ids, deleted_at__isnull=True)
+        .values('eleve_id', 'present')
+        .annotate(nombre=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        result[row['eleve_id']]['jours'] += row['nombre']
+        if not row['present']:
+            result[row['eleve_id']]['absences'] = row['nombre']
+    absences = (
+        Frequence.objects.annee_active().filter(eleve_id__in=eleve_ids, present=False, deleted_at__isnull=True)
+        .values_list('eleve_id', 'date', 'raison_absence')
+        .order_by('-date')
+    )
+    for eleve_id, jour, raison in absences:
+        recentes = result[eleve_id]['dernieres_absences']
+        if len(recentes) < absences_recentes:
+            recentes.append({'date': jour, 'raison': raison})
+    return result
+
+
+def soldes_par_eleve(eleve_ids):
+    """{eleve_id: {'paye': total, 'impaye': total}} des paiements actifs, en une requête."""
+    result = {eleve_id: {'paye': 0, 'impaye': 0} for eleve_id in eleve_ids}
+    rows = (
+        Paiement.objects.annee_active().filter(eleve_id__in=eleve_ids, deleted_at__isnull=True)
+        .values('eleve_id', 'statut')
+        .annotate(total=Sum('montant'))
+        .order_by()
+    )
+    for row in rows:
+        result[row['eleve_id']][row['statut']] = row['total']
+    return result
+
+
+def derniere_modification(eleve_ids, classe_ids):
+    """
+    (max updated_at, nombre de lignes) des élèves, classes, matières, notes, présences
+    et paiements concernés, en une seule requête (UNION ALL d'agrégats).
+    Les suppressions logiques changent updated_at ; les suppressions réelles, le nombre.
+    Notes, présences et paiements de l'année en cours seulement, comme les chargeurs ;
+    les années scolaires des écoles en font partie : un changement d'année change la version.
+    """
+    def version(queryset):
+        # Regroupement sur une constante : un seul agrégat par table
+        return queryset.order_by().annotate(_tout=Value(1)).values('_tout').annotate(
+            derniere=Max('updated_at'), lignes=Count('id'),
+        ).values('derniere', 'lignes')
+
+    parts = [
+        version(Eleve.objects.filter(id__in=eleve_ids)),
+        version(ClasseScolaire.objects.filter(id__in=classe_ids)),
+        version(Matiere.objects.filter(classe_id__in=classe_ids)),
+        version(Note.objects.annee_active().filter(eleve_id__in=eleve_ids)),
+        version(Frequence.objects.annee_active().filter(eleve_id__in=eleve_ids)),
+        version(Paiement.objects.annee_active().filter(eleve_id__in=eleve_ids)),
+        version(AnneeScolaire.objects.filter(ecole_id__in=Eleve.objects.filter(id__in=eleve_ids).values('ecole_id'))),
+    ]
+    rows = list(parts[0].union(*parts[1:], all=True))
+    dates = [row['derniere'] for row in rows if row['derniere'] is not None]
+    return (max(dates) if dates else None), sum(row['lignes'] for row in rows)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schoolcopal import archives
+from schoolcopal.models import AnneeScolaire
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les notes, présences et paiements des années scolaires clôturées vers les "
+        "tables d'archive (lecture seule), par lots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école (toutes par défaut).")
+        parser.add_argument('--annee', help="Libellé de l'année (ex. 2024-2025) ; toutes les années clôturées par défaut.")
+        parser.add_argument('--batch-size', type=int, default=archives.BATCH_SIZE, help="Lignes par lot.")
+
+    def handle(self, *args, **options):
+        annees = AnneeScolaire.objects.filter(cloturee=True, archivee_le__isnull=True, deleted_at__isnull=True)
+        if options['ecole']:
+            annees = annees.filter(ecole_id=options['ecole'])
+        if options['annee']:
+            annees = annees.filter(libelle=options['annee'])
+        annees = list(annees.select_related('ecole').order_by('ecole_id', 'debut'))
+        if not annees and options['annee']:
+            raise CommandError(f"Aucune année clôturée non archivée « {options['annee']} ».")
+
+        for annee in annees:
+            start = time.perf_counter()
+            try:
+                totals = archives.archiver(annee, options['batch_size'])
+            except archives.ArchiveError as exc:
+                raise CommandError(str(exc))
+            details = ', '.join(f"{total} {model._meta.verbose_name_plural}" for model, total in totals.items())
+            self.stdout.write(self.style.SUCCESS(
+                f"{annee.ecole} {annee} : {details} archivés en {time.perf_counter() - start:.2f} s"
+            ))
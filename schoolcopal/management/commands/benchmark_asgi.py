@@ -0,0 +1,166 @@
+import importlib.util
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from schoolcopal.models import User, Enseignant
+
+DASHBOARDS = [
+    ('admin_dashboard', 'admin'),
+    ('directeur_dashboard', 'directeur'),
+    ('enseignant_dashboard', 'enseignant'),
+    ('parent_dashboard', 'parent'),
+]
+
+# (nom, serveur, application, suffixe du nom d'URL). L'adaptateur WSGI d'uvicorn rejette
+# les en-têtes Set-Cookie de Django : la référence WSGI est servie par gunicorn (gthread).
+MODES = [
+    ('wsgi-sync', 'gunicorn', 'school.wsgi:application', ''),
+    ('asgi-sync', 'uvicorn', 'school.asgi:application', ''),
+    ('asgi-async', 'uvicorn', 'school.asgi:application', '_async'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sous charge concurrente les tableaux de bord synchrones (WSGI) et async (ASGI), "
+        "servis par gunicorn et uvicorn sur la base courante (à remplir au préalable avec seed_school)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help="Requêtes simultanées.")
+        parser.add_argument('--requests', type=int, default=200, help="Requêtes par tableau de bord et par mode.")
+        parser.add_argument('--workers', type=int, default=1, help="Processus par serveur.")
+        parser.add_argument('--threads', type=int, default=20, help="Threads par processus gunicorn (WSGI).")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--output', default='bench_asgi.json', help="Fichier JSON des résultats.")
+
+    def handle(self, *args, **options):
+        for module in ('uvicorn', 'gunicorn'):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} est requis : pip install {module}")
+
+        cookies = self.sessions()
+        results = {}
+        for mode, server, app, suffix in MODES:
+            self.stdout.write(f"{mode} ({server} {app})")
+            results[mode] = {}
+            with self.server(server, app, options) as base_url:
+                for name, role in DASHBOARDS:
+                    if role not in cookies:
+                        continue
+                    url = base_url + reverse(f'schoolcopal:{name}{suffix}')
+                    result = self.load(url, cookies[role], options['requests'], options['concurrency'])
+                    results[mode][name] = result
+                    self.stdout.write(
+                        f"  {name:<22} {result['rps']:>8.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+                        f"p95 {result['p95_ms']:>8.2f} ms  erreurs {result['errors']}"
+                    )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+    def sessions(self):
+        """Cookie de session par rôle, créé dans la base partagée avec le serveur."""
+        users = {
+            'admin': User.objects.filter(role='admin', deleted_at__isnull=True).order_by('id').first()
+                     or User.objects.create_user('bench-admin', 'bench-admin@example.com', role='admin'),
+            'directeur': User.objects.filter(role='directeur', deleted_at__isnull=True).order_by('id').first(),
+            'enseignant': getattr(Enseignant.objects.filter(classe__isnull=False).order_by('id').first(), 'user', None),
+            'parent': User.objects.filter(role='parent', enfants__isnull=False).order_by('id').first(),
+        }
+        cookies = {}
+        for role, user in users.items():
+            if user is None:
+                self.stdout.write(self.style.WARNING(f"Aucun utilisateur « {role} », tableau de bord ignoré"))
+                continue
+            client = Client()
+            client.force_login(user)
+            cookies[role] = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        return cookies
+
+    @contextmanager
+    def server(self, server, app, options):
+        """Lance le serveur dans un sous-processus et attend qu'il accepte les connexions."""
+        port, workers = options['port'], str(options['workers'])
+        if server == 'gunicorn':
+            command = [
+                'gunicorn', app, '--bind', f'127.0.0.1:{port}', '--workers', workers,
+                '--worker-class', 'gthread', '--threads', str(options['threads']), '--log-level', 'warning',
+            ]
+        else:
+            command = [
+                'uvicorn', app, '--port', str(port), '--workers', workers, '--log-level', 'warning', '--no-access-log',
+            ]
+        process = subprocess.Popen(
+            [sys.executable, '-m', *command],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'school.settings')},
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if process.poll() is not None or time.monotonic() > deadline:
+                        raise CommandError(f"{server} n'a pas démarré ({app})")
+                    time.sleep(0.2)
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def load(self, url, cookie, total, concurrency):
+        """Envoie `total` requêtes GET, `concurrency` à la fois, après une requête de chauffe."""
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers={'Cookie': cookie}), timeout=60) as response:
+                    response.read()
+                    ok = response.status == 200 and response.geturl() == url  # pas de renvoi vers la connexion
+            except HTTPError:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        fetch(None)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(fetch, range(total)))
+        wall = time.perf_counter() - start
+
+        timings = sorted(duration for duration, _ in samples)
+        return {
+            'url': url,
+            'rps': round(total / wall, 1),
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1] * 1000, 2),
+            'errors': sum(1 for _, ok in samples if not ok),
+        }
@@ -0,0 +1,197 @@
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from schoolcopal.models import User, Eleve, Enseignant, Note
+from schoolcopal.profiling import RequestProfile
+
+ELEVES_PAR_CLASSE = 40
+
+
+def benchmark_targets():
+    """(nom, rôle, fonction construisant l'URL, None sans donnée à mesurer) des vues mesurées."""
+    def note_create():
+        eleve = Eleve.objects.filter(classe__enseignant__isnull=False, deleted_at__isnull=True).order_by('id').first()
+        return reverse('schoolcopal:note_create', args=[eleve.id]) if eleve else None
+
+    def note_update():
+        note = Note.objects.filter(eleve__classe__enseignant__isnull=False, deleted_at__isnull=True).order_by('id').first()
+        return reverse('schoolcopal:note_update', args=[note.id]) if note else None
+
+    targets = [
+        ('admin_dashboard', 'admin'),
+        ('directeur_dashboard', 'directeur'),
+        ('enseignant_dashboard', 'enseignant'),
+        ('parent_dashboard', 'parent'),
+        ('eleve_list', 'admin'),
+        ('enseignant_list', 'admin'),
+        ('matiere_list', 'admin'),
+        ('classescolaire_list', 'admin'),
+        ('directeur_list', 'admin'),
+        ('admin_list', 'admin'),
+    ]
+    return [
+        (name, role, lambda name=name: reverse(f'schoolcopal:{name}')) for name, role in targets
+    ] + [
+        ('note_create', 'enseignant', note_create),
+        ('note_update', 'enseignant', note_update),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les tableaux de bord, listes et formulaires de notes via le client de test : "
+        "temps, nombre de requêtes SQL et pic mémoire, avec comparaison à une référence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='',
+            help="Nombres d'élèves séparés par des virgules (ex. 500,5000). Chaque échelle est générée "
+                 "par seed_school dans une base de test jetable. Sans option, la base courante est mesurée.",
+        )
+        parser.add_argument('--repeat', type=int, default=5, help="Mesures par vue (après un appel de chauffe).")
+        parser.add_argument('--jours', type=int, default=20, help="Jours de présences générés par échelle.")
+        parser.add_argument('--output', default='bench_results.json', help="Fichier JSON des résultats.")
+        parser.add_argument('--baseline', help="Fichier JSON de référence à comparer.")
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help="Régression tolérée sur le temps médian (0.2 = +20 %%).",
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat doit être au moins 1.")
+        setup_test_environment()
+        try:
+            if options['scales']:
+                results = {}
+                for scale in [int(value) for value in options['scales'].split(',')]:
+                    results[f"{scale}"] = self.run_scale(scale, options)
+            else:
+                # Base courante : l'administrateur créé au besoin et les sessions sont annulés
+                with transaction.atomic():
+                    results = {'current': self.run_views(options['repeat'])}
+                    transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['threshold'])
+
+    def run_scale(self, scale, options):
+        """Génère une base de test à l'échelle demandée, mesure, puis la détruit."""
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            classes_par_niveau = max(1, math.ceil(scale / (6 * ELEVES_PAR_CLASSE)))
+            self.stdout.write(f"Échelle {scale} élèves : génération ({classes_par_niveau} classes par niveau)…")
+            call_command(
+                'seed_school', classes_par_niveau=classes_par_niveau,
+                eleves_par_classe=ELEVES_PAR_CLASSE, jours=options['jours'], stdout=self.stdout,
+            )
+            return self.run_views(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def user_for(self, role):
+        if role == 'admin':
+            user = User.objects.filter(role='admin', deleted_at__isnull=True).order_by('id').first()
+            return user or User.objects.create_user('bench-admin', 'bench-admin@example.com', role='admin')
+        if role == 'enseignant':
+            enseignant = Enseignant.objects.filter(classe__isnull=False).select_related('user').order_by('id').first()
+            return enseignant.user if enseignant else None
+        if role == 'parent':
+            return User.objects.filter(role='parent', enfants__isnull=False).order_by('id').first()
+        return User.objects.filter(role=role, deleted_at__isnull=True).order_by('id').first()
+
+    def run_views(self, repeat):
+        results = {}
+        for name, role, build_url in benchmark_targets():
+            user = self.user_for(role)
+            if user is None:
+                self.stdout.write(self.style.WARNING(f"{name} : aucun utilisateur « {role} », ignoré"))
+                continue
+            url = build_url()
+            if url is None:
+                self.stdout.write(self.style.WARNING(f"{name} : aucune donnée à mesurer, ignoré"))
+                continue
+            client = Client()
+            client.force_login(user)
+
+            response = client.get(url)  # chauffe (caches, session)
+
+            timings, profiles = [], []
+            for _ in range(repeat):
+                profile = RequestProfile()
+                with connection.execute_wrapper(profile):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                profiles.append(profile)
+            # Pire mesure : une requête en plus sur un seul appel (cache expiré…) reste visible
+            queries = [profile.query_count for profile in profiles]
+
+            tracemalloc.start()
+            client.get(url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                'url': url,
+                'status': response.status_code,
+                'wall_ms_median': round(statistics.median(timings) * 1000, 2),
+                'wall_ms_min': round(min(timings) * 1000, 2),
+                'queries': max(queries),
+                'queries_per_repeat': queries,
+                'duplicate_shapes': max(len(profile.duplicates()) for profile in profiles),
+                'peak_kb': round(peak / 1024, 1),
+            }
+            self.stdout.write(
+                f"  {name:<22} {results[name]['wall_ms_median']:>9.2f} ms  "
+                f"{max(queries):>5} requêtes  {results[name]['peak_kb']:>9.1f} Ko  [{response.status_code}]"
+            )
+        return results
+
+    def compare(self, report, baseline_path, threshold):
+        with open(baseline_path, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = []
+        for scale, views in report['results'].items():
+            for name, current in views.items():
+                previous = baseline.get('results', {}).get(scale, {}).get(name)
+                if previous is None:
+                    continue
+                if current['wall_ms_median'] > previous['wall_ms_median'] * (1 + threshold):
+                    regressions.append(
+                        f"[{scale}] {name} : {previous['wall_ms_median']} ms -> {current['wall_ms_median']} ms"
+                    )
+                if current['queries'] > previous['queries']:
+                    regressions.append(
+                        f"[{scale}] {name} : {previous['queries']} -> {current['queries']} requêtes"
+                    )
+        if regressions:
+            raise CommandError("Régressions par rapport à la référence :\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"Aucune régression par rapport à {baseline_path}."))
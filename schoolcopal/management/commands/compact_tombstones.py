@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from schoolcopal import compaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime réellement, par lots, les lignes supprimées logiquement depuis plus longtemps "
+        "que leur durée de rétention (settings.TOMBSTONE_RETENTION), puis VACUUM / ANALYZE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=compaction.BATCH_SIZE, help="Lignes par lot.")
+        parser.add_argument('--export', default=settings.TOMBSTONE_EXPORT_DIR,
+                            help="Dossier où exporter les lignes (JSON Lines) avant suppression.")
+        parser.add_argument('--no-vacuum', action='store_true', help="Ne pas lancer VACUUM / ANALYZE.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = compaction.compact(
+            batch_size=options['batch_size'], export_dir=options['export'] or None, vacuum=not options['no_vacuum'],
+        )
+        for label, total in report.items():
+            if total:
+                self.stdout.write(f"{label} : {total} lignes supprimées")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(report.values())} lignes supprimées en {time.perf_counter() - start:.2f} s"
+        ))
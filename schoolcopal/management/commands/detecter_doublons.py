@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schoolcopal import doublons
+from schoolcopal.models import Ecole
+
+
+class Command(BaseCommand):
+    help = (
+        "Liste les élèves probablement inscrits deux fois (même nom, année de naissance et "
+        "niveau, prénoms proches) et les parents partageant un e-mail ou un téléphone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école (toutes par défaut).")
+        parser.add_argument('--seuil', type=float, default=doublons.SEUIL, help="Similarité minimale des prénoms (0 à 1).")
+
+    def handle(self, *args, **options):
+        ecoles = Ecole.objects.filter(deleted_at__isnull=True).order_by('pk')
+        if options['ecole']:
+            ecoles = ecoles.filter(pk=options['ecole'])
+        for ecole in ecoles:
+            start = time.perf_counter()
+            eleves = doublons.eleves_en_double(ecole, options['seuil'])
+            parents = doublons.parents_en_double(ecole)
+            for doublon in eleves:
+                self.stdout.write(f"Élève {doublon.premier.pk} ~ {doublon.second.pk} : {doublon}")
+            for doublon in parents:
+                self.stdout.write(f"Parent {doublon.premier.pk} ~ {doublon.second.pk} : {doublon}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{ecole} : {len(eleves)} élèves et {len(parents)} parents en double "
+                f"en {time.perf_counter() - start:.2f} s"
+            ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schoolcopal import timetable
+from schoolcopal.models import Ecole
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère l'emploi du temps hebdomadaire sans conflit (classes, enseignants, salles) "
+        "d'après les quotas Matiere.heures_hebdo, et remplace l'emploi du temps existant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école (toutes par défaut).")
+        parser.add_argument('--salles', nargs='+', help="Salles disponibles (par défaut une par classe).")
+        parser.add_argument('--jours', nargs='+', default=list(timetable.JOURS), help="Jours de cours.")
+        parser.add_argument('--dry-run', action='store_true', help="Calcule sans enregistrer.")
+
+    def handle(self, *args, **options):
+        ecoles = Ecole.objects.filter(deleted_at__isnull=True).order_by('pk')
+        if options['ecole']:
+            ecoles = ecoles.filter(pk=options['ecole'])
+            if not ecoles.exists():
+                raise CommandError(f"École {options['ecole']} introuvable.")
+
+        for ecole in ecoles:
+            start = time.perf_counter()
+            try:
+                emplois = timetable.generate(ecole, options['salles'], options['jours'])
+            except timetable.TimetableError as exc:
+                raise CommandError(f"{ecole} : {exc}")
+            if not options['dry_run']:
+                timetable.save(ecole, emplois)
+            self.stdout.write(self.style.SUCCESS(
+                f"{ecole} : {len(emplois)} cours planifiés en {time.perf_counter() - start:.2f} s"
+            ))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schoolcopal import promotion
+from schoolcopal.models import Ecole
+
+
+def correspondance(value):
+    """SOURCE:CIBLE (identifiants de classes), CIBLE = 'sortie' pour retirer les élèves de l'école."""
+    source, _, cible = value.partition(':')
+    try:
+        return int(source), None if cible == 'sortie' else int(cible)
+    except ValueError:
+        raise CommandError(f"Correspondance invalide : {value} (attendu SOURCE:CIBLE).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Promotion de fin d'année (ou transfert) de tous les élèves d'une école : chaque classe "
+        "passe au niveau suivant, sauf les redoublants ; les sortants (CM2, --vers SOURCE:sortie) quittent "
+        "l'école. Aperçu avec --dry-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, required=True, help="Identifiant de l'école.")
+        parser.add_argument('--seuil', type=float, help="Moyenne annuelle en dessous de laquelle l'élève redouble.")
+        parser.add_argument('--redoubler', type=int, nargs='+', default=[], help="Élèves qui redoublent.")
+        parser.add_argument('--promouvoir', type=int, nargs='+', default=[], help="Élèves promus malgré le seuil.")
+        parser.add_argument('--vers', type=correspondance, nargs='+',
+                            help="Correspondances SOURCE:CIBLE remplaçant celles par défaut (transferts).")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche le plan sans rien modifier.")
+
+    def handle(self, *args, **options):
+        ecole = Ecole.objects.filter(pk=options['ecole'], deleted_at__isnull=True).first()
+        if ecole is None:
+            raise CommandError(f"École {options['ecole']} introuvable.")
+        start = time.perf_counter()
+        try:
+            plan = promotion.planifier(
+                ecole, dict(options['vers']) if options['vers'] else None, options['seuil'],
+                options['redoubler'], options['promouvoir'],
+            )
+        except promotion.PromotionError as exc:
+            raise CommandError(str(exc))
+        for mouvement in plan.mouvements:
+            self.stdout.write(str(mouvement))
+        if options['dry_run']:
+            self.stdout.write(
+                f"Aperçu : {plan.promus} promus, {plan.sortants} sortants (retirés de l'école), "
+                f"{plan.redoublants} redoublants (rien n'est modifié)"
+            )
+            return
+        total = promotion.appliquer(plan)
+        self.stdout.write(self.style.SUCCESS(
+            f"{ecole} : {total} élèves déplacés dont {plan.sortants} sortants, {plan.redoublants} redoublants "
+            f"en {time.perf_counter() - start:.2f} s"
+        ))
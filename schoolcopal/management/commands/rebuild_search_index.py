@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schoolcopal import search
+from schoolcopal.models import Ecole
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit l'index de recherche des élèves, parents et enseignants "
+        "(après un import en masse qui contourne les signaux)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école à réindexer (toutes par défaut).")
+
+    def handle(self, *args, **options):
+        ecole = None
+        if options['ecole']:
+            ecole = Ecole.objects.filter(pk=options['ecole']).first()
+            if ecole is None:
+                raise CommandError(f"École {options['ecole']} introuvable.")
+        start = time.perf_counter()
+        total = search.rebuild(ecole)
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} entrées indexées en {time.perf_counter() - start:.1f} s"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from schoolcopal import effectifs
+from schoolcopal.models import Ecole
+
+
+class Command(BaseCommand):
+    help = "Recalcule les effectifs (élèves, garçons, filles) des écoles et des classes et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école (toutes par défaut).")
+
+    def handle(self, *args, **options):
+        ecoles = Ecole.objects.filter(pk=options['ecole']) if options['ecole'] else None
+        corrigees = effectifs.recompter(ecoles)
+        self.stdout.write(self.style.SUCCESS(
+            f"{corrigees['ecoles']} écoles et {corrigees['classes']} classes corrigées"
+        ))
@@ -0,0 +1,253 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from schoolcopal import effectifs, search
+from schoolcopal.models import (
+    User, Ecole, AnneeScolaire, ClasseScolaire, Matiere, Eleve, Enseignant,
+    Frequence, Note, Paiement, Notification,
+)
+
+NIVEAUX = ['SIL', 'CP', 'CE1', 'CE2', 'CM1', 'CM2']
+SECTIONS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+MATIERES = [
+    'Français', 'Mathématiques', 'Sciences', 'Histoire-Géographie',
+    'Anglais', 'Éducation civique', 'Dessin', 'Éducation physique',
+]
+NOMS = [
+    'Mbarga', 'Nguema', 'Fotso', 'Tchoua', 'Kamga', 'Ndongo', 'Essomba', 'Biya',
+    'Atangana', 'Manga', 'Owona', 'Djoumessi', 'Ekotto', 'Nkoulou', 'Tagne', 'Onana',
+    'Abena', 'Mvondo', 'Ngono', 'Eto\'o', 'Kouam', 'Simo', 'Fouda', 'Ngassa',
+]
+PRENOMS_GARCONS = [
+    'Jean', 'Paul', 'Samuel', 'Éric', 'Junior', 'Brice', 'Arnaud', 'Franck',
+    'Hervé', 'Joël', 'Stéphane', 'Cédric', 'Yannick', 'Loïc', 'Rodrigue', 'Aurélien',
+]
+PRENOMS_FILLES = [
+    'Marie', 'Aïcha', 'Chantal', 'Brenda', 'Estelle', 'Gaëlle', 'Inès', 'Laure',
+    'Mireille', 'Nadège', 'Océane', 'Prisca', 'Sandrine', 'Vanessa', 'Zoé', 'Hélène',
+]
+
+
+def batched(iterable, size):
+    """Découpe un itérable en listes de taille size, sans tout charger en mémoire."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données déterministe (écoles, classes, élèves, parents, notes, "
+        "présences, paiements, notifications) pour les tests de charge."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecoles', type=int, default=1, help="Nombre d'écoles.")
+        parser.add_argument('--classes-par-niveau', type=int, default=2, help="Classes par niveau et par école.")
+        parser.add_argument('--eleves-par-classe', type=int, default=40, help="Élèves par classe.")
+        parser.add_argument('--matieres', type=int, default=len(MATIERES), help="Matières par classe.")
+        parser.add_argument('--jours', type=int, default=180, help="Jours de classe de présences à générer.")
+        parser.add_argument('--annee', type=int, default=date.today().year - 1, help="Année de la rentrée (par défaut l'année scolaire écoulée).")
+        parser.add_argument('--seed', type=int, default=42, help="Graine du générateur aléatoire.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Taille des lots bulk_create.")
+        parser.add_argument('--password', default='copalschool', help="Mot de passe de tous les comptes générés.")
+        parser.add_argument('--prefix', default='seed', help="Préfixe des noms d'utilisateur générés.")
+
+    def handle(self, *args, **options):
+        if options['classes_par_niveau'] > len(SECTIONS):
+            raise CommandError(f"Au plus {len(SECTIONS)} classes par niveau.")
+        if not 1 <= options['matieres'] <= len(MATIERES):
+            raise CommandError(f"Entre 1 et {len(MATIERES)} matières par classe.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Des comptes « {options['prefix']}-* » existent déjà ; choisissez un autre --prefix.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        # Un seul hachage pour tous les comptes : PBKDF2 par utilisateur coûterait des heures.
+        self.password = make_password(options['password'])
+        self.rentree = date(options['annee'], 9, 1)
+        self.started = time.perf_counter()
+
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        for numero in range(1, options['ecoles'] + 1):
+            with transaction.atomic():
+                self.seed_ecole(numero, options)
+        self.log(self.style.SUCCESS("Jeu de données généré."))
+
+    def log(self, message):
+        self.stdout.write(f"[{time.perf_counter() - self.started:7.1f}s] {message}")
+
+    def bulk(self, model, objs):
+        """bulk_create par lots ; renvoie les objets créés (avec leurs clés primaires)."""
+        created = []
+        for batch in batched(objs, self.batch_size):
+            created.extend(model.objects.bulk_create(batch))
+        return created
+
+    def bulk_count(self, model, objs):
+        """bulk_create par lots sans garder les objets ; renvoie le nombre de lignes."""
+        total = 0
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def insert_rows(self, model, fields, rows):
+        """
+        INSERT par lots via executemany, pour les tables volumineuses (notes, présences).
+        bulk_create compile chaque objet (~10k lignes/s) ; ici les valeurs sont déjà adaptées.
+        """
+        ops = connection.ops
+        columns = [model._meta.get_field(name).column for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            ops.quote_name(model._meta.db_table),
+            ', '.join(ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        total = 0
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+                total += len(batch)
+        return total
+
+    def user(self, username, role, **fields):
+        return User(username=username, email=f"{username}@example.com", role=role, password=self.password, **fields)
+
+    def telephone(self):
+        return '6' + ''.join(self.rng.choice('0123456789') for _ in range(8))
+
+    def seed_ecole(self, numero, options):
+        rng = self.rng
+        ecole = Ecole.objects.create(
+            nom=f"École {numero}",
+            adresse=f"{numero} rue de l'École, Yaoundé",
+            type=rng.choice(['publique', 'privee']),
+            nombre_classes=len(NIVEAUX) * options['classes_par_niveau'],
+        )
+        tag = f"{self.prefix}-e{numero}"
+        libelle, debut, fin = AnneeScolaire.bornes(self.rentree)
+        annee = AnneeScolaire.objects.create(ecole=ecole, libelle=libelle, debut=debut, fin=fin, active=True)
+
+        classes = self.bulk(ClasseScolaire, (
+            ClasseScolaire(ecole=ecole, niveau=niveau, section=SECTIONS[i], capacite=options['eleves_par_classe'])
+            for niveau in NIVEAUX for i in range(options['classes_par_niveau'])
+        ))
+        matieres = self.bulk(Matiere, (
+            Matiere(classe=classe, nom=nom) for classe in classes for nom in MATIERES[:options['matieres']]
+        ))
+        matieres_par_classe = {}
+        for matiere in matieres:
+            matieres_par_classe.setdefault(matiere.classe_id, []).append(matiere.id)
+
+        # Direction et enseignants (un par classe)
+        self.bulk(User, [self.user(f"{tag}-directeur", 'directeur', ecole=ecole, telephone=self.telephone())])
+        enseignants_users = self.bulk(User, (
+            self.user(f"{tag}-ens-{classe.niveau}{classe.section}".lower(), 'enseignant', ecole=ecole, telephone=self.telephone())
+            for classe in classes
+        ))
+        enseignants = self.bulk(Enseignant, (
+            Enseignant(user=user, classe=classe, ecole=ecole, salaire=Decimal(rng.randrange(90, 250) * 1000))
+            for user, classe in zip(enseignants_users, classes)
+        ))
+        enseignant_par_classe = {e.classe_id: e.id for e in enseignants}
+        self.log(f"{ecole} : {len(classes)} classes, {len(matieres)} matières, {len(enseignants)} enseignants")
+
+        # Parents et élèves, classe par classe (les fratries partagent un parent)
+        eleves = []  # (id, classe_id) seulement, pour garder la mémoire bornée
+        parents = []
+        for index, classe in enumerate(classes):
+            age = 5 + NIVEAUX.index(classe.niveau)
+            familles = []
+            restant = options['eleves_par_classe']
+            while restant > 0:
+                taille = min(restant, rng.choice([1, 1, 1, 2, 2, 3]))
+                familles.append(taille)
+                restant -= taille
+            parents_classe = self.bulk(User, (
+                self.user(f"{tag}-p{index}-{n}", 'parent', ecole=ecole, telephone=self.telephone())
+                for n in range(len(familles))
+            ))
+            nouveaux = []
+            for parent, taille in zip(parents_classe, familles):
+                nom = rng.choice(NOMS)
+                for _ in range(taille):
+                    sexe = rng.choice(['garcon', 'fille'])
+                    prenoms = PRENOMS_GARCONS if sexe == 'garcon' else PRENOMS_FILLES
+                    nouveaux.append(Eleve(
+                        ecole=ecole, classe=classe, parent_id=parent,
+                        nom=nom, prenom=rng.choice(prenoms), sexe=sexe, age=age,
+                        date_naissance=date(self.rentree.year - age, rng.randint(1, 12), rng.randint(1, 28)),
+                    ))
+            eleves.extend((eleve.id, classe.id) for eleve in self.bulk(Eleve, nouveaux))
+            parents.extend(parent.id for parent in parents_classe)
+        self.log(f"{ecole} : {len(eleves)} élèves, {len(parents)} parents")
+
+        ops = connection.ops
+        now = ops.adapt_datetimefield_value(timezone.now())
+        valeurs = [ops.adapt_decimalfield_value(Decimal(n) / 4, 4, 2) for n in range(81)]
+        notes = self.insert_rows(
+            Note,
+            ['eleve', 'matiere', 'enseignant', 'sequence', 'trimestre', 'valeur', 'annee', 'created_at', 'updated_at'],
+            (
+                (eleve_id, matiere_id, enseignant_par_classe[classe_id], sequence, (sequence + 1) // 2,
+                 rng.choice(valeurs), annee.pk, now, now)
+                for eleve_id, classe_id in eleves
+                for matiere_id in matieres_par_classe[classe_id]
+                for sequence in range(1, 7)
+            ),
+        )
+        self.log(f"{ecole} : {notes} notes")
+
+        jours = [
+            ops.adapt_datefield_value(jour)
+            for jour in islice(
+                (d for d in (self.rentree + timedelta(days=n) for n in range(366)) if d.weekday() < 5),
+                options['jours'],
+            )
+        ]
+        raisons = ['Maladie', 'Famille', 'Non justifiée']
+
+        def frequence(eleve_id, jour):
+            present = rng.random() > 0.05
+            raison = '' if present else rng.choice(raisons)
+            return (eleve_id, jour, present, raison, annee.pk, now, now)
+
+        frequences = self.insert_rows(
+            Frequence,
+            ['eleve', 'date', 'present', 'raison_absence', 'annee', 'created_at', 'updated_at'],
+            (frequence(eleve_id, jour) for eleve_id, _ in eleves for jour in jours),
+        )
+        self.log(f"{ecole} : {frequences} présences")
+
+        tranches = [self.rentree, self.rentree + timedelta(days=120), self.rentree + timedelta(days=210)]
+        paiements = self.bulk_count(Paiement, (
+            Paiement(eleve_id=eleve_id, annee=annee, montant=Decimal(rng.choice([15000, 20000, 25000])), date_paiement=tranche,
+                     statut='paye' if rng.random() < 0.8 else 'impaye', mode=rng.choice(['cash', 'mobile_money']))
+            for eleve_id, _ in eleves
+            for tranche in tranches
+        ))
+        notifications = self.bulk_count(Notification, (
+            Notification(destinataire_id=parent_id, type=rng.choice(['sms', 'email']), envoye=True,
+                         message=rng.choice(["Réunion des parents vendredi.", "Bulletin disponible.",
+                                             "Rappel : tranche de scolarité à régler."]))
+            for parent_id in parents
+            for _ in range(2)
+        ))
+        self.log(f"{ecole} : {paiements} paiements, {notifications} notifications")
+
+        # bulk_create ne déclenche pas les signaux : index de recherche reconstruit pour l'école
+        self.log(f"{ecole} : {search.rebuild(ecole)} entrées de recherche")
+        effectifs.recompter(Ecole.objects.filter(pk=ecole.pk))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schoolcopal import tendances
+from schoolcopal.models import Ecole
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les séries temporelles des tableaux de bord directeur (effectif mensuel, "
+        "paiements et absences hebdomadaires, moyenne par séquence). --complet reprend tout "
+        "l'historique, années archivées comprises."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecole', type=int, help="Identifiant de l'école (toutes par défaut).")
+        parser.add_argument('--complet', action='store_true', help="Recalcule tout l'historique.")
+
+    def handle(self, *args, **options):
+        ecoles = Ecole.objects.filter(deleted_at__isnull=True).order_by('pk')
+        if options['ecole']:
+            ecoles = ecoles.filter(pk=options['ecole'])
+        for ecole in ecoles:
+            start = time.perf_counter()
+            totals = tendances.instantanes(ecole, complet=options['complet'])
+            details = ', '.join(f"{total} {indicateur}" for indicateur, total in sorted(totals.items())) or "aucun point"
+            self.stdout.write(self.style.SUCCESS(f"{ecole} : {details} en {time.perf_counter() - start:.2f} s"))
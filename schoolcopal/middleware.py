@@ -0,0 +1,125 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from . import profiling
+from .models import Eleve, Enseignant
+from .tenancy import resolve_ecole
+
+
+class RoleProfile:
+    """
+    Profil métier de l'utilisateur courant, résolu une seule fois par requête.
+    Chaque attribut n'est calculé qu'au premier accès.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+        self.role = self.user.role if self.user.is_authenticated else None
+
+    @cached_property
+    def enseignant(self):
+        """Profil Enseignant (chargé avec l'utilisateur mis en cache)."""
+        if self.role != 'enseignant':
+            return None
+        try:
+            return self.user.enseignant_profile
+        except Enseignant.DoesNotExist:
+            return None
+
+    @cached_property
+    def classe(self):
+        """Classe assignée à l'enseignant."""
+        return self.enseignant.classe if self.enseignant else None
+
+    @cached_property
+    def enfants(self):
+        """Enfants du parent, avec leur classe."""
+        if self.role != 'parent':
+            return []
+        return list(
+            Eleve.objects.filter(parent_id=self.user, deleted_at__isnull=True).select_related('classe')
+        )
+
+    @cached_property
+    def enfants_ids(self):
+        return [enfant.id for enfant in self.enfants]
+
+    @cached_property
+    def ecole(self):
+        """École courante (voir TenantMiddleware)."""
+        return self.request.ecole
+
+
+class RoleProfileMiddleware(MiddlewareMixin):
+    """
+    Attache request.profile (RoleProfile paresseux) à chaque requête.
+    Synchrone et asynchrone : aucun passage par un thread sous ASGI.
+    """
+
+    def process_request(self, request):
+        request.profile = SimpleLazyObject(lambda: RoleProfile(request))
+
+
+class TenantMiddleware(MiddlewareMixin):
+    """
+    Attache request.ecole, l'école servie par la requête, résolue au premier accès
+    depuis le cache (hôte, puis école de l'utilisateur, puis école par défaut).
+    """
+
+    def process_request(self, request):
+        request.ecole = SimpleLazyObject(lambda: resolve_ecole(request))
+
+
+class QueryProfilingMiddleware:
+    """
+    Mesure, par nom d'URL, le nombre de requêtes SQL, le temps base de données,
+    les formes de requêtes dupliquées et les temps de vue et de rendu.
+    Désactivé sauf si settings.QUERY_PROFILING est vrai.
+    Le temps de rendu n'est isolé que pour les TemplateResponse (vues classes) ;
+    pour les vues utilisant render(), il est compté dans le temps de vue.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = profiling.RequestProfile()
+        request.query_profile = profile
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        profile.view_time = time.perf_counter() - start - profile.render_time
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        url_name = match.view_name
+        profiling.store.record(url_name, profile)
+        budget = getattr(match.func, 'query_budget', None)
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name, budget)
+        profiling.check_budget(url_name, budget, profile)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = profile.query_count
+            response['X-Query-Time-Ms'] = f"{profile.db_time * 1000:.2f}"
+            response['X-Query-Duplicates'] = len(profile.duplicates())
+            response['X-View-Time-Ms'] = f"{profile.view_time * 1000:.2f}"
+            response['X-Render-Time-Ms'] = f"{profile.render_time * 1000:.2f}"
+        return response
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+        response.render()
+        request.query_profile.render_time = time.perf_counter() - start
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-19 00:58
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0004_note_sequence_alter_user_telephone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='telephone',
+            field=models.CharField(blank=True, max_length=15, validators=[django.core.validators.RegexValidator(message='Format téléphone camerounais : +237XXXXXXXX', regex='^\\6\\d{8}$')], verbose_name='Téléphone'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='note',
+            unique_together={('eleve', 'matiere', 'trimestre', 'sequence')},
+        ),
+    ]
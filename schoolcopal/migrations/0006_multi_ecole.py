@@ -0,0 +1,73 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import schoolcopal.models
+
+
+def rattacher_ecoles(apps, schema_editor):
+    """Rattache les utilisateurs et enseignants existants à leur école."""
+    User = apps.get_model('schoolcopal', 'User')
+    Ecole = apps.get_model('schoolcopal', 'Ecole')
+    Eleve = apps.get_model('schoolcopal', 'Eleve')
+    Enseignant = apps.get_model('schoolcopal', 'Enseignant')
+
+    for enseignant in Enseignant.objects.filter(classe__isnull=False).select_related('classe'):
+        Enseignant.objects.filter(pk=enseignant.pk).update(ecole_id=enseignant.classe.ecole_id)
+        User.objects.filter(pk=enseignant.user_id).update(ecole_id=enseignant.classe.ecole_id)
+    for parent_id, ecole_id in Eleve.objects.values_list('parent_id_id', 'ecole_id').distinct():
+        User.objects.filter(pk=parent_id, ecole__isnull=True).update(ecole_id=ecole_id)
+
+    # Jusqu'ici l'application ne gérait qu'une école : le reste lui appartient
+    ecole = Ecole.objects.filter(deleted_at__isnull=True).order_by('id').first()
+    if ecole:
+        User.objects.filter(ecole__isnull=True).exclude(is_superuser=True).update(ecole=ecole)
+        Enseignant.objects.filter(ecole__isnull=True).update(ecole=ecole)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0005_note_unique_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', schoolcopal.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ecole',
+            name='domaine',
+            field=models.CharField(blank=True, db_index=True, help_text='Hôte servant cette école (ex. ecole1.copalschool.cm), vide si aucun.', max_length=255, verbose_name='Nom de domaine'),
+        ),
+        migrations.AddField(
+            model_name='enseignant',
+            name='ecole',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='enseignants', to='schoolcopal.ecole', verbose_name='École'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='ecole',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='utilisateurs', to='schoolcopal.ecole', verbose_name='École'),
+        ),
+        migrations.AddIndex(
+            model_name='classescolaire',
+            index=models.Index(fields=['ecole', 'deleted_at'], name='schoolcopal_ecole_i_993519_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eleve',
+            index=models.Index(fields=['ecole', 'deleted_at'], name='schoolcopal_ecole_i_29d9f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enseignant',
+            index=models.Index(fields=['ecole', 'deleted_at'], name='schoolcopal_ecole_i_95a694_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['ecole', 'role'], name='schoolcopal_ecole_i_8c50bc_idx'),
+        ),
+        migrations.RunPython(rattacher_ecoles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0006_multi_ecole'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='schoolcopal_ecole_i_8c50bc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='eleve',
+            index=models.Index(fields=['ecole', 'nom', 'prenom', 'id'], name='schoolcopal_ecole_i_13411d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['ecole', 'role', 'username', 'id'], name='schoolcopal_ecole_i_13902b_idx'),
+        ),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:19
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'schoolcopal_searchentry_fts'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        texte, content='schoolcopal_searchentry', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2", prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER schoolcopal_searchentry_ai AFTER INSERT ON schoolcopal_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+    f"""CREATE TRIGGER schoolcopal_searchentry_ad AFTER DELETE ON schoolcopal_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texte) VALUES ('delete', old.id, old.texte);
+    END""",
+    f"""CREATE TRIGGER schoolcopal_searchentry_au AFTER UPDATE ON schoolcopal_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, texte) VALUES ('delete', old.id, old.texte);
+        INSERT INTO {FTS_TABLE}(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS schoolcopal_searchentry_au",
+    "DROP TRIGGER IF EXISTS schoolcopal_searchentry_ad",
+    "DROP TRIGGER IF EXISTS schoolcopal_searchentry_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX schoolcopal_searchentry_texte_trgm ON schoolcopal_searchentry USING gin (texte gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = ["DROP INDEX IF EXISTS schoolcopal_searchentry_texte_trgm"]
+
+
+def run(statements):
+    """Exécute les instructions propres à la base courante (FTS5 ou pg_trgm)."""
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+# Copie figée des fonctions pures de schoolcopal.utils et schoolcopal.search : la migration
+# ne dépend pas du code courant, qui peut changer après elle
+
+APOSTROPHES = re.compile(r"['’ʼ`]")
+BATCH_SIZE = 2000
+
+
+def normaliser(texte):
+    decompose = unicodedata.normalize('NFKD', APOSTROPHES.sub('', texte or ''))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', sans_accents.lower()).split())
+
+
+def texte_indexe(*champs):
+    texte = ' '.join(filter(None, champs))
+    mots = normaliser(texte).split() + normaliser(APOSTROPHES.sub(' ', texte)).split()
+    return ' ' + ' '.join(dict.fromkeys(mots))
+
+
+def texte_eleve(eleve, parent):
+    champs = [eleve.prenom, eleve.nom]
+    if parent is not None:
+        champs += [parent.username, parent.email, parent.telephone]
+    return texte_indexe(*champs)
+
+
+def texte_user(user):
+    return texte_indexe(user.username, user.first_name, user.last_name, user.email, user.telephone)
+
+
+def libelle_user(user):
+    nom = f"{user.first_name} {user.last_name}".strip()
+    return f"{nom} ({user.username})" if nom else user.username
+
+
+def remplir_index(apps, schema_editor):
+    """Indexe les élèves, parents et enseignants existants, par lots comme search.rebuild()."""
+    SearchEntry = apps.get_model('schoolcopal', 'SearchEntry')
+    Eleve = apps.get_model('schoolcopal', 'Eleve')
+    User = apps.get_model('schoolcopal', 'User')
+
+    def entry_for_eleve(eleve):
+        return SearchEntry(
+            kind='eleve', object_id=eleve.pk, ecole_id=eleve.ecole_id,
+            libelle=f"{eleve.prenom} {eleve.nom}", texte=texte_eleve(eleve, eleve.parent_id),
+        )
+
+    def entry_for_user(user):
+        return SearchEntry(
+            kind=user.role, object_id=user.pk, ecole_id=user.ecole_id,
+            libelle=libelle_user(user), texte=texte_user(user),
+        )
+
+    eleves = Eleve.objects.filter(deleted_at__isnull=True).select_related('parent_id').order_by('pk')
+    users = User.objects.filter(role__in=['parent', 'enseignant'], deleted_at__isnull=True).order_by('pk')
+    for source, build in ((eleves, entry_for_eleve), (users, entry_for_user)):
+        batch = []
+        for obj in source.iterator(chunk_size=BATCH_SIZE):
+            batch.append(build(obj))
+            if len(batch) == BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('eleve', 'Élève'), ('parent', 'Parent'), ('enseignant', 'Enseignant')], max_length=20, verbose_name='Type')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Identifiant')),
+                ('libelle', models.CharField(max_length=255, verbose_name='Libellé')),
+                ('texte', models.TextField(verbose_name='Texte indexé')),
+                ('ecole', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='schoolcopal.ecole', verbose_name='École')),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+                'indexes': [models.Index(fields=['ecole', 'kind'], name='schoolcopal_ecole_i_1999ff_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+        migrations.RunPython(remplir_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='frequence',
+            index=models.Index(fields=['date'], name='schoolcopal_date_458787_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='schoolcopal_created_9a18d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paiement',
+            index=models.Index(fields=['date_paiement'], name='schoolcopal_date_pa_f1646e_idx'),
+        ),
+    ]
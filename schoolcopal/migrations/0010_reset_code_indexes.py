@@ -0,0 +1,21 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0009_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passwordresetcode',
+            index=models.Index(fields=['user', 'expires_at'], name='schoolcopal_user_id_fcfc1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetcode',
+            index=models.Index(fields=['expires_at'], name='schoolcopal_expires_e101a1_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0010_reset_code_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emploidutemps',
+            name='matiere',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emplois', to='schoolcopal.matiere', verbose_name='Matière'),
+        ),
+        migrations.AddField(
+            model_name='matiere',
+            name='heures_hebdo',
+            field=models.PositiveSmallIntegerField(default=3, help_text="Quota hebdomadaire utilisé par le générateur d'emploi du temps.", verbose_name='Heures par semaine'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def fill_heure_fin(apps, schema_editor):
+    """
+    Cours existants : une heure, comme les créneaux du générateur, raccourcie au début du
+    cours suivant de la même salle ou de la même classe. Les cours saisis à la main à la
+    même heure dans une même salle ou classe ne peuvent être réparés : ils sont signalés.
+    """
+    EmploiDuTemps = apps.get_model('schoolcopal', 'EmploiDuTemps')
+    emplois = list(
+        EmploiDuTemps.objects.filter(heure_fin__isnull=True)
+        .only('pk', 'heure', 'jour', 'salle', 'deleted_at', 'classe__ecole')
+        .select_related('classe')
+    )
+    ressources = defaultdict(list)
+    for emploi in emplois:
+        emploi.heure_fin = (datetime.combine(date.min, emploi.heure) + timedelta(hours=1)).time()
+        if emploi.deleted_at is None:
+            salle = ' '.join(emploi.salle.split()).casefold()
+            ressources['salle', emploi.classe.ecole_id, salle, emploi.jour].append(emploi)
+            ressources['classe', emploi.classe_id, emploi.jour].append(emploi)
+    doublons = set()
+    for cours in ressources.values():
+        cours.sort(key=lambda emploi: (emploi.heure, emploi.pk))
+        for emploi, suivant in zip(cours, cours[1:]):
+            if suivant.heure == emploi.heure:
+                doublons.update((emploi.pk, suivant.pk))
+            elif suivant.heure < emploi.heure_fin:
+                emploi.heure_fin = suivant.heure
+    EmploiDuTemps.objects.bulk_update(emplois, ['heure_fin'], batch_size=2000)
+    if doublons:
+        logger.warning(
+            "%d cours à la même heure dans une même salle ou classe, à corriger : EmploiDuTemps %s",
+            len(doublons), sorted(doublons),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0011_timetable_generator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emploidutemps',
+            name='heure_fin',
+            field=models.TimeField(null=True, verbose_name='Heure de fin'),
+        ),
+        migrations.RunPython(fill_heure_fin, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='emploidutemps',
+            name='heure_fin',
+            field=models.TimeField(verbose_name='Heure de fin'),
+        ),
+        migrations.AddIndex(
+            model_name='emploidutemps',
+            index=models.Index(fields=['salle', 'jour', 'heure'], name='schoolcopal_salle_a802bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emploidutemps',
+            index=models.Index(fields=['classe', 'jour', 'heure'], name='schoolcopal_classe__28edd8_idx'),
+        ),
+    ]
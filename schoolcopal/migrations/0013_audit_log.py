@@ -0,0 +1,35 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:48
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0012_timetable_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50, verbose_name='Modèle')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Identifiant')),
+                ('action', models.CharField(choices=[('create', 'Création'), ('update', 'Modification'), ('delete', 'Suppression')], max_length=10, verbose_name='Action')),
+                ('changes', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Modifications')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Auteur')),
+            ],
+            options={
+                'verbose_name': "Journal d'audit",
+                'verbose_name_plural': "Journal d'audit",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['model', 'object_id', 'created_at'], name='schoolcopal_model_f2f32f_idx'), models.Index(fields=['created_at'], name='schoolcopal_created_ae3afb_idx')],
+            },
+        ),
+    ]
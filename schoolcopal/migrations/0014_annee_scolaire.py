@@ -0,0 +1,145 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:50
+
+from datetime import date, timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def rattacher_annee_courante(apps, schema_editor):
+    """Une année en cours par école ; les lignes existantes y sont rattachées."""
+    AnneeScolaire = apps.get_model('schoolcopal', 'AnneeScolaire')
+    Ecole = apps.get_model('schoolcopal', 'Ecole')
+    today = timezone.localdate()
+    annee = today.year if today.month >= 9 else today.year - 1
+    for ecole_id in Ecole.objects.values_list('pk', flat=True):
+        courante = AnneeScolaire.objects.create(
+            ecole_id=ecole_id, libelle=f"{annee}-{annee + 1}", active=True,
+            debut=date(annee, 9, 1), fin=date(annee + 1, 9, 1) - timedelta(days=1),
+        )
+        for name in ('Note', 'Frequence', 'Paiement'):
+            apps.get_model('schoolcopal', name).objects.filter(eleve__ecole_id=ecole_id).update(annee=courante)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0013_audit_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnneeScolaire',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de suppression')),
+                ('libelle', models.CharField(max_length=20, verbose_name='Libellé')),
+                ('debut', models.DateField(verbose_name='Début')),
+                ('fin', models.DateField(verbose_name='Fin')),
+                ('active', models.BooleanField(default=False, verbose_name='Année en cours')),
+                ('cloturee', models.BooleanField(default=False, verbose_name='Clôturée')),
+                ('archivee_le', models.DateTimeField(blank=True, null=True, verbose_name='Archivée le')),
+                ('ecole', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annees', to='schoolcopal.ecole', verbose_name='École')),
+            ],
+            options={
+                'verbose_name': 'Année scolaire',
+                'verbose_name_plural': 'Années scolaires',
+                'ordering': ['-debut'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='note',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='frequence',
+            name='annee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)ss', to='schoolcopal.anneescolaire', verbose_name='Année scolaire'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='annee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)ss', to='schoolcopal.anneescolaire', verbose_name='Année scolaire'),
+        ),
+        migrations.AddField(
+            model_name='paiement',
+            name='annee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)ss', to='schoolcopal.anneescolaire', verbose_name='Année scolaire'),
+        ),
+        migrations.RunPython(rattacher_annee_courante, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='note',
+            unique_together={('eleve', 'matiere', 'trimestre', 'sequence', 'annee')},
+        ),
+        migrations.CreateModel(
+            name='PaiementArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(verbose_name='Date de modification')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de suppression')),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Montant')),
+                ('date_paiement', models.DateField(verbose_name='Date de paiement')),
+                ('statut', models.CharField(max_length=20, verbose_name='Statut')),
+                ('mode', models.CharField(max_length=20, verbose_name='Mode de paiement')),
+                ('annee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolcopal.anneescolaire', verbose_name='Année scolaire')),
+                ('eleve', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schoolcopal.eleve', verbose_name='Élève')),
+            ],
+            options={
+                'verbose_name': 'Paiement archivé',
+                'verbose_name_plural': 'Paiements archivés',
+                'indexes': [models.Index(fields=['annee', 'eleve'], name='schoolcopal_annee_i_d940cc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NoteArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(verbose_name='Date de modification')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de suppression')),
+                ('valeur', models.DecimalField(decimal_places=2, max_digits=4, verbose_name='Note (0-20)')),
+                ('trimestre', models.IntegerField(verbose_name='Trimestre')),
+                ('sequence', models.IntegerField(blank=True, null=True)),
+                ('annee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolcopal.anneescolaire', verbose_name='Année scolaire')),
+                ('eleve', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schoolcopal.eleve', verbose_name='Élève')),
+                ('enseignant', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schoolcopal.enseignant', verbose_name='Enseignant')),
+                ('matiere', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schoolcopal.matiere', verbose_name='Matière')),
+            ],
+            options={
+                'verbose_name': 'Note archivée',
+                'verbose_name_plural': 'Notes archivées',
+                'indexes': [models.Index(fields=['annee', 'eleve'], name='schoolcopal_annee_i_5bc9f4_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FrequenceArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(verbose_name='Date de modification')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de suppression')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('present', models.BooleanField(verbose_name='Présent')),
+                ('raison_absence', models.TextField(blank=True, verbose_name='Raison absence')),
+                ('annee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='schoolcopal.anneescolaire', verbose_name='Année scolaire')),
+                ('eleve', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schoolcopal.eleve', verbose_name='Élève')),
+            ],
+            options={
+                'verbose_name': 'Fréquentation archivée',
+                'verbose_name_plural': 'Fréquentations archivées',
+                'indexes': [models.Index(fields=['annee', 'eleve'], name='schoolcopal_annee_i_5fc60b_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='anneescolaire',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True)), fields=('ecole',), name='annee_active_unique'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='anneescolaire',
+            unique_together={('ecole', 'libelle')},
+        ),
+    ]
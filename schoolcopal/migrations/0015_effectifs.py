@@ -0,0 +1,62 @@
+# Generated by Django 4.2.24 on 2026-10-19 01:57
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def compter_effectifs(apps, schema_editor):
+    """Effectifs initiaux des écoles et des classes."""
+    Eleve = apps.get_model('schoolcopal', 'Eleve')
+    for name, lookup in (('Ecole', 'ecole'), ('ClasseScolaire', 'classe')):
+        apps.get_model('schoolcopal', name).objects.update(**{
+            champ: Coalesce(Subquery(
+                Eleve.objects.filter(condition, deleted_at__isnull=True, **{lookup: OuterRef('pk')})
+                .order_by().values(lookup).annotate(nombre=Count('pk')).values('nombre'),
+                output_field=IntegerField(),
+            ), Value(0))
+            for champ, condition in (
+                ('effectif', Q()), ('effectif_garcons', Q(sexe='garcon')), ('effectif_filles', Q(sexe='fille')),
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0014_annee_scolaire'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classescolaire',
+            name='effectif',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Élèves inscrits'),
+        ),
+        migrations.AddField(
+            model_name='classescolaire',
+            name='effectif_filles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Filles inscrites'),
+        ),
+        migrations.AddField(
+            model_name='classescolaire',
+            name='effectif_garcons',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Garçons inscrits'),
+        ),
+        migrations.AddField(
+            model_name='ecole',
+            name='effectif',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Élèves inscrits'),
+        ),
+        migrations.AddField(
+            model_name='ecole',
+            name='effectif_filles',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Filles inscrites'),
+        ),
+        migrations.AddField(
+            model_name='ecole',
+            name='effectif_garcons',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Garçons inscrits'),
+        ),
+        migrations.RunPython(compter_effectifs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.24 on 2026-10-19 02:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0015_effectifs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicateur', models.CharField(choices=[('effectif', 'Élèves inscrits par mois'), ('paiements', 'Paiements encaissés par semaine'), ('moyenne', 'Moyenne des notes par séquence'), ('absences', "Taux d'absence par semaine")], max_length=20, verbose_name='Indicateur')),
+                ('periode', models.DateField(verbose_name='Période')),
+                ('rang', models.PositiveSmallIntegerField(default=0, verbose_name='Rang')),
+                ('valeur', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Valeur')),
+                ('effectif', models.PositiveIntegerField(default=0, verbose_name='Lignes agrégées')),
+                ('calcule_le', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Calculé le')),
+                ('ecole', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tendances', to='schoolcopal.ecole', verbose_name='École')),
+            ],
+            options={
+                'verbose_name': 'Tendance',
+                'verbose_name_plural': 'Tendances',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tendance',
+            constraint=models.UniqueConstraint(fields=('ecole', 'indicateur', 'periode', 'rang'), name='tendance_unique'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.24 on 2026-10-19 02:24
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def normaliser_salles(apps, schema_editor):
+    """Espaces superflus retirés, comme à l'enregistrement : le contrôle des conflits compare lower(salle)."""
+    EmploiDuTemps = apps.get_model('schoolcopal', 'EmploiDuTemps')
+    emplois = []
+    for emploi in EmploiDuTemps.objects.only('pk', 'salle').iterator(chunk_size=2000):
+        salle = ' '.join(emploi.salle.split())
+        if salle != emploi.salle:
+            emploi.salle = salle
+            emplois.append(emploi)
+    EmploiDuTemps.objects.bulk_update(emplois, ['salle'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0016_tendances'),
+    ]
+
+    operations = [
+        migrations.RunPython(normaliser_salles, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='emploidutemps',
+            name='schoolcopal_salle_a802bf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='emploidutemps',
+            index=models.Index(django.db.models.functions.text.Lower('salle'), models.F('jour'), models.F('heure'), name='emploi_salle_jour_heure'),
+        ),
+    ]
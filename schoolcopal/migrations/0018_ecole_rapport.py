@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0017_timetable_salle_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecole',
+            name='rapport',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Rapport'),
+        ),
+        migrations.AddField(
+            model_name='ecole',
+            name='rapport_le',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Rapport calculé le'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.24 on 2026-10-19 03:05
+
+from django.db import migrations, models
+import schoolcopal.models
+
+
+def cle_salle(salle):
+    """Copie figée de models.cle_salle : la migration ne suit pas les évolutions du modèle."""
+    return ' '.join(salle.split()).casefold()
+
+
+def remplir_salle_cle(apps, schema_editor):
+    EmploiDuTemps = apps.get_model('schoolcopal', 'EmploiDuTemps')
+    emplois = []
+    for emploi in EmploiDuTemps.objects.only('pk', 'salle').iterator(chunk_size=2000):
+        emploi.salle_cle = cle_salle(emploi.salle)
+        emplois.append(emploi)
+    EmploiDuTemps.objects.bulk_update(emplois, ['salle_cle'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schoolcopal', '0018_ecole_rapport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emploidutemps',
+            name='salle_cle',
+            field=schoolcopal.models.CleSalleField(default='', editable=False, max_length=50),
+            preserve_default=False,
+        ),
+        migrations.RunPython(remplir_salle_cle, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='emploidutemps',
+            name='emploi_salle_jour_heure',
+        ),
+        migrations.AddIndex(
+            model_name='emploidutemps',
+            index=models.Index(fields=['salle_cle', 'jour', 'heure'], name='emploi_salle_jour_heure'),
+        ),
+    ]
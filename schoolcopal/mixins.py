@@ -0,0 +1,141 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import redirect, render
+
+from . import ratelimit, search
+
+
+def has_role_access(request, roles):
+    """Bon rôle, et utilisateur rattaché à l'école servie (ou à aucune école)."""
+    user = request.user
+    if user.role not in roles:
+        return False
+    return not user.ecole_id or user.ecole_id == request.ecole.pk
+
+
+class RoleRequiredMixin(LoginRequiredMixin):
+    """
+    Restreint une vue aux rôles listés dans allowed_roles.
+    Les utilisateurs connectés sans le bon rôle sont renvoyés vers la connexion.
+    """
+    allowed_roles = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not has_role_access(request, self.allowed_roles):
+            return redirect('schoolcopal:login')
+        return super().dispatch(request, *args, **kwargs)
+
+
+class AdminRequiredMixin(RoleRequiredMixin):
+    allowed_roles = ('admin',)
+
+
+class EnseignantRequiredMixin(RoleRequiredMixin):
+    allowed_roles = ('enseignant',)
+
+
+class RateLimitMixin:
+    """
+    Refuse (429) les POST au-delà de settings.RATE_LIMITS[ratelimit_scope], comptés par IP
+    et par valeur du champ ratelimit_field, avant tout traitement du formulaire.
+    """
+    ratelimit_scope = None
+    ratelimit_field = None
+
+    def get_ratelimit_idents(self, request):
+        idents = [f"ip:{ratelimit.client_ip(request)}"]
+        if self.ratelimit_field and request.POST.get(self.ratelimit_field):
+            idents.append(f"{self.ratelimit_field}:{request.POST[self.ratelimit_field]}")
+        return idents
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            retry_after = ratelimit.hit(self.ratelimit_scope, self.get_ratelimit_idents(request))
+            if retry_after:
+                response = render(request, 'authentication/rate_limited.html',
+                                  {'retry_minutes': -(-retry_after // 60)}, status=429)
+                response['Retry-After'] = str(retry_after)
+                return response
+        return super().dispatch(request, *args, **kwargs)
+
+
+class EcoleScopedMixin:
+    """Limite les objets d'une vue générique à l'école de la requête (request.ecole)."""
+
+    def get_queryset(self):
+        return super().get_queryset().for_ecole(self.request.ecole)
+
+
+class EcoleScopedFormMixin(EcoleScopedMixin):
+    """EcoleScopedMixin qui transmet aussi l'école au formulaire (EcoleFormMixin)."""
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['ecole'] = self.request.ecole
+        return kwargs
+
+
+class IndexedSearchListMixin:
+    """
+    Filtre une ListView par ?q= via l'index de recherche (schoolcopal/search.py) :
+    search_kind est le type d'entrée, search_lookup le champ comparé à son object_id.
+    """
+    search_kind = None
+    search_lookup = 'pk'
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query = self.get_search_query()
+        if query:
+            ids = search.object_ids(query, self.search_kind, self.request.ecole)
+            queryset = queryset.filter(**{f"{self.search_lookup}__in": ids})
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.get_search_query()
+        return context
+
+
+def role_required(*roles):
+    """Équivalent de RoleRequiredMixin pour les vues fonctions."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if not has_role_access(request, roles):
+                return redirect('schoolcopal:login')
+            return view_func(request, *args, **kwargs)
+        return login_required(_wrapped)
+    return decorator
+
+
+def async_role_required(*roles):
+    """
+    role_required pour les vues async. L'utilisateur, son rôle et l'école de la requête
+    sont résolus dans un thread (accès base et session synchrones), puis la vue
+    s'exécute dans la boucle d'événements.
+    """
+    def check(request):
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not has_role_access(request, roles):
+            return redirect('schoolcopal:login')
+        request.ecole.pk  # résolue ici plutôt que dans la boucle d'événements
+        return None
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped(request, *args, **kwargs):
+            refus = await sync_to_async(check)(request)
+            if refus is not None:
+                return refus
+            return await view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
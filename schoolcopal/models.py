@@ -1,15 +1,36 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
 import uuid
+from datetime import date, timedelta
+from django.core.cache import cache
+
+
+class EcoleQuerySet(models.QuerySet):
+    """
+    QuerySet multi-écoles : chaque modèle déclare dans ecole_lookup
+    le chemin vers son école (ex. 'ecole', 'classe__ecole', 'eleve__ecole').
+    """
+
+    def for_ecole(self, ecole):
+        return self.filter(**{self.model.ecole_lookup: ecole})
+
+
+class UserManager(BaseUserManager.from_queryset(EcoleQuerySet)):
+    pass
 
 
 class BaseModel(models.Model):
@@ -57,10 +78,25 @@ class User(AbstractUser, BaseModel):
         validators=[RegexValidator(regex=r'^\6\d{8}$', message=_("Format téléphone camerounais : +237XXXXXXXX"))],
         verbose_name=_("Téléphone")
     )
+    ecole = models.ForeignKey(
+        'Ecole',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='utilisateurs',
+        verbose_name=_("École")
+    )
+
+    objects = UserManager()
+    ecole_lookup = 'ecole'
 
     class Meta:
         verbose_name = _("Utilisateur")
         verbose_name_plural = _("Utilisateurs")
+        indexes = [
+            # Couvre le filtre par rôle et la pagination par curseur sur username
+            models.Index(fields=['ecole', 'role', 'username', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -90,6 +126,20 @@ class Ecole(BaseModel):
         verbose_name=_("Type d'école")
     )
     nombre_classes = models.IntegerField(default=6, verbose_name=_("Nombre de classes"))
+    domaine = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        verbose_name=_("Nom de domaine"),
+        help_text=_("Hôte servant cette école (ex. ecole1.copalschool.cm), vide si aucun.")
+    )
+    # Élèves actifs, tenus à jour par Eleve.save (schoolcopal/effectifs.py pour le recalcul)
+    effectif = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Élèves inscrits"))
+    effectif_garcons = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Garçons inscrits"))
+    effectif_filles = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Filles inscrites"))
+    # Rapport de la nuit (tasks.generate_school_report), lu par le tableau de bord directeur
+    rapport = models.JSONField(null=True, blank=True, editable=False, verbose_name=_("Rapport"))
+    rapport_le = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Rapport calculé le"))
 
     class Meta:
         verbose_name = _("École")
@@ -99,8 +149,7 @@ class Ecole(BaseModel):
         return self.nom
 
     def generate_rapport(self):
-        total_eleves = self.eleves.filter(deleted_at__isnull=True).count()
-        return {"nom": self.nom, "total_eleves": total_eleves}
+        return {"nom": self.nom, "total_eleves": self.effectif}
     
     @classmethod
     def get_default_ecole(cls):
@@ -115,6 +164,100 @@ class Ecole(BaseModel):
         return ecole
 
 
+class AnneeScolaire(BaseModel):
+    """
+    Année scolaire d'une école. Les notes, présences et paiements y sont rattachés ;
+    une année clôturée peut être archivée (schoolcopal/archives.py), ses lignes passant
+    des tables courantes aux tables d'archive, consultables en lecture seule.
+    """
+    ecole = models.ForeignKey(Ecole, on_delete=models.CASCADE, related_name='annees', verbose_name=_("École"))
+    libelle = models.CharField(max_length=20, verbose_name=_("Libellé"))
+    debut = models.DateField(verbose_name=_("Début"))
+    fin = models.DateField(verbose_name=_("Fin"))
+    active = models.BooleanField(default=False, verbose_name=_("Année en cours"))
+    cloturee = models.BooleanField(default=False, verbose_name=_("Clôturée"))
+    archivee_le = models.DateTimeField(null=True, blank=True, verbose_name=_("Archivée le"))
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'ecole'
+
+    # Mois de la rentrée
+    RENTREE = 9
+
+    class Meta:
+        verbose_name = _("Année scolaire")
+        verbose_name_plural = _("Années scolaires")
+        ordering = ['-debut']
+        unique_together = ['ecole', 'libelle']
+        constraints = [
+            models.UniqueConstraint(fields=['ecole'], condition=models.Q(active=True), name='annee_active_unique'),
+        ]
+
+    def __str__(self):
+        return self.libelle
+
+    def clean(self):
+        super().clean()
+        if self.active and self.cloturee:
+            raise ValidationError(_("L'année en cours ne peut pas être clôturée."))
+
+    @classmethod
+    def bornes(cls, jour):
+        """(libellé, début, fin) de l'année scolaire contenant ce jour."""
+        annee = jour.year if jour.month >= cls.RENTREE else jour.year - 1
+        debut = date(annee, cls.RENTREE, 1)
+        return f"{annee}-{annee + 1}", debut, date(annee + 1, cls.RENTREE, 1) - timedelta(days=1)
+
+    @classmethod
+    def active_id(cls, ecole_id):
+        """Identifiant de l'année en cours de l'école, mis en cache ; créée si elle manque."""
+        if ecole_id is None:
+            return None
+        key = cls.active_cache_key(ecole_id)
+        annee_id = cache.get(key)
+        if annee_id is None:
+            annee_id = cls.objects.filter(ecole_id=ecole_id, active=True).values_list('pk', flat=True).first()
+            if annee_id is None:
+                libelle, debut, fin = cls.bornes(timezone.localdate())
+                annee_id = cls.objects.get_or_create(
+                    ecole_id=ecole_id, libelle=libelle, defaults={'debut': debut, 'fin': fin, 'active': True},
+                )[0].pk
+            cache.set(key, annee_id, settings.TENANT_CACHE_TIMEOUT)
+        return annee_id
+
+    @staticmethod
+    def active_cache_key(ecole_id):
+        return f"annee:active:{ecole_id}"
+
+
+class AnneeQuerySet(EcoleQuerySet):
+    """QuerySet des modèles rattachés à une année scolaire."""
+
+    def annee_active(self):
+        """Lignes de l'année en cours de leur école (filtre par défaut des tableaux de bord)."""
+        return self.filter(annee__active=True)
+
+
+class AnneeModel(BaseModel):
+    """Modèle rattaché à une année scolaire : par défaut l'année en cours de l'école de l'élève."""
+    annee = models.ForeignKey(
+        AnneeScolaire,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='%(class)ss',
+        verbose_name=_("Année scolaire")
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.annee_id is None and self.eleve_id:
+            self.annee_id = AnneeScolaire.active_id(self.eleve.ecole_id)
+        super().save(*args, **kwargs)
+
+
 class ClasseScolaire(BaseModel):
     ecole = models.ForeignKey(Ecole, on_delete=models.CASCADE, related_name='classes', verbose_name=_("École"))
     niveau = models.CharField(
@@ -124,7 +267,13 @@ class ClasseScolaire(BaseModel):
     )
     section = models.CharField(max_length=5, blank=True, verbose_name=_("Section"))
     capacite = models.IntegerField(default=50, verbose_name=_("Capacité"))
-    
+    effectif = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Élèves inscrits"))
+    effectif_garcons = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Garçons inscrits"))
+    effectif_filles = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Filles inscrites"))
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'ecole'
+
     def get_eleves(self):
        
         return self.eleves.filter(deleted_at__isnull=True)
@@ -137,6 +286,7 @@ class ClasseScolaire(BaseModel):
         verbose_name = _("Classe Scolaire")
         verbose_name_plural = _("Classes Scolaires")
         unique_together = ['ecole', 'niveau', 'section']
+        indexes = [models.Index(fields=['ecole', 'deleted_at'])]
 
     def __str__(self):
         return f"{self.get_niveau_display()} {self.section or ''}"
@@ -151,6 +301,14 @@ class Matiere(BaseModel):
     )
     nom = models.CharField(max_length=100, verbose_name=_("Nom de la matière"))
     description = models.TextField(blank=True, verbose_name=_("Description"))
+    heures_hebdo = models.PositiveSmallIntegerField(
+        default=3,
+        verbose_name=_("Heures par semaine"),
+        help_text=_("Quota hebdomadaire utilisé par le générateur d'emploi du temps.")
+    )
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'classe__ecole'
 
     class Meta:
         verbose_name = _("Matière")
@@ -188,13 +346,67 @@ class Eleve(BaseModel):
         verbose_name=_("Parent")
     )
 
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'ecole'
+
+    # Inscription comptée dans les effectifs : (ecole_id, classe_id, sexe), None si supprimé
+    INSCRIPTION_FIELDS = {'ecole_id', 'classe_id', 'sexe', 'deleted_at'}
+    INCONNUE = object()
+
     class Meta:
         verbose_name = _("Élève")
         verbose_name_plural = _("Élèves")
+        indexes = [
+            models.Index(fields=['ecole', 'deleted_at']),
+            # Pagination par curseur de la liste des élèves
+            models.Index(fields=['ecole', 'nom', 'prenom', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.prenom} {self.nom}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._inscription = instance.inscription() if cls.INSCRIPTION_FIELDS <= set(field_names) else cls.INCONNUE
+        return instance
+
+    def inscription(self):
+        return (self.ecole_id, self.classe_id, self.sexe) if self.deleted_at is None else None
+
+    def save(self, *args, **kwargs):
+        """Inscription, transfert ou suppression logique : effectifs ajustés dans la même transaction."""
+        with transaction.atomic():
+            avant = getattr(self, '_inscription', None)
+            if avant is self.INCONNUE:
+                avant = Eleve.objects.get(pk=self.pk).inscription()
+            super().save(*args, **kwargs)
+            self._inscription = self.inscription()
+            self.ajuster_effectifs(avant, self._inscription)
+
+    @staticmethod
+    def ajuster_effectifs(avant, apres):
+        """Retire avant des compteurs de l'école et de la classe, y ajoute apres, par F()."""
+        if avant == apres:
+            return
+        deltas = defaultdict(Counter)
+        for inscription, signe in ((avant, -1), (apres, 1)):
+            if inscription is None:
+                continue
+            ecole_id, classe_id, sexe = inscription
+            champ = 'effectif_garcons' if sexe == 'garcon' else 'effectif_filles'
+            for model, pk in ((Ecole, ecole_id), (ClasseScolaire, classe_id)):
+                if pk is not None:
+                    deltas[model, pk]['effectif'] += signe
+                    deltas[model, pk][champ] += signe
+        for (model, pk), champs in deltas.items():
+            changes = {
+                champ: F(champ) + delta if delta > 0 else Greatest(F(champ) + delta, Value(0))
+                for champ, delta in champs.items() if delta
+            }
+            if changes:
+                model.objects.filter(pk=pk).update(**changes)
+
 
 class Enseignant(BaseModel):
     """Profil Enseignant lié à un User avec role='enseignant'."""
@@ -208,31 +420,54 @@ class Enseignant(BaseModel):
         verbose_name=_("Classe assignée")
     )
     salaire = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name=_("Salaire"))
+    ecole = models.ForeignKey(
+        Ecole,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='enseignants',
+        verbose_name=_("École")
+    )
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'ecole'
 
     class Meta:
         verbose_name = _("Enseignant")
         verbose_name_plural = _("Enseignants")
+        indexes = [models.Index(fields=['ecole', 'deleted_at'])]
 
     def __str__(self):
         return f"{self.user.username} - {self.classe or 'Sans classe'}"
 
+    def save(self, *args, **kwargs):
+        """L'école suit la classe assignée."""
+        if self.classe_id:
+            self.ecole_id = self.classe.ecole_id
+        super().save(*args, **kwargs)
+
 
-class Frequence(BaseModel):
+class Frequence(AnneeModel):
     eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name='frequents', verbose_name=_("Élève"))
     date = models.DateField(verbose_name=_("Date"))
     present = models.BooleanField(default=True, verbose_name=_("Présent"))
     raison_absence = models.TextField(blank=True, verbose_name=_("Raison absence"))
 
+    objects = AnneeQuerySet.as_manager()
+    ecole_lookup = 'eleve__ecole'
+
     class Meta:
         verbose_name = _("Fréquentation")
         verbose_name_plural = _("Fréquentations")
         unique_together = ['eleve', 'date']
+        # date_hierarchy de l'admin
+        indexes = [models.Index(fields=['date'])]
 
     def __str__(self):
         return f"{self.eleve} - {self.date} ({'Présent' if self.present else 'Absent'})"
 
 
-class Note(BaseModel):
+class Note(AnneeModel):
     eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name='notes', verbose_name=_("Élève"))
     matiere = models.ForeignKey(Matiere, on_delete=models.CASCADE, related_name='notes', verbose_name=_("Matière"))
     valeur = models.DecimalField(max_digits=4, decimal_places=2, verbose_name=_("Note (0-20)"))
@@ -247,16 +482,19 @@ class Note(BaseModel):
         verbose_name=_("Enseignant")
     )
 
+    objects = AnneeQuerySet.as_manager()
+    ecole_lookup = 'eleve__ecole'
+
     class Meta:
         verbose_name = _("Note")
         verbose_name_plural = _("Notes")
-        unique_together = ['eleve', 'matiere', 'trimestre']
+        unique_together = ['eleve', 'matiere', 'trimestre', 'sequence', 'annee']
 
     def __str__(self):
         return f"{self.eleve} - {self.matiere}: {self.valeur}/20"
 
 
-class Paiement(BaseModel):
+class Paiement(AnneeModel):
     eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name='paiements', verbose_name=_("Élève"))
     montant = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Montant"))
     date_paiement = models.DateField(verbose_name=_("Date de paiement"))
@@ -272,14 +510,32 @@ class Paiement(BaseModel):
         verbose_name=_("Mode de paiement")
     )
 
+    objects = AnneeQuerySet.as_manager()
+    ecole_lookup = 'eleve__ecole'
+
     class Meta:
         verbose_name = _("Paiement")
         verbose_name_plural = _("Paiements")
+        indexes = [models.Index(fields=['date_paiement'])]
 
     def __str__(self):
         return f"{self.eleve} - {self.montant} FCFA ({self.statut})"
 
 
+def cle_salle(salle):
+    """Clé de comparaison des salles : espaces réduits, casse repliée (« Salle Été » = « salle été »)."""
+    return ' '.join(salle.split()).casefold()
+
+
+class CleSalleField(models.CharField):
+    """Clé de la salle, recalculée à chaque écriture (save et bulk_create)."""
+
+    def pre_save(self, model_instance, add):
+        value = cle_salle(model_instance.salle)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class EmploiDuTemps(BaseModel):
     classe = models.ForeignKey(ClasseScolaire, on_delete=models.CASCADE, related_name='emplois', verbose_name=_("Classe"))
     jour = models.CharField(max_length=20, choices=[
@@ -287,16 +543,64 @@ class EmploiDuTemps(BaseModel):
         ('jeudi', 'Jeudi'), ('vendredi', 'Vendredi'), ('samedi', 'Samedi')
     ], verbose_name=_("Jour"))
     heure = models.TimeField(verbose_name=_("Heure"))
+    heure_fin = models.TimeField(verbose_name=_("Heure de fin"))
     salle = models.CharField(max_length=50, verbose_name=_("Salle"))
+    salle_cle = CleSalleField(max_length=50, editable=False)
+    matiere = models.ForeignKey(
+        'Matiere',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emplois',
+        verbose_name=_("Matière")
+    )
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'classe__ecole'
 
     class Meta:
         verbose_name = _("Emploi du Temps")
         verbose_name_plural = _("Emplois du Temps")
         ordering = ['jour', 'heure']
+        indexes = [
+            # Salles comparées par cle_salle, celui du contrôle des conflits
+            models.Index(fields=['salle_cle', 'jour', 'heure'], name='emploi_salle_jour_heure'),
+            models.Index(fields=['classe', 'jour', 'heure']),
+        ]
 
     def __str__(self):
         return f"{self.classe} - {self.jour} {self.heure}"
 
+    def clean(self):
+        super().clean()
+        if self.heure and self.heure_fin and self.heure_fin <= self.heure:
+            raise ValidationError({'heure_fin': _("L'heure de fin doit suivre l'heure de début.")})
+        if self.classe_id and self.heure and self.heure_fin and self.deleted_at is None:
+            self.check_conflicts()
+
+    def check_conflicts(self):
+        """Refuse un cours qui chevauche un autre cours de la même salle ou de la même classe."""
+        from .timetable import conflicts
+        found = conflicts(self)
+        if found:
+            raise ValidationError(_("Conflit d'emploi du temps avec : %(cours)s") % {
+                'cours': ', '.join(str(cours) for cours in found),
+            })
+
+    def save(self, *args, **kwargs):
+        self.salle = ' '.join(self.salle.split())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'salle' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'salle_cle'}
+        if self.deleted_at is None:
+            with transaction.atomic():
+                # Verrou sur l'école : deux enregistrements concurrents ne passent pas tous deux le contrôle
+                list(Ecole.objects.select_for_update().filter(pk=self.classe.ecole_id).values_list('pk'))
+                self.check_conflicts()
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
 
 class Notification(BaseModel):
     destinataire = models.ForeignKey(
@@ -313,23 +617,44 @@ class Notification(BaseModel):
     )
     envoye = models.BooleanField(default=False, verbose_name=_("Envoyé"))
 
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'destinataire__ecole'
+
     class Meta:
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
     def __str__(self):
         return f"Notification pour {self.destinataire}: {self.message[:50]}..."
     
+class PasswordResetCodeQuerySet(models.QuerySet):
+    def valid(self):
+        """Codes non expirés et non supprimés."""
+        return self.filter(deleted_at__isnull=True, expires_at__gt=timezone.now())
+
+    def expired(self):
+        """Codes expirés ou invalidés, à purger (tasks.purge_expired_reset_codes)."""
+        return self.filter(models.Q(expires_at__lte=timezone.now()) | models.Q(deleted_at__isnull=False))
+
+
 class PasswordResetCode(BaseModel):
     """Model to store password reset verification codes."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reset_codes', verbose_name=_("User"))
     code = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name=_("Verification Code"))
     expires_at = models.DateTimeField(verbose_name=_("Expiration Date"))
 
+    objects = PasswordResetCodeQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Password Reset Code")
         verbose_name_plural = _("Password Reset Codes")
+        indexes = [
+            models.Index(fields=['user', 'expires_at']),
+            # Purge périodique des codes expirés
+            models.Index(fields=['expires_at']),
+        ]
 
     def __str__(self):
         return f"Code for {self.user.username}: {self.code}"
@@ -338,6 +663,174 @@ class PasswordResetCode(BaseModel):
         """Check if the code is still valid (not expired and not soft-deleted)."""
         return self.is_active() and self.expires_at > timezone.now()
 
+    @classmethod
+    def issue(cls, user, lifetime):
+        """Nouveau code pour l'utilisateur ; ses codes précédents sont supprimés."""
+        cls.objects.filter(user=user).delete()
+        return cls.objects.create(user=user, expires_at=timezone.now() + lifetime)
+
+
+class ArchiveModel(models.Model):
+    """
+    Ligne d'une année scolaire archivée (schoolcopal/archives.py) : mêmes colonnes et même
+    identifiant que dans la table courante, en lecture seule. Les relations n'ont pas de
+    contrainte en base : un relevé reste lisible même si l'élève a été supprimé depuis.
+    """
+    id = models.IntegerField(primary_key=True)
+    annee = models.ForeignKey(AnneeScolaire, on_delete=models.PROTECT, related_name='+', verbose_name=_("Année scolaire"))
+    eleve = models.ForeignKey(
+        Eleve, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name=_("Élève")
+    )
+    created_at = models.DateTimeField(verbose_name=_("Date de création"))
+    updated_at = models.DateTimeField(verbose_name=_("Date de modification"))
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Date de suppression"))
+
+    objects = EcoleQuerySet.as_manager()
+    ecole_lookup = 'eleve__ecole'
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        raise ValidationError(_("Les archives sont en lecture seule."))
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError(_("Les archives sont en lecture seule."))
+
+
+class NoteArchive(ArchiveModel):
+    matiere = models.ForeignKey(
+        Matiere, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name=_("Matière")
+    )
+    valeur = models.DecimalField(max_digits=4, decimal_places=2, verbose_name=_("Note (0-20)"))
+    trimestre = models.IntegerField(verbose_name=_("Trimestre"))
+    sequence = models.IntegerField(null=True, blank=True)
+    enseignant = models.ForeignKey(
+        Enseignant, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+',
+        verbose_name=_("Enseignant")
+    )
+
+    class Meta:
+        verbose_name = _("Note archivée")
+        verbose_name_plural = _("Notes archivées")
+        indexes = [models.Index(fields=['annee', 'eleve'])]
+
+
+class FrequenceArchive(ArchiveModel):
+    date = models.DateField(verbose_name=_("Date"))
+    present = models.BooleanField(verbose_name=_("Présent"))
+    raison_absence = models.TextField(blank=True, verbose_name=_("Raison absence"))
+
+    class Meta:
+        verbose_name = _("Fréquentation archivée")
+        verbose_name_plural = _("Fréquentations archivées")
+        indexes = [models.Index(fields=['annee', 'eleve'])]
+
+
+class PaiementArchive(ArchiveModel):
+    montant = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Montant"))
+    date_paiement = models.DateField(verbose_name=_("Date de paiement"))
+    statut = models.CharField(max_length=20, verbose_name=_("Statut"))
+    mode = models.CharField(max_length=20, verbose_name=_("Mode de paiement"))
+
+    class Meta:
+        verbose_name = _("Paiement archivé")
+        verbose_name_plural = _("Paiements archivés")
+        indexes = [models.Index(fields=['annee', 'eleve'])]
+
+
+class SearchEntry(models.Model):
+    """
+    Entrée de l'index de recherche (schoolcopal/search.py) : élèves, parents et enseignants.
+    Données dérivées, tenues à jour par signaux ; texte est normalisé (minuscules, sans accents).
+    """
+    KINDS = [('eleve', _('Élève')), ('parent', _('Parent')), ('enseignant', _('Enseignant'))]
+
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name=_("Type"))
+    object_id = models.PositiveIntegerField(verbose_name=_("Identifiant"))
+    ecole = models.ForeignKey(Ecole, on_delete=models.CASCADE, null=True, related_name='+', verbose_name=_("École"))
+    libelle = models.CharField(max_length=255, verbose_name=_("Libellé"))
+    texte = models.TextField(verbose_name=_("Texte indexé"))
+
+    class Meta:
+        verbose_name = _("Entrée de recherche")
+        verbose_name_plural = _("Entrées de recherche")
+        unique_together = ['kind', 'object_id']
+        indexes = [models.Index(fields=['ecole', 'kind'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} : {self.libelle}"
+
+
+class AuditLog(models.Model):
+    """
+    Journal des modifications de notes et de paiements (schoolcopal/audit.py).
+    En ajout seul : une entrée n'est jamais modifiée ni supprimée.
+    changes : {champ: [ancienne valeur, nouvelle valeur]}.
+    """
+    ACTIONS = [('create', _('Création')), ('update', _('Modification')), ('delete', _('Suppression'))]
+
+    model = models.CharField(max_length=50, verbose_name=_("Modèle"))
+    object_id = models.PositiveIntegerField(verbose_name=_("Identifiant"))
+    action = models.CharField(max_length=10, choices=ACTIONS, verbose_name=_("Action"))
+    changes = models.JSONField(encoder=DjangoJSONEncoder, verbose_name=_("Modifications"))
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name=_("Auteur")
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Date"))
+
+    class Meta:
+        verbose_name = _("Journal d'audit")
+        verbose_name_plural = _("Journal d'audit")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} : {self.get_action_display()}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError(_("Le journal d'audit est en ajout seul."))
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError(_("Le journal d'audit est en ajout seul."))
+
+
+class Tendance(models.Model):
+    """
+    Point d'une série temporelle d'école (schoolcopal/tendances.py), calculé chaque nuit.
+    periode : début du mois (effectif), lundi de la semaine (paiements, absences) ou début de
+    l'année scolaire (moyenne, rang = numéro de séquence). effectif : lignes agrégées.
+    """
+    INDICATEURS = [
+        ('effectif', _('Élèves inscrits par mois')),
+        ('paiements', _('Paiements encaissés par semaine')),
+        ('moyenne', _('Moyenne des notes par séquence')),
+        ('absences', _("Taux d'absence par semaine")),
+    ]
+
+    ecole = models.ForeignKey(Ecole, on_delete=models.CASCADE, related_name='tendances', verbose_name=_("École"))
+    indicateur = models.CharField(max_length=20, choices=INDICATEURS, verbose_name=_("Indicateur"))
+    periode = models.DateField(verbose_name=_("Période"))
+    rang = models.PositiveSmallIntegerField(default=0, verbose_name=_("Rang"))
+    valeur = models.DecimalField(max_digits=14, decimal_places=2, verbose_name=_("Valeur"))
+    effectif = models.PositiveIntegerField(default=0, verbose_name=_("Lignes agrégées"))
+    calcule_le = models.DateTimeField(default=timezone.now, verbose_name=_("Calculé le"))
+
+    class Meta:
+        verbose_name = _("Tendance")
+        verbose_name_plural = _("Tendances")
+        constraints = [
+            models.UniqueConstraint(fields=['ecole', 'indicateur', 'periode', 'rang'], name='tendance_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.ecole} {self.indicateur} {self.periode} : {self.valeur}"
+
 
 # Signal : envoi d'email après création utilisateur
 @receiver(post_save, sender=User)
@@ -0,0 +1,176 @@
+"""
+Pagination par curseur (keyset) sur (clé de tri, id) : la page N coûte autant que la page 1,
+sans OFFSET ni COUNT(*) à chaque page. Le total, optionnel, est mis en cache.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def cached_count(queryset, timeout=None):
+    """
+    COUNT(*) du queryset, mis en cache settings.PAGINATION_COUNT_TIMEOUT secondes
+    (clé dérivée du SQL) : un total approximatif mais peu coûteux.
+    """
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f"{queryset.db}:{sql}:{params}".encode()).hexdigest()
+    if timeout is None:
+        timeout = settings.PAGINATION_COUNT_TIMEOUT
+    return cache.get_or_set(f"count:{digest}", queryset.count, timeout)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator OFFSET dont le total vient de cached_count (changelists de l'admin Django)."""
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404("Curseur de pagination invalide.")
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list) or len(values) != size:
+        raise Http404("Curseur de pagination invalide.")
+    return direction, values
+
+
+class KeysetPage:
+    """Page de résultats et curseurs vers les pages voisines (interface proche de django Page)."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+class KeysetPaginator:
+    """
+    Pagine un queryset selon `ordering` (champs non nuls, '-' pour un tri décroissant),
+    complété par 'id' pour un ordre total et stable.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_mode='cached'):
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') != 'id':
+            ordering.append('id')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.count_mode = count_mode
+
+    @property
+    def count(self):
+        """Total : 'cached' (cached_count), 'exact' (COUNT(*)), ou None."""
+        if self.count_mode == 'cached':
+            return cached_count(self.queryset)
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        return None
+
+    def _after(self, values, reverse=False):
+        """Filtre « strictement après values » dans l'ordre de tri (ou avant si reverse)."""
+        condition = Q()
+        for position in reversed(range(len(self.ordering))):
+            descending = self.ordering[position].startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            strict = Q(**{f"{self.fields[position]}__{lookup}": values[position]})
+            egal = Q(**{field: value for field, value in zip(self.fields[:position], values[:position])})
+            condition = (egal & strict) | condition if condition else egal & strict
+        return condition
+
+    def _key(self, obj):
+        values = []
+        for field in self.fields:
+            value = obj
+            for part in field.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if not cursor:
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            direction, values = decode_cursor(cursor, len(self.fields))
+            if direction == NEXT:
+                rows = list(queryset.filter(self._after(values)).order_by(*self.ordering)[:self.per_page + 1])
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                inverse = [field[1:] if field.startswith('-') else f"-{field}" for field in self.ordering]
+                rows = list(queryset.filter(self._after(values, reverse=True)).order_by(*inverse)[:self.per_page + 1])
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        return KeysetPage(
+            rows, self,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=encode_cursor(NEXT, self._key(rows[-1])) if rows else None,
+            previous_cursor=encode_cursor(PREVIOUS, self._key(rows[0])) if rows else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    Remplace la pagination OFFSET d'une ListView par KeysetPaginator.
+    La vue déclare keyset_ordering ; le curseur est lu dans ?cursor=.
+    """
+    keyset_ordering = ()
+    count_mode = 'cached'
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering, self.count_mode)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        page.next_query = self._query_with_cursor(page.next_cursor)
+        page.previous_query = self._query_with_cursor(page.previous_cursor)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _query_with_cursor(self, cursor):
+        """Chaîne de requête courante (filtres compris) avec le curseur remplacé."""
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor or ''
+        return params.urlencode()
@@ -0,0 +1,130 @@
+"""
+Profilage des requêtes SQL et des temps de réponse par vue.
+
+Activé par QUERY_PROFILING (voir QueryProfilingMiddleware). Les mesures
+sont agrégées en mémoire, par nom d'URL, sur une fenêtre glissante.
+Budgets : @query_budget sur la vue (tableaux de bord, session et utilisateur lus en base
+compris), remplacé au besoin par settings.QUERY_BUDGETS[nom d'URL].
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Valeurs littérales et listes IN (...) de longueur variable
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Levée quand une vue dépasse son budget de requêtes en mode strict."""
+
+
+def query_shape(sql):
+    """Forme normalisée d'une requête : deux requêtes de même forme ne diffèrent que par leurs paramètres."""
+    sql = _LITERALS.sub('%s', sql)
+    return _IN_LISTS.sub('(%s, ...)', sql)
+
+
+def query_budget(max_queries):
+    """Déclare le nombre maximal de requêtes SQL autorisé pour une vue."""
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class RequestProfile:
+    """Mesures d'une requête HTTP ; sert aussi d'execute_wrapper Django."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.render_time = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def duplicates(self):
+        """Formes de requêtes exécutées plusieurs fois, les plus fréquentes d'abord."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > 1]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ProfileStore:
+    """Fenêtre glissante des mesures, par nom d'URL, partagée par les threads du processus."""
+
+    def __init__(self, window=None):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(self._new_window)
+
+    def _new_window(self):
+        return deque(maxlen=self.window or getattr(settings, 'QUERY_PROFILING_WINDOW', 200))
+
+    def record(self, url_name, profile):
+        sample = (
+            profile.query_count,
+            profile.db_time,
+            len(profile.duplicates()),
+            profile.view_time,
+            profile.render_time,
+        )
+        with self._lock:
+            self._samples[url_name].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        summary = {}
+        for name, samples in snapshot.items():
+            queries, db_times, duplicates, view_times, render_times = zip(*samples)
+            summary[name] = {
+                'samples': len(samples),
+                'queries_avg': round(sum(queries) / len(samples), 1),
+                'queries_max': max(queries),
+                'duplicate_shapes_max': max(duplicates),
+                'db_ms_avg': round(sum(db_times) / len(samples) * 1000, 2),
+                'view_ms_p50': round(_percentile(view_times, 0.5) * 1000, 2),
+                'view_ms_p95': round(_percentile(view_times, 0.95) * 1000, 2),
+                'render_ms_avg': round(sum(render_times) / len(samples) * 1000, 2),
+            }
+        return summary
+
+
+store = ProfileStore()
+
+
+def check_budget(url_name, budget, profile):
+    """Journalise (ou lève QueryBudgetExceeded en mode strict) un dépassement de budget."""
+    if budget is None or profile.query_count <= budget:
+        return
+    duplicates = profile.duplicates()
+    message = f"{url_name}: {profile.query_count} requêtes SQL pour un budget de {budget}"
+    if duplicates:
+        shape, count = duplicates[0]
+        message += f" (répétée {count} fois : {shape})"
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
@@ -0,0 +1,160 @@
+"""
+Promotion de fin d'année et transferts de classe en masse.
+
+planifier() associe chaque classe source à une classe cible (par défaut le niveau suivant,
+même section ; None pour les sortants de CM2) et décide des redoublements : moyenne
+annuelle (moyenne des moyennes trimestrielles de l'année en cours) sous le seuil, ou
+décision explicite. appliquer() exécute le plan en un UPDATE par classe source, dans une
+seule transaction, puis recalcule les effectifs de l'école. Les sortants quittent l'école :
+suppression logique, leur dernière classe est conservée.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from . import effectifs
+from .models import ClasseScolaire, Ecole, Eleve, Note
+
+NIVEAUX = [niveau for niveau, _ in ClasseScolaire._meta.get_field('niveau').choices]
+
+
+class PromotionError(Exception):
+    pass
+
+
+class Mouvement:
+    """Élèves d'une classe source : promus vers cible (None : sortants de l'école), sauf les redoublants."""
+
+    def __init__(self, source, cible, effectif=0, redoublants=()):
+        self.source = source
+        self.cible = cible
+        self.effectif = effectif
+        self.redoublants = list(redoublants)
+
+    @property
+    def partants(self):
+        return self.effectif - len(self.redoublants)
+
+    @property
+    def promus(self):
+        return self.partants if self.cible is not None else 0
+
+    @property
+    def sortants(self):
+        return self.partants if self.cible is None else 0
+
+    def __str__(self):
+        if self.cible is None:
+            return f"{self.source} -> sortie : {self.sortants} sortants, {len(self.redoublants)} redoublants"
+        return f"{self.source} -> {self.cible} : {self.promus} promus, {len(self.redoublants)} redoublants"
+
+
+class Plan:
+    def __init__(self, ecole, mouvements):
+        self.ecole = ecole
+        self.mouvements = mouvements
+
+    @property
+    def promus(self):
+        return sum(mouvement.promus for mouvement in self.mouvements)
+
+    @property
+    def sortants(self):
+        return sum(mouvement.sortants for mouvement in self.mouvements)
+
+    @property
+    def redoublants(self):
+        return sum(len(mouvement.redoublants) for mouvement in self.mouvements)
+
+
+def correspondance(classes):
+    """{classe: classe du niveau suivant, même section sinon la première ; None après CM2}."""
+    par_niveau = defaultdict(dict)
+    for classe in classes:
+        par_niveau[classe.niveau][classe.section] = classe
+    result = {}
+    for classe in classes:
+        index = NIVEAUX.index(classe.niveau) + 1
+        if index == len(NIVEAUX):
+            result[classe] = None
+            continue
+        suivantes = par_niveau.get(NIVEAUX[index])
+        if not suivantes:
+            raise PromotionError(f"Aucune classe de {NIVEAUX[index]} pour accueillir {classe}.")
+        result[classe] = suivantes.get(classe.section) or suivantes[min(suivantes)]
+    return result
+
+
+def moyennes_annuelles(ecole):
+    """{eleve_id: moyenne des moyennes trimestrielles de l'année en cours}, en une requête."""
+    trimestres = defaultdict(list)
+    rows = (
+        Note.objects.for_ecole(ecole).annee_active().filter(deleted_at__isnull=True)
+        .values('eleve_id', 'trimestre').annotate(moyenne=Avg('valeur')).order_by()
+    )
+    for row in rows:
+        trimestres[row['eleve_id']].append(row['moyenne'])
+    return {eleve_id: sum(moyennes) / len(moyennes) for eleve_id, moyennes in trimestres.items()}
+
+
+def planifier(ecole, correspondances=None, seuil=None, redoublants=(), promus=()):
+    """
+    Plan de promotion de l'école. correspondances : {classe_id source: classe_id cible ou None}
+    remplaçant la correspondance par défaut ; seuil : moyenne annuelle en dessous de laquelle
+    l'élève redouble ; redoublants / promus : décisions explicites (identifiants d'élèves).
+    """
+    classes = {
+        classe.pk: classe
+        for classe in ClasseScolaire.objects.for_ecole(ecole).filter(deleted_at__isnull=True)
+    }
+    if correspondances is None:
+        cibles = correspondance(list(classes.values()))
+    else:
+        inconnues = {pk for pair in correspondances.items() for pk in pair if pk is not None} - set(classes)
+        if inconnues:
+            raise PromotionError(f"Classes hors de l'école {ecole} : {sorted(inconnues)}.")
+        cibles = {classes[source]: classes.get(cible) for source, cible in correspondances.items()}
+
+    decisions = set(redoublants)
+    if seuil is not None:
+        decisions |= {eleve_id for eleve_id, moyenne in moyennes_annuelles(ecole).items() if moyenne < seuil}
+    decisions -= set(promus)
+
+    eleves = Eleve.objects.filter(classe__in=[source.pk for source in cibles], deleted_at__isnull=True)
+    effectif = Counter(dict(eleves.values('classe_id').annotate(n=Count('pk')).values_list('classe_id', 'n').order_by()))
+    par_classe = defaultdict(list)
+    for eleve_id, classe_id in eleves.filter(pk__in=decisions).values_list('pk', 'classe_id'):
+        par_classe[classe_id].append(eleve_id)
+
+    return Plan(ecole, [
+        Mouvement(source, cible, effectif[source.pk], par_classe[source.pk])
+        for source, cible in sorted(cibles.items(), key=lambda item: (NIVEAUX.index(item[0].niveau), item[0].section))
+    ])
+
+
+def appliquer(plan):
+    """
+    Exécute le plan : un UPDATE par classe source, dans une seule transaction.
+    Les élèves déjà déplacés portent la marque updated_at = debut et sont exclus des UPDATE
+    suivants : CP -> CE1 puis CE1 -> CE2 ne déplace pas deux fois les mêmes élèves, quel que
+    soit l'ordre (y compris pour des échanges A <-> B). Les sortants sont supprimés
+    logiquement dans la même transaction.
+    Renvoie le nombre d'élèves déplacés ou sortis.
+    """
+    debut = timezone.now()
+    total = 0
+    with transaction.atomic():
+        for mouvement in plan.mouvements:
+            if mouvement.cible == mouvement.source:
+                continue
+            changes = {'classe': mouvement.cible} if mouvement.cible else {'deleted_at': debut}
+            total += (
+                Eleve.objects.filter(classe=mouvement.source, deleted_at__isnull=True, updated_at__lt=debut)
+                .exclude(pk__in=mouvement.redoublants)
+                .update(updated_at=debut, **changes)
+            )
+        # update() contourne Eleve.save : effectifs des classes recalculés
+        effectifs.recompter(Ecole.objects.filter(pk=plan.ecole.pk))
+    return total
@@ -0,0 +1,88 @@
+"""
+Limitation du débit des tentatives (connexion, réinitialisation du mot de passe).
+
+Fenêtre glissante approchée par deux compteurs de cache (fenêtre courante et précédente,
+pondérée par la part de la fenêtre précédente encore couverte). N'utilise que le cache :
+une tentative refusée ne coûte ni hachage de mot de passe ni requête SQL.
+Limites par point d'entrée dans settings.RATE_LIMITS : {scope: (tentatives, secondes)}.
+Les compteurs doivent être partagés par tous les processus : avec un cache local, chaque
+worker aurait sa propre limite (avertissement schoolcopal.W001).
+"""
+import hashlib
+import ipaddress
+import math
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+
+def _trusted(ip):
+    try:
+        adresse = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(adresse in ipaddress.ip_network(proxy, strict=False) for proxy in settings.TRUSTED_PROXIES)
+
+
+def client_ip(request):
+    """
+    Adresse du client. Derrière un proxy de confiance (settings.TRUSTED_PROXIES), la dernière
+    adresse de X-Forwarded-For qui n'est pas un proxy de confiance : celles qui la précèdent
+    viennent du client et peuvent être forgées.
+    """
+    ip = request.META.get('REMOTE_ADDR') or 'inconnue'
+    if not _trusted(ip):
+        return ip
+    for forwarded in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        forwarded = forwarded.strip()
+        if forwarded:
+            ip = forwarded
+            if not _trusted(forwarded):
+                break
+    return ip
+
+
+@checks.register()
+def check_shared_cache(app_configs, **kwargs):
+    if settings.RATE_LIMITS and not settings.SHARED_CACHE:
+        return [checks.Warning(
+            "Les compteurs de RATE_LIMITS sont dans un cache propre à chaque processus : "
+            "la limite effective est multipliée par le nombre de workers.",
+            hint="Configurer CACHE_BACKEND sur un cache partagé (Redis).",
+            id='schoolcopal.W001',
+        )]
+    return []
+
+
+def _keys(scope, ident, index):
+    digest = hashlib.md5(ident.encode()).hexdigest()
+    return f"ratelimit:{scope}:{digest}:{index}", f"ratelimit:{scope}:{digest}:{index - 1}"
+
+
+def hit(scope, idents):
+    """
+    Compte une tentative pour chaque identifiant (IP, nom d'utilisateur…) du scope.
+    Renvoie 0 si elle est permise, sinon le nombre de secondes à attendre.
+    """
+    if scope not in settings.RATE_LIMITS:
+        return 0
+    limit, window = settings.RATE_LIMITS[scope]
+    index, elapsed = divmod(time.time(), window)
+    index = int(index)
+    weight = 1 - elapsed / window
+    retry_after = 0
+    for ident in filter(None, idents):
+        current_key, previous_key = _keys(scope, ident.strip().lower(), index)
+        cache.add(current_key, 0, window * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:  # clé expirée entre add et incr
+            cache.set(current_key, 1, window * 2)
+            current = 1
+        previous = cache.get(previous_key, 0)
+        if previous * weight + current > limit:
+            retry_after = max(retry_after, math.ceil(window - elapsed))
+    return retry_after
+
@@ -0,0 +1,150 @@
+"""
+Recherche indexée des élèves, parents et enseignants.
+
+Les textes sont normalisés (utils.normaliser) dans SearchEntry, puis indexés selon la base :
+SQLite : table FTS5 externe schoolcopal_searchentry_fts, synchronisée par triggers ;
+PostgreSQL : index GIN pg_trgm sur texte. La recherche est une recherche par préfixe de mots,
+insensible aux accents (« elo ngu » trouve « Élodie N'Guessan »).
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Eleve, SearchEntry, User
+from .utils import APOSTROPHES, normaliser
+
+FTS_TABLE = 'schoolcopal_searchentry_fts'
+INDEXED_ROLES = ('parent', 'enseignant')
+BATCH_SIZE = 2000
+# Un préfixe d'une lettre correspond à une grande part de l'index : ignoré
+MIN_TOKEN_LENGTH = 2
+
+
+# Textes indexés (fonctions pures, copiées telles quelles dans la migration 0008)
+
+def texte_indexe(*champs):
+    """
+    Mots normalisés des champs, précédés d'une espace. Les noms à apostrophe sont indexés
+    sous les deux formes : « N'Guessan » est trouvé par « nguessan » comme par « guessan ».
+    """
+    texte = ' '.join(filter(None, champs))
+    mots = normaliser(texte).split() + normaliser(APOSTROPHES.sub(' ', texte)).split()
+    return ' ' + ' '.join(dict.fromkeys(mots))
+
+
+def texte_eleve(eleve, parent):
+    """Nom et prénom de l'élève, e-mail, téléphone et identifiant du parent."""
+    champs = [eleve.prenom, eleve.nom]
+    if parent is not None:
+        champs += [parent.username, parent.email, parent.telephone]
+    return texte_indexe(*champs)
+
+
+def texte_user(user):
+    return texte_indexe(user.username, user.first_name, user.last_name, user.email, user.telephone)
+
+
+def libelle_user(user):
+    nom = f"{user.first_name} {user.last_name}".strip()
+    return f"{nom} ({user.username})" if nom else user.username
+
+
+def entry_for_eleve(eleve):
+    return SearchEntry(
+        kind='eleve', object_id=eleve.pk, ecole_id=eleve.ecole_id,
+        libelle=f"{eleve.prenom} {eleve.nom}", texte=texte_eleve(eleve, eleve.parent_id),
+    )
+
+
+def entry_for_user(user):
+    return SearchEntry(
+        kind=user.role, object_id=user.pk, ecole_id=user.ecole_id,
+        libelle=libelle_user(user), texte=texte_user(user),
+    )
+
+
+# Mise à jour de l'index
+
+def save_entries(entries):
+    """Insère ou remplace des entrées (INSERT … ON CONFLICT DO UPDATE, par lots)."""
+    for start in range(0, len(entries), BATCH_SIZE):
+        SearchEntry.objects.bulk_create(
+            entries[start:start + BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['ecole', 'libelle', 'texte'],
+        )
+
+
+def unindex(kind, object_ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def index_eleves(queryset):
+    """(Ré)indexe les élèves actifs du queryset, retire les supprimés."""
+    queryset = queryset.select_related('parent_id')
+    save_entries([entry_for_eleve(eleve) for eleve in queryset.filter(deleted_at__isnull=True)])
+    unindex('eleve', queryset.filter(deleted_at__isnull=False).values('pk'))
+
+
+def index_user(user):
+    """Indexe un parent ou un enseignant actif ; sinon retire ses entrées."""
+    SearchEntry.objects.filter(kind__in=INDEXED_ROLES, object_id=user.pk).exclude(kind=user.role).delete()
+    if user.role in INDEXED_ROLES and user.deleted_at is None:
+        save_entries([entry_for_user(user)])
+    else:
+        unindex(user.role, [user.pk])
+    if user.role == 'parent':
+        # Les élèves sont aussi trouvés par l'e-mail et le téléphone du parent
+        index_eleves(Eleve.objects.filter(parent_id=user))
+
+
+def rebuild(ecole=None):
+    """Reconstruit l'index (d'une école, ou complet) ; renvoie le nombre d'entrées."""
+    entries = SearchEntry.objects.all() if ecole is None else SearchEntry.objects.filter(ecole=ecole)
+    entries.delete()
+    eleves = Eleve.objects.filter(deleted_at__isnull=True).select_related('parent_id').order_by('pk')
+    users = User.objects.filter(role__in=INDEXED_ROLES, deleted_at__isnull=True).order_by('pk')
+    if ecole is not None:
+        eleves, users = eleves.filter(ecole=ecole), users.filter(ecole=ecole)
+    total = 0
+    for source, build in ((eleves, entry_for_eleve), (users, entry_for_user)):
+        batch = []
+        for obj in source.iterator(chunk_size=BATCH_SIZE):
+            batch.append(build(obj))
+            if len(batch) == BATCH_SIZE:
+                save_entries(batch)
+                total += len(batch)
+                batch = []
+        save_entries(batch)
+        total += len(batch)
+    return total
+
+
+# Recherche
+
+def search(query, ecole=None, kinds=None):
+    """
+    SearchEntry dont le texte contient chaque mot de la requête en préfixe de mot.
+    Queryset vide si la requête ne contient aucun mot d'au moins MIN_TOKEN_LENGTH caractères.
+    """
+    tokens = [token for token in normaliser(query).split() if len(token) >= MIN_TOKEN_LENGTH]
+    entries = SearchEntry.objects.all()
+    if ecole is not None:
+        entries = entries.filter(ecole=ecole)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    if not tokens:
+        return entries.none()
+    if connection.vendor == 'sqlite':
+        # Jetons déjà réduits à [0-9a-z] : pas d'échappement nécessaire dans MATCH
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return entries.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+    # PostgreSQL (index trigramme) et autres bases : LIKE '% mot%' sur le texte préfixé d'une espace
+    for token in tokens:
+        entries = entries.filter(texte__contains=f' {token}')
+    return entries
+
+
+def object_ids(query, kind, ecole=None):
+    """Sous-requête des identifiants des objets `kind` correspondant à la requête."""
+    return search(query, ecole, [kind]).values('object_id')
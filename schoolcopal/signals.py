@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import audit, search, timetable  # noqa: F401 (audit : signaux du journal)
+from .backends import invalidate_cached_user
+from .models import User, Ecole, AnneeScolaire, ClasseScolaire, Eleve, Enseignant, EmploiDuTemps
+from .tenancy import invalidate_ecole
+
+
+# Invalidation du cache d'authentification
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Enseignant)
+def invalidate_enseignant_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+# Invalidation du cache multi-écoles
+@receiver([post_save, post_delete], sender=Ecole)
+def invalidate_ecole_cache(sender, instance, **kwargs):
+    invalidate_ecole(instance)
+
+
+# Année scolaire en cours (AnneeScolaire.active_id)
+@receiver([post_save, post_delete], sender=AnneeScolaire)
+def invalidate_annee_active(sender, instance, **kwargs):
+    cache.delete(AnneeScolaire.active_cache_key(instance.ecole_id))
+
+
+# Index d'occupation des emplois du temps
+@receiver([post_save, post_delete], sender=EmploiDuTemps)
+def invalidate_timetable_index(sender, instance, **kwargs):
+    if timetable.bulk_in_progress():
+        return
+    # Lors d'une suppression en cascade la classe existe encore : elle est supprimée après
+    ecole_id = ClasseScolaire.objects.filter(pk=instance.classe_id).values_list('ecole_id', flat=True).first()
+    if ecole_id is not None:
+        timetable.changed(ecole_id)
+
+
+# Index de recherche (élèves, parents, enseignants)
+@receiver(post_save, sender=Eleve)
+def index_eleve(sender, instance, **kwargs):
+    search.index_eleves(Eleve.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Eleve)
+def unindex_eleve(sender, instance, **kwargs):
+    search.unindex('eleve', [instance.pk])
+
+
+# Effectifs : suppression réelle d'un élève encore inscrit
+@receiver(post_delete, sender=Eleve)
+def decrement_effectifs(sender, instance, **kwargs):
+    Eleve.ajuster_effectifs(instance.inscription(), None)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    # La connexion ne met à jour que last_login : rien à réindexer
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    search.index_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    search.unindex(instance.role, [instance.pk])
@@ -1,8 +1,27 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection, send_mail
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from . import compaction, tendances
+from .models import Ecole, Notification, PasswordResetCode
+
+# Files, priorités et planification : settings.CELERY_TASK_ROUTES et CELERY_BEAT_SCHEDULE
+PURGE_BATCH_SIZE = 1000
+NOTIFICATION_BATCH_SIZE = 500
+
+
+@shared_task
+def send_transactional_email(subject, body, recipients, html_body=None):
+    """
+    Send a pre-rendered email (password reset…) from the 'email' queue.
+    """
+    message = EmailMultiAlternatives(subject, body, settings.DEFAULT_FROM_EMAIL, recipients)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
+
 @shared_task
 def send_credentials_email(email, username, password):
     """
@@ -30,4 +49,79 @@ def send_reset_code_email(email, code):
         f'It expires in 10 minutes.\n\n'
         f'Best regards,\nCopalSchool Team'
     )
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
\ No newline at end of file
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
+
+
+@shared_task
+def purge_expired_reset_codes(batch_size=PURGE_BATCH_SIZE):
+    """
+    Periodic task (celery beat): delete expired or invalidated reset codes,
+    batch_size rows per DELETE so the table is never locked for long.
+    """
+    total = 0
+    while True:
+        ids = list(PasswordResetCode.objects.expired().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += PasswordResetCode.objects.filter(pk__in=ids).delete()[0]
+
+
+@shared_task
+def compact_tombstones(batch_size=compaction.BATCH_SIZE):
+    """
+    Periodic task (weekly): hard-delete rows soft-deleted for longer than their
+    retention (settings.TOMBSTONE_RETENTION), then VACUUM / ANALYZE.
+    """
+    return compaction.compact(batch_size=batch_size, export_dir=settings.TOMBSTONE_EXPORT_DIR or None)
+
+
+@shared_task
+def send_pending_notifications(batch_size=NOTIFICATION_BATCH_SIZE):
+    """
+    Periodic task: send unsent email notifications, batch_size per SMTP connection
+    round-trip, then mark them as sent. SMS notifications are left to their gateway.
+    """
+    pending = Notification.objects.filter(type='email', envoye=False, deleted_at__isnull=True)\
+        .select_related('destinataire').order_by('pk')
+    subject = _('Notification - CopalSchool')
+    total = 0
+    with get_connection() as connection:
+        while True:
+            batch = list(pending[:batch_size])
+            if not batch:
+                return total
+            connection.send_messages([
+                EmailMessage(str(subject), notification.message, settings.DEFAULT_FROM_EMAIL,
+                             [notification.destinataire.email], connection=connection)
+                for notification in batch if notification.destinataire.email
+            ])
+            Notification.objects.filter(pk__in=[notification.pk for notification in batch]).update(envoye=True)
+            total += len(batch)
+
+
+@shared_task
+def generate_school_reports():
+    """Periodic task: one report task per active school, on the 'reports' queue."""
+    for ecole_id in Ecole.objects.filter(deleted_at__isnull=True).values_list('pk', flat=True):
+        generate_school_report.delay(ecole_id)
+
+
+@shared_task
+def generate_school_report(ecole_id):
+    """Compute a school report and store it on the school (Ecole.rapport) for the director dashboard."""
+    ecole = Ecole.objects.get(pk=ecole_id)
+    # En base, pas dans le cache : visible de tous les processus web, quel que soit le backend
+    Ecole.objects.filter(pk=ecole_id).update(rapport=ecole.generate_rapport(), rapport_le=timezone.now())
+
+
+@shared_task
+def snapshot_tendances():
+    """Periodic task (nightly): one trend snapshot task per active school, on the 'reports' queue."""
+    for ecole_id in Ecole.objects.filter(deleted_at__isnull=True).values_list('pk', flat=True):
+        snapshot_tendances_ecole.delay(ecole_id)
+
+
+@shared_task
+def snapshot_tendances_ecole(ecole_id):
+    """Recompute the school's recent time-series points (tendances.instantanes)."""
+    return dict(tendances.instantanes(Ecole.objects.get(pk=ecole_id)))
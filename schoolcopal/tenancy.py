@@ -0,0 +1,80 @@
+"""
+Résolution de l'école courante (multi-écoles), une fois par requête et via le cache :
+par nom d'hôte, sinon par l'école de l'utilisateur, sinon l'école par défaut.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Ecole
+
+# Valeur mise en cache pour un hôte qui ne correspond à aucune école
+_AUCUNE = 0
+
+
+def ecole_cache_key(ecole_id):
+    return f"tenant:ecole:{ecole_id}"
+
+
+def host_cache_key(host):
+    return f"tenant:host:{host}"
+
+
+DEFAULT_ECOLE_KEY = "tenant:default"
+
+
+def get_ecole(ecole_id):
+    """École active par identifiant, depuis le cache."""
+    key = ecole_cache_key(ecole_id)
+    ecole = cache.get(key)
+    if ecole is None:
+        ecole = Ecole.objects.filter(pk=ecole_id, deleted_at__isnull=True).first()
+        if ecole is None:
+            return None
+        cache.set(key, ecole, settings.TENANT_CACHE_TIMEOUT)
+    return ecole
+
+
+def get_ecole_for_host(host):
+    """École servie par ce nom d'hôte, ou None."""
+    key = host_cache_key(host)
+    ecole_id = cache.get(key)
+    if ecole_id is None:
+        ecole_id = (
+            Ecole.objects.filter(domaine__iexact=host, deleted_at__isnull=True).values_list('pk', flat=True).first()
+            or _AUCUNE
+        )
+        cache.set(key, ecole_id, settings.TENANT_CACHE_TIMEOUT)
+    ecole = get_ecole(ecole_id) if ecole_id != _AUCUNE else None
+    # Un domaine modifié depuis la mise en cache ne sert plus cette école
+    if ecole is not None and ecole.domaine.lower() != host:
+        cache.delete(key)
+        return None
+    return ecole
+
+
+def get_default_ecole():
+    """Ecole.get_default_ecole(), mis en cache (la requête, voire l'insertion, n'a lieu qu'une fois)."""
+    ecole_id = cache.get(DEFAULT_ECOLE_KEY)
+    ecole = get_ecole(ecole_id) if ecole_id else None
+    if ecole is None:
+        ecole = Ecole.get_default_ecole()
+        cache.set(DEFAULT_ECOLE_KEY, ecole.pk, settings.TENANT_CACHE_TIMEOUT)
+        cache.set(ecole_cache_key(ecole.pk), ecole, settings.TENANT_CACHE_TIMEOUT)
+    return ecole
+
+
+def resolve_ecole(request):
+    """École de la requête : hôte, puis école de l'utilisateur, puis école par défaut."""
+    host = request.get_host().split(':')[0].lower()
+    ecole = get_ecole_for_host(host)
+    if ecole is None and request.user.is_authenticated and request.user.ecole_id:
+        ecole = get_ecole(request.user.ecole_id)
+    return ecole or get_default_ecole()
+
+
+def invalidate_ecole(ecole):
+    """Supprime une école (et son nom d'hôte) du cache."""
+    keys = [ecole_cache_key(ecole.pk), DEFAULT_ECOLE_KEY]
+    if ecole.domaine:
+        keys.append(host_cache_key(ecole.domaine.lower()))
+    cache.delete_many(keys)
@@ -0,0 +1,175 @@
+"""
+Séries temporelles des tableaux de bord directeur (modèle Tendance).
+
+Chaque nuit, instantanes() recalcule pour une école les points récents de chaque indicateur
+par agrégats ensemblistes (une requête GROUP BY par source) et les remplace dans Tendance.
+Avec complet=True, l'historique entier est recalculé, années archivées comprises.
+Les graphiques ne lisent que Tendance : une requête quel que soit le volume de données.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import (
+    AnneeScolaire, Eleve, Frequence, FrequenceArchive, Note, NoteArchive, Paiement, PaiementArchive, Tendance,
+)
+
+CENTIEME = Decimal('0.01')
+
+
+def debut_mois(jour):
+    return jour.replace(day=1)
+
+
+def mois_suivant(jour):
+    return (jour.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def debut_semaine(jour):
+    return jour - timedelta(days=jour.weekday())
+
+
+def arrondi(valeur):
+    return Decimal(valeur).quantize(CENTIEME)
+
+
+def sources(model, archive, complet):
+    """Table courante, plus la table d'archive pour un recalcul complet."""
+    return (model, archive) if complet else (model,)
+
+
+def effectif(ecole, depuis, aujourd_hui):
+    """Élèves inscrits à la fin de chaque mois (au jour du calcul pour le mois en cours)."""
+    eleves = Eleve.objects.for_ecole(ecole)
+    if depuis is None:
+        premier = eleves.order_by('created_at').values_list('created_at', flat=True).first()
+        if premier is None:
+            return []
+        depuis = timezone.localdate(premier)
+    depuis = debut_mois(depuis)
+    debut = timezone.make_aware(datetime.combine(depuis, time.min))
+    inscrits = eleves.filter(created_at__lt=debut).exclude(deleted_at__lt=debut).count()
+    mouvements = Counter()
+    for champ, signe in (('created_at', 1), ('deleted_at', -1)):
+        rows = (
+            eleves.filter(**{f'{champ}__gte': debut}).order_by()
+            .values(mois=TruncMonth(champ, output_field=DateField())).annotate(n=Count('pk'))
+        )
+        for row in rows:
+            mouvements[row['mois']] += signe * row['n']
+    points, mois = [], depuis
+    while mois <= aujourd_hui:
+        inscrits += mouvements[mois]
+        points.append(Tendance(ecole=ecole, indicateur='effectif', periode=mois, valeur=inscrits, effectif=inscrits))
+        mois = mois_suivant(mois)
+    return points
+
+
+def paiements(ecole, depuis, complet):
+    """Montant des paiements réglés par semaine de paiement."""
+    totaux, nombres = Counter(), Counter()
+    for model in sources(Paiement, PaiementArchive, complet):
+        rows = model.objects.for_ecole(ecole).filter(statut='paye', deleted_at__isnull=True)
+        if depuis is not None:
+            rows = rows.filter(date_paiement__gte=debut_semaine(depuis))
+        rows = rows.order_by().values(semaine=TruncWeek('date_paiement')).annotate(total=Sum('montant'), n=Count('pk'))
+        for row in rows:
+            totaux[row['semaine']] += row['total']
+            nombres[row['semaine']] += row['n']
+    return [
+        Tendance(ecole=ecole, indicateur='paiements', periode=semaine, valeur=arrondi(total), effectif=nombres[semaine])
+        for semaine, total in totaux.items()
+    ]
+
+
+def absences(ecole, depuis, complet):
+    """Part des appels « absent » par semaine, en pourcentage."""
+    absents, appels = Counter(), Counter()
+    for model in sources(Frequence, FrequenceArchive, complet):
+        rows = model.objects.for_ecole(ecole).filter(deleted_at__isnull=True)
+        if depuis is not None:
+            rows = rows.filter(date__gte=debut_semaine(depuis))
+        rows = rows.order_by().values(semaine=TruncWeek('date')).annotate(
+            appels=Count('pk'), absents=Count('pk', filter=Q(present=False)),
+        )
+        for row in rows:
+            appels[row['semaine']] += row['appels']
+            absents[row['semaine']] += row['absents']
+    return [
+        Tendance(ecole=ecole, indicateur='absences', periode=semaine,
+                 valeur=arrondi(100 * absents[semaine] / total), effectif=total)
+        for semaine, total in appels.items()
+    ]
+
+
+def moyennes(ecole, complet):
+    """Moyenne des notes par séquence, pour l'année active (toutes les années si complet)."""
+    sommes, nombres = Counter(), Counter()
+    for model in sources(Note, NoteArchive, complet):
+        rows = model.objects.for_ecole(ecole).filter(deleted_at__isnull=True, sequence__isnull=False)
+        if not complet:
+            rows = rows.filter(annee_id=AnneeScolaire.active_id(ecole.pk))
+        rows = rows.order_by().values('annee__debut', 'sequence').annotate(moyenne=Avg('valeur'), n=Count('pk'))
+        for row in rows:
+            cle = row['annee__debut'], row['sequence']
+            # Moyenne pondérée si une même année est à cheval sur les deux tables
+            sommes[cle] += Decimal(row['moyenne']) * row['n']
+            nombres[cle] += row['n']
+    return [
+        Tendance(ecole=ecole, indicateur='moyenne', periode=debut, rang=sequence,
+                 valeur=arrondi(sommes[debut, sequence] / n), effectif=n)
+        for (debut, sequence), n in nombres.items()
+    ]
+
+
+def fenetre(aujourd_hui):
+    """Début des points recalculés chaque nuit : le mois précédent (paiements ou appels saisis en retard)."""
+    return debut_mois(debut_mois(aujourd_hui) - timedelta(days=1))
+
+
+def instantanes(ecole, complet=False, aujourd_hui=None):
+    """
+    Recalcule et remplace les points de l'école : ceux de la fenêtre récente, ou tous si
+    complet. Renvoie {indicateur: nombre de points}.
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    depuis = None if complet else fenetre(aujourd_hui)
+    points = (
+        effectif(ecole, depuis, aujourd_hui) + paiements(ecole, depuis, complet)
+        + absences(ecole, depuis, complet) + moyennes(ecole, complet)
+    )
+    anciens = Tendance.objects.filter(ecole=ecole)
+    if not complet:
+        anciens = anciens.filter(
+            Q(indicateur='effectif', periode__gte=debut_mois(depuis))
+            | Q(indicateur__in=['paiements', 'absences'], periode__gte=debut_semaine(depuis))
+            | Q(indicateur='moyenne', periode__in=AnneeScolaire.objects.filter(
+                pk=AnneeScolaire.active_id(ecole.pk)).values('debut'))
+        )
+    with transaction.atomic():
+        anciens.delete()
+        Tendance.objects.bulk_create(points, batch_size=1000)
+    return Counter(point.indicateur for point in points)
+
+
+def series(ecole, indicateurs=None, depuis=None):
+    """{indicateur: [points]} de l'école, lus dans Tendance en une requête."""
+    rows = Tendance.objects.filter(ecole=ecole)
+    if indicateurs:
+        rows = rows.filter(indicateur__in=indicateurs)
+    if depuis is not None:
+        rows = rows.filter(periode__gte=depuis)
+    result = {indicateur: [] for indicateur in (indicateurs or [code for code, _ in Tendance.INDICATEURS])}
+    for indicateur, periode, rang, valeur, nombre in rows.order_by('indicateur', 'periode', 'rang').values_list(
+        'indicateur', 'periode', 'rang', 'valeur', 'effectif',
+    ):
+        point = {'periode': periode.isoformat(), 'valeur': float(valeur), 'effectif': nombre}
+        if indicateur == 'moyenne':
+            point['sequence'] = rang
+        result[indicateur].append(point)
+    return result
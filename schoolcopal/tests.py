@@ -1,3 +1,1327 @@
-from django.test import TestCase
+from collections import Counter
+from datetime import date, time, timedelta
+from importlib import import_module
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpRequest
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from django.utils import timezone
+
+from .admin import mark_as_deleted
+from .backends import user_cache_key
+from .forms import EleveForm, VerificationCodeForm
+from .management.commands import benchmark_views
+from school.celery import app as celery_app
+from .models import (
+    AnneeScolaire, AuditLog, User, Ecole, ClasseScolaire, Eleve, EmploiDuTemps, Enseignant, Frequence, Matiere,
+    Note, NoteArchive, Notification, Paiement, PasswordResetCode, SearchEntry, Tendance,
+)
+from .tasks import (
+    generate_school_report, generate_school_reports, purge_expired_reset_codes, send_pending_notifications,
+    snapshot_tendances,
+)
+from . import (
+    archives, audit, compaction, doublons, loaders, profiling, promotion, ratelimit, search, tendances, timetable,
+)
+from .profiling import QueryBudgetExceeded, RequestProfile, query_shape
+
+# Configuration de production (cache partagé, Redis) : sessions et utilisateur lus dans le cache
+SHARED_CACHE = override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=300,
+)
+
+# URL name -> (rôle connecté ou None, fonction des fixtures renvoyant les arguments)
+ROUTES = {
+    'home': (None, lambda f: []),
+    'login': (None, lambda f: []),
+    'logout': (None, lambda f: []),
+    'password_reset': (None, lambda f: []),
+    'password_reset_done': (None, lambda f: []),
+    'password_reset_confirm': (None, lambda f: ['MQ', 'set-password']),
+    'password_reset_complete': (None, lambda f: []),
+    'admin_dashboard': ('admin', lambda f: []),
+    'admin_dashboard_async': ('admin', lambda f: []),
+    'profiling_summary': ('admin', lambda f: []),
+    'eleve_list': ('admin', lambda f: []),
+    'eleve_create': ('admin', lambda f: []),
+    'eleve_update': ('admin', lambda f: [f['eleve'].pk]),
+    'eleve_delete': ('admin', lambda f: [f['eleve'].pk]),
+    'enseignant_list': ('admin', lambda f: []),
+    'enseignant_create': ('admin', lambda f: []),
+    'enseignant_update': ('admin', lambda f: [f['enseignant'].pk]),
+    'enseignant_delete': ('admin', lambda f: [f['enseignant'].pk]),
+    'matiere_list': ('admin', lambda f: []),
+    'matiere_create': ('admin', lambda f: []),
+    'matiere_update': ('admin', lambda f: [f['matiere'].pk]),
+    'matiere_delete': ('admin', lambda f: [f['matiere'].pk]),
+    'classescolaire_list': ('admin', lambda f: []),
+    'classescolaire_create': ('admin', lambda f: []),
+    'classescolaire_update': ('admin', lambda f: [f['classe'].pk]),
+    'classescolaire_delete': ('admin', lambda f: [f['classe'].pk]),
+    'directeur_list': ('admin', lambda f: []),
+    'directeur_create': ('admin', lambda f: []),
+    'directeur_update': ('admin', lambda f: [f['directeur'].pk]),
+    'directeur_delete': ('admin', lambda f: [f['directeur'].pk]),
+    'admin_list': ('admin', lambda f: []),
+    'admin_create': ('admin', lambda f: []),
+    'admin_update': ('admin', lambda f: [f['admin'].pk]),
+    'admin_delete': ('admin', lambda f: [f['admin'].pk]),
+    'parent_dashboard': ('parent', lambda f: []),
+    'parent_dashboard_async': ('parent', lambda f: []),
+    'parent_api': ('parent', lambda f: []),
+    'autocomplete': ('admin', lambda f: ['eleve']),
+    'timetable_occupation': ('directeur', lambda f: []),
+    'enseignant_dashboard': ('enseignant', lambda f: []),
+    'enseignant_dashboard_async': ('enseignant', lambda f: []),
+    'note_create': ('enseignant', lambda f: [f['eleve'].pk]),
+    'note_update': ('enseignant', lambda f: [f['note'].pk]),
+    'note_delete': ('enseignant', lambda f: [f['note'].pk]),
+    'directeur_dashboard': ('directeur', lambda f: []),
+    'directeur_dashboard_async': ('directeur', lambda f: []),
+    'directeur_tendances': ('directeur', lambda f: []),
+}
+
+
+class QueryCountRegressionTests(TestCase):
+    """
+    Chaque URL de schoolcopal doit exécuter le même nombre de requêtes SQL
+    quelle que soit la quantité d'élèves, de matières ou de classes.
+    """
+    SMALL = {'classes_par_niveau': 1, 'eleves_par_classe': 2, 'matieres': 2, 'jours': 1}
+    LARGE = {'classes_par_niveau': 3, 'eleves_par_classe': 7, 'matieres': 5, 'jours': 3}
+
+    def test_every_url_is_covered(self):
+        names = {
+            name for name in get_resolver('schoolcopal.urls').reverse_dict.keys() if isinstance(name, str)
+        }
+        self.assertEqual(names - set(ROUTES), set(), "URLs sans mesure du nombre de requêtes")
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.measure(self.SMALL)
+        large = self.measure(self.LARGE)
+
+        failures = []
+        for name, (status, shapes) in large.items():
+            small_status, small_shapes = small[name]
+            self.assertLess(status, 500, name)
+            count, small_count = sum(shapes.values()), sum(small_shapes.values())
+            if count == small_count:
+                continue
+            grown = [
+                f"    x{repeats} (x{small_shapes[shape]} à petite échelle) {shape}"
+                for shape, repeats in shapes.most_common()
+                if repeats > small_shapes[shape]
+            ]
+            failures.append(
+                f"{name}: {small_count} -> {count} requêtes\n" + "\n".join(grown)
+            )
+        if failures:
+            self.fail("Le nombre de requêtes dépend du volume de données :\n" + "\n".join(failures))
+
+    def build_fixtures(self):
+        enseignant = Enseignant.objects.filter(classe__isnull=False).select_related('user', 'classe').first()
+        eleve = Eleve.objects.filter(classe=enseignant.classe).first()
+        return {
+            'enseignant': enseignant,
+            'classe': enseignant.classe,
+            'eleve': eleve,
+            'note': Note.objects.filter(eleve=eleve).first(),
+            'matiere': Matiere.objects.filter(classe=enseignant.classe).first(),
+            'admin': User.objects.create_user(
+                'qc-admin', 'qc-admin@example.com', 'pw', role='admin', ecole_id=enseignant.classe.ecole_id
+            ),
+            'directeur': User.objects.filter(role='directeur').first(),
+            'parent': User.objects.filter(role='parent', enfants__isnull=False).first(),
+        }
+
+    def measure(self, scale):
+        """Génère le jeu de données, mesure chaque URL (requêtes par forme) puis annule tout."""
+        results = {}
+        with transaction.atomic():
+            cache.clear()
+            call_command('seed_school', stdout=StringIO(), **scale)
+            fixtures = self.build_fixtures()
+            users = {
+                'admin': fixtures['admin'],
+                'directeur': fixtures['directeur'],
+                'enseignant': fixtures['enseignant'].user,
+                'parent': fixtures['parent'],
+            }
+            for name, (role, args) in ROUTES.items():
+                self.client.logout()
+                if role:
+                    self.client.force_login(users[role])
+                url = reverse(f'schoolcopal:{name}', args=args(fixtures))
+                self.client.get(url)  # chauffe : session et utilisateur en cache
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                results[name] = (
+                    response.status_code, Counter(query_shape(query['sql']) for query in queries.captured_queries),
+                )
+            transaction.set_rollback(True)
+        cache.clear()
+        return results
+
+
+class BenchmarkViewsTests(TestCase):
+    """benchmark_views : vues sans données ignorées, pire nombre de requêtes des répétitions."""
+
+    def test_school_without_teacher_is_measured(self):
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=1, eleves_par_classe=1,
+                     matieres=1, jours=1)
+        Enseignant.objects.update(classe=None)
+        command = benchmark_views.Command(stdout=StringIO())
+        self.assertIsNone(command.user_for('enseignant'))
+        results = command.run_views(repeat=2)
+        self.assertFalse({'enseignant_dashboard', 'note_create', 'note_update'} & set(results))
+        dashboard = results['directeur_dashboard']
+        self.assertEqual(len(dashboard['queries_per_repeat']), 2)
+        self.assertEqual(dashboard['queries'], max(dashboard['queries_per_repeat']))
+
+
+class TenancyTests(TestCase):
+    """Chaque école ne voit que ses propres données."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), ecoles=2, classes_par_niveau=1, eleves_par_classe=2,
+                     matieres=1, jours=1)
+        self.ecole, self.autre = Ecole.objects.filter(nom__startswith='École ').order_by('pk')[:2]
+        self.admin = User.objects.create_user('t-admin', 't-admin@example.com', 'pw', role='admin', ecole=self.ecole)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_lists_are_scoped_to_the_user_school(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('schoolcopal:eleve_list'))
+        ecoles = {eleve.ecole_id for eleve in response.context['eleves']}
+        self.assertEqual(ecoles, {self.ecole.pk})
+
+    def test_other_school_objects_are_not_found(self):
+        self.client.force_login(self.admin)
+        eleve = Eleve.objects.filter(ecole=self.autre).first()
+        response = self.client.get(reverse('schoolcopal:eleve_update', args=[eleve.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ALLOWED_HOSTS=['autre.example.com'])
+    def test_host_selects_the_school(self):
+        self.autre.domaine = 'autre.example.com'
+        self.autre.save()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('schoolcopal:admin_dashboard'), HTTP_HOST='autre.example.com')
+        self.assertRedirects(response, reverse('schoolcopal:login'), fetch_redirect_response=False)
+
+
+    def test_teacher_without_class_sees_no_notes(self):
+        user = User.objects.create_user('t-prof', 't-prof@example.com', 'pw', role='enseignant', ecole=self.ecole)
+        Enseignant.objects.create(user=user, ecole=self.ecole)
+        # Élève sans classe (sortant) d'une autre école
+        note = Note.objects.filter(eleve__ecole=self.autre).select_related('eleve').first()
+        Eleve.objects.filter(pk=note.eleve_id).update(classe=None)
+        self.client.force_login(user)
+        for name in ('note_update', 'note_delete'):
+            response = self.client.get(reverse(f'schoolcopal:{name}', args=[note.pk]))
+            self.assertEqual(response.status_code, 404, name)
+        self.client.post(reverse('schoolcopal:note_delete', args=[note.pk]))
+        self.assertTrue(Note.objects.filter(pk=note.pk, deleted_at__isnull=True).exists())
+
+
+class AsyncDashboardTests(TestCase):
+    """Les tableaux de bord async affichent les mêmes données que leurs versions synchrones."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), classes_par_niveau=1, eleves_par_classe=3, matieres=2, jours=1)
+        enseignant = Enseignant.objects.filter(classe__isnull=False).select_related('user').first()
+        self.users = {
+            'admin': User.objects.create_user(
+                'a-admin', 'a-admin@example.com', 'pw', role='admin', ecole_id=enseignant.ecole_id
+            ),
+            'directeur': User.objects.filter(role='directeur').first(),
+            'enseignant': enseignant.user,
+            'parent': User.objects.filter(role='parent', enfants__isnull=False).first(),
+        }
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_async_context_matches_sync(self):
+        for role, user in self.users.items():
+            self.client.force_login(user)
+            sync = self.client.get(reverse(f'schoolcopal:{role}_dashboard'))
+            asynchrone = self.client.get(reverse(f'schoolcopal:{role}_dashboard_async'))
+            self.assertEqual(asynchrone.status_code, 200, role)
+            for key in sync.context.keys():
+                if key.startswith('total_') or key in ('students', 'enseignants', 'children_data', 'recent_report'):
+                    self.assertEqual(repr(asynchrone.context[key]), repr(sync.context[key]), f"{role}: {key}")
+
+    def test_async_director_shows_nightly_report(self):
+        directeur = self.users['directeur']
+        generate_school_report(directeur.ecole_id)
+        rapport = {'nom': directeur.ecole.nom, 'total_eleves': Ecole.objects.get(pk=directeur.ecole_id).effectif}
+        Eleve.objects.create(
+            nom="Nouveau", prenom="Élève", age=8, sexe='garcon', ecole_id=directeur.ecole_id,
+            parent_id=self.users['parent'],
+            classe=ClasseScolaire.objects.for_ecole(directeur.ecole_id).first(),
+        )
+        self.assertEqual(Ecole.objects.get(pk=directeur.ecole_id).effectif, rapport['total_eleves'] + 1)
+        self.client.force_login(directeur)
+        for name in ('directeur_dashboard', 'directeur_dashboard_async'):
+            self.assertEqual(self.client.get(reverse(f'schoolcopal:{name}')).context['recent_report'], rapport, name)
+
+    def test_anonymous_is_redirected_to_login(self):
+        response = self.client.get(reverse('schoolcopal:admin_dashboard_async'))
+        self.assertEqual(response.status_code, 302)
+
+
+class ParentApiTests(TestCase):
+    """API JSON du portail parent : GET conditionnel et compression."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), classes_par_niveau=1, eleves_par_classe=3, matieres=2, jours=3)
+        self.parent = User.objects.filter(role='parent', enfants__isnull=False).first()
+        self.client.force_login(self.parent)
+        self.url = reverse('schoolcopal:parent_api')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_payload_lists_the_children(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        enfants = response.json()['enfants']
+        self.assertEqual({e['id'] for e in enfants}, set(self.parent.enfants.values_list('id', flat=True)))
+        self.assertEqual(set(enfants[0]), {
+            'id', 'nom', 'prenom', 'date_naissance', 'classe', 'matieres', 'notes', 'moyennes', 'presences', 'soldes',
+        })
+
+    @SHARED_CACHE
+    def test_not_modified_until_a_note_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(profile.query_count, 2)  # enfants + version
+
+        note = Note.objects.filter(eleve__parent_id=self.parent).first()
+        note.valeur = 1
+        note.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_school_year_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        ancienne = AnneeScolaire.objects.get(ecole_id=self.parent.enfants.first().ecole_id, active=True)
+        ancienne.active, ancienne.cloturee = False, True
+        ancienne.save()
+        AnneeScolaire.objects.create(ecole_id=ancienne.ecole_id, libelle="2099-2100", debut=date(2099, 9, 1),
+                                     fin=date(2100, 7, 31), active=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([enfant['notes'] for enfant in response.json()['enfants']], [[]] * len(response.json()['enfants']))
+
+    def test_gzip(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        # GZip rend l'ETag faible ; la comparaison If-None-Match reste valable
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class KeysetPaginationTests(TestCase):
+    """Pagination par curseur des listes admin : ordre stable, sans OFFSET."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), classes_par_niveau=2, eleves_par_classe=9, matieres=1, jours=1)
+        ecole = Ecole.objects.filter(nom__startswith='École ').first()
+        self.client.force_login(
+            User.objects.create_user('k-admin', 'k-admin@example.com', 'pw', role='admin', ecole=ecole)
+        )
+        self.attendus = list(
+            Eleve.objects.filter(ecole=ecole, deleted_at__isnull=True).order_by('nom', 'prenom', 'id')
+            .values_list('id', flat=True)
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def pages(self, url, direction='next'):
+        ids, query = [], ''
+        while True:
+            response = self.client.get(f"{url}?{query}")
+            page = response.context['page_obj']
+            ids.append([eleve.id for eleve in page])
+            if not getattr(page, f'has_{direction}')():
+                return ids, response
+            query = getattr(page, f'{direction}_query')
+
+    def test_forward_then_backward_walks_every_row_once(self):
+        url = reverse('schoolcopal:eleve_list')
+        pages, response = self.pages(url)
+        self.assertEqual([i for page in pages for i in page], self.attendus)
+        self.assertEqual(response.context['page_obj'].paginator.count, len(self.attendus))
+
+        # Retour arrière depuis la dernière page
+        retour = []
+        page = response.context['page_obj']
+        while page.has_previous():
+            page = self.client.get(f"{url}?{page.previous_query}").context['page_obj']
+            retour.insert(0, [eleve.id for eleve in page])
+        self.assertEqual(retour, pages[:-1])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        url = reverse('schoolcopal:eleve_list')
+        self.client.get(url)
+        first = RequestProfile()
+        with connection.execute_wrapper(first):
+            page = self.client.get(url).context['page_obj']
+        while page.has_next():
+            query = page.next_query
+            page = self.client.get(f"{url}?{query}").context['page_obj']
+        deep = RequestProfile()
+        with connection.execute_wrapper(deep):
+            self.client.get(f"{url}?{query}")
+        self.assertEqual(deep.query_count, first.query_count)
+        self.assertFalse(any('OFFSET' in shape for shape in deep.shapes))
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('schoolcopal:eleve_list') + '?cursor=pas-un-curseur')
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTests(TestCase):
+    """Recherche indexée : préfixes, accents, synchronisation par signaux."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(nom="École Recherche", type='publique', adresse="Yaoundé")
+        self.parent = User.objects.create_user(
+            'p.ngassa@example.com', 'p.ngassa@example.com', 'pw', role='parent', telephone='677001122', ecole=self.ecole,
+        )
+        self.eleve = Eleve.objects.create(
+            ecole=self.ecole, nom="N'Guessan", prenom="Élodie", age=8, sexe='fille', parent_id=self.parent,
+        )
+
+    def eleves(self, query):
+        return set(search.object_ids(query, 'eleve', self.ecole).values_list('object_id', flat=True))
+
+    def test_accent_insensitive_prefix(self):
+        self.assertEqual(self.eleves("elo ngue"), {self.eleve.pk})
+        self.assertEqual(self.eleves("ÉLODIE"), {self.eleve.pk})
+        self.assertEqual(self.eleves("guessan"), {self.eleve.pk})
+        self.assertEqual(self.eleves("lodie"), set())
+
+    def test_pupil_found_by_parent_phone_and_email(self):
+        self.assertEqual(self.eleves("677001"), {self.eleve.pk})
+        self.assertEqual(self.eleves("p ngassa"), {self.eleve.pk})
+
+    def test_migration_fills_index_like_rebuild(self):
+        # La migration garde sa propre copie des fonctions de texte : mêmes entrées que rebuild()
+        remplir_index = import_module('schoolcopal.migrations.0008_search_index').remplir_index
+        User.objects.create_user('e.fotso', 'e.fotso@example.com', 'pw', role='enseignant', first_name="Éric",
+                                 last_name="Fotso", ecole=self.ecole)
+        search.rebuild()
+        fields = ('kind', 'object_id', 'ecole_id', 'libelle', 'texte')
+        attendu = set(SearchEntry.objects.values_list(*fields))
+        SearchEntry.objects.all().delete()
+        remplir_index(apps, None)
+        self.assertEqual(set(SearchEntry.objects.values_list(*fields)), attendu)
+        self.assertEqual(len(attendu), 3)
+
+    def test_signals_keep_index_in_sync(self):
+        self.parent.telephone = '699887766'
+        self.parent.save()
+        self.assertEqual(self.eleves("699887"), {self.eleve.pk})
+        self.assertEqual(self.eleves("677001"), set())
+
+        self.eleve.delete()  # suppression logique
+        self.assertEqual(self.eleves("elodie"), set())
+
+    def test_admin_list_filter(self):
+        admin = User.objects.create_user('s-admin', 's-admin@example.com', 'pw', role='admin', ecole=self.ecole)
+        Eleve.objects.create(ecole=self.ecole, nom="Mbarga", prenom="Paul", age=9, sexe='garcon', parent_id=self.parent)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('schoolcopal:eleve_list'), {'q': 'elodie'})
+        self.assertEqual([eleve.pk for eleve in response.context['eleves']], [self.eleve.pk])
+
+
+class AutocompleteTests(TestCase):
+    """Endpoints d'autocomplétion : périmètre école / classe et pagination par curseur."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), ecoles=2, classes_par_niveau=1, eleves_par_classe=4,
+                     matieres=1, jours=1)
+        self.ecole, self.autre = Ecole.objects.filter(nom__startswith='École ').order_by('pk')[:2]
+        self.admin = User.objects.create_user('a-admin', 'a-admin@example.com', 'pw', role='admin', ecole=self.ecole)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get(self, kind, **params):
+        return self.client.get(reverse('schoolcopal:autocomplete', args=[kind]), params)
+
+    def test_results_are_scoped_and_paginated(self):
+        self.client.force_login(self.admin)
+        expected = list(Eleve.objects.filter(ecole=self.ecole, deleted_at__isnull=True)
+                        .order_by('nom', 'prenom', 'id').values_list('pk', flat=True))
+        seen, cursor = [], None
+        while True:
+            data = self.get('eleve', **({'cursor': cursor} if cursor else {})).json()
+            seen += [item['id'] for item in data['results']]
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertGreater(len(expected), 20)
+        self.assertEqual(seen, expected)
+
+    def test_query_uses_search_index(self):
+        eleve = Eleve.objects.filter(ecole=self.ecole).first()
+        self.client.force_login(self.admin)
+        data = self.get('eleve', q=f"{eleve.prenom} {eleve.nom}").json()
+        self.assertIn(eleve.pk, [item['id'] for item in data['results']])
+        self.assertEqual(self.get('ecole').json()['results'], [{'id': self.ecole.pk, 'text': str(self.ecole)}])
+
+    def test_teacher_limited_to_own_class(self):
+        enseignant = Enseignant.objects.filter(ecole=self.ecole, classe__isnull=False).select_related('user').first()
+        self.client.force_login(enseignant.user)
+        ids = {item['id'] for item in self.get('eleve').json()['results']}
+        self.assertEqual(ids, set(Eleve.objects.filter(classe=enseignant.classe).values_list('pk', flat=True)))
+        self.assertEqual(self.get('parent').status_code, 404)
+        self.assertEqual(self.get('inconnu').status_code, 404)
+
+    def test_form_renders_only_selected_choice(self):
+        eleve = Eleve.objects.filter(ecole=self.ecole).first()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('schoolcopal:eleve_update', args=[eleve.pk]))
+        html = str(response.context['form']['classe'])
+        self.assertIn('data-autocomplete-url', html)
+        self.assertEqual(html.count('<option'), 2)
+
+
+class AdminChangelistTests(TestCase):
+    """Changelists de l'admin Django : nombre de requêtes indépendant du volume."""
+
+    MODELS = ['user', 'ecole', 'matiere', 'classescolaire', 'eleve', 'enseignant',
+              'frequence', 'note', 'paiement', 'emploidutemps', 'notification']
+
+    def setUp(self):
+        cache.clear()
+        self.superuser = User.objects.create_superuser('root', 'root@example.com', 'pw', role='admin')
+
+    def tearDown(self):
+        cache.clear()
+
+    def measure(self, **scale):
+        counts = {}
+        with transaction.atomic():
+            cache.clear()
+            call_command('seed_school', stdout=StringIO(), **scale)
+            self.client.force_login(self.superuser)
+            for model in self.MODELS:
+                url = reverse(f'admin:schoolcopal_{model}_changelist')
+                self.assertEqual(self.client.get(url).status_code, 200, model)  # chauffe : filtres et total en cache
+                profile = RequestProfile()
+                with connection.execute_wrapper(profile):
+                    self.client.get(url)
+                counts[model] = profile.query_count
+            transaction.set_rollback(True)
+        return counts
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.measure(ecoles=1, classes_par_niveau=1, eleves_par_classe=2, matieres=1, jours=1)
+        large = self.measure(ecoles=2, classes_par_niveau=2, eleves_par_classe=6, matieres=2, jours=3)
+        self.assertEqual(large, small)
+
+
+@override_settings(RATE_LIMITS={'login': (3, 300), 'password_reset': (2, 3600)})
+class RateLimitTests(TestCase):
+    """Limitation des tentatives : refus en 429, sans requête SQL ni hachage."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('r-parent', 'r-parent@example.com', 'secret', role='parent')
+
+    def tearDown(self):
+        cache.clear()
+
+    def login(self, username, ip='10.0.0.1'):
+        return self.client.post(reverse('schoolcopal:login'), {'username': username, 'password': 'faux'},
+                                REMOTE_ADDR=ip)
+
+    def test_login_rejected_before_any_query(self):
+        for _ in range(3):
+            self.assertEqual(self.login('r-parent').status_code, 200)
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            response = self.login('r-parent')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(profile.query_count, 0)
+
+    def test_limits_apply_per_ip_and_per_username(self):
+        for _ in range(3):
+            self.login('r-parent', ip='10.0.0.2')
+        # Même compte depuis une autre IP : refusé ; autre compte depuis une autre IP : permis
+        self.assertEqual(self.login('r-parent', ip='10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('autre', ip='10.0.0.4').status_code, 200)
+
+    def test_password_reset_limited_by_email(self):
+        url = reverse('schoolcopal:password_reset')
+        for ip in ('10.0.1.1', '10.0.1.2'):
+            self.client.post(url, {'email': 'r-parent@example.com'}, REMOTE_ADDR=ip)
+        response = self.client.post(url, {'email': 'R-Parent@example.com'}, REMOTE_ADDR='10.0.1.3')
+        self.assertEqual(response.status_code, 429)
+
+
+    @override_settings(TRUSTED_PROXIES=['10.1.0.0/16'])
+    def test_client_ip_behind_trusted_proxies(self):
+        request = HttpRequest()
+        request.META = {'REMOTE_ADDR': '10.1.0.5', 'HTTP_X_FORWARDED_FOR': '1.2.3.4, 198.51.100.7, 10.1.0.9'}
+        # Adresse forgée par le client (1.2.3.4) ignorée : la dernière hors proxys de confiance
+        self.assertEqual(ratelimit.client_ip(request), '198.51.100.7')
+        request.META['REMOTE_ADDR'] = '203.0.113.1'  # pas un proxy : en-tête ignoré
+        self.assertEqual(ratelimit.client_ip(request), '203.0.113.1')
+
+    @override_settings(SHARED_CACHE=False)
+    def test_process_local_counters_are_flagged(self):
+        self.assertEqual([w.id for w in ratelimit.check_shared_cache(None)], ['schoolcopal.W001'])
+
+
+class PasswordResetCodeTests(TestCase):
+    """Codes de réinitialisation : un seul code actif, vérification indexée, purge par lots."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('c-parent', 'c-parent@example.com', 'pw', role='parent')
+
+    def test_issue_replaces_previous_codes(self):
+        first = PasswordResetCode.issue(self.user, timedelta(hours=1))
+        second = PasswordResetCode.issue(self.user, timedelta(hours=1))
+        self.assertEqual(list(self.user.reset_codes.values_list('pk', flat=True)), [second.pk])
+        self.assertFalse(VerificationCodeForm({'verification_code': str(first.code)}, user=self.user).is_valid())
+
+    def test_verification_is_a_single_query(self):
+        code = PasswordResetCode.issue(self.user, timedelta(hours=1))
+        form = VerificationCodeForm({'verification_code': str(code.code)}, user=self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        expired = PasswordResetCode.issue(self.user, timedelta(hours=-1))
+        self.assertFalse(VerificationCodeForm({'verification_code': str(expired.code)}, user=self.user).is_valid())
+
+    def test_purge_deletes_expired_codes_in_batches(self):
+        users = [User.objects.create_user(f'c-{i}', f'c-{i}@example.com', 'pw', role='parent') for i in range(5)]
+        for user in users:
+            PasswordResetCode.issue(user, timedelta(hours=-1))
+        valid = PasswordResetCode.issue(self.user, timedelta(hours=1))
+        self.assertEqual(purge_expired_reset_codes(batch_size=2), 5)
+        self.assertEqual(list(PasswordResetCode.objects.values_list('pk', flat=True)), [valid.pk])
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class CeleryTopologyTests(TestCase):
+    """Routage des tâches par file et envoi des e-mails hors de la requête."""
+
+    def tearDown(self):
+        cache.clear()
+
+    def queue(self, name):
+        return celery_app.amqp.router.route({}, name)['queue'].name
+
+    def test_routes(self):
+        self.assertEqual(self.queue('schoolcopal.tasks.send_transactional_email'), 'email')
+        self.assertEqual(self.queue('schoolcopal.tasks.send_pending_notifications'), 'notifications')
+        self.assertEqual(self.queue('schoolcopal.tasks.generate_school_report'), 'reports')
+        self.assertEqual(self.queue('schoolcopal.tasks.purge_expired_reset_codes'), 'default')
+        self.assertTrue(celery_app.conf.task_ignore_result)
+
+    def test_password_reset_email_sent_after_commit(self):
+        User.objects.create_user('m-parent', 'm-parent@example.com', 'pw', role='parent')
+        mail.outbox.clear()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(reverse('schoolcopal:password_reset'), {'email': 'm-parent@example.com'})
+            self.assertEqual(mail.outbox, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(mail.outbox[0].to, ['m-parent@example.com'])
+        code = PasswordResetCode.objects.get(user__username='m-parent').code
+        self.assertIn(str(code), mail.outbox[0].body)
+
+    def test_pending_notifications_sent_in_batches(self):
+        user = User.objects.create_user('n-parent', 'n-parent@example.com', 'pw', role='parent')
+        Notification.objects.bulk_create([Notification(destinataire=user, message=f"m{i}", type='email') for i in range(5)])
+        Notification.objects.create(destinataire=user, message="sms", type='sms')
+        mail.outbox.clear()
+        self.assertEqual(send_pending_notifications(batch_size=2), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(Notification.objects.filter(type='email', envoye=False).exists())
+        self.assertTrue(Notification.objects.filter(type='sms', envoye=False).exists())
+
+    def test_report_stored_for_director(self):
+        # Stocké en base : le cache du worker (locmem en repli) n'est pas celui des processus web
+        ecole = Ecole.objects.create(nom="École Rapport", type='publique', adresse="Douala")
+        generate_school_reports()
+        cache.clear()
+        ecole.refresh_from_db()
+        self.assertEqual(ecole.rapport, {'nom': "École Rapport", 'total_eleves': 0})
+        self.assertIsNotNone(ecole.rapport_le)
+
+
+class TimetableTests(TestCase):
+    """Générateur d'emploi du temps : quotas respectés, aucun conflit de classe ni de salle."""
+
+    def setUp(self):
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=2, eleves_par_classe=1,
+                     matieres=8, jours=1)
+        self.ecole = Ecole.objects.get(nom='École 1')
+
+    def test_generated_timetable_is_conflict_free(self):
+        salles = [f"S{i}" for i in range(10)]  # moins de salles que de classes
+        call_command('generate_timetable', stdout=StringIO(), ecole=self.ecole.pk, salles=salles)
+        emplois = list(EmploiDuTemps.objects.for_ecole(self.ecole).values_list('classe', 'matiere', 'jour', 'heure', 'salle'))
+        quotas = dict(Matiere.objects.for_ecole(self.ecole).values_list('pk', 'heures_hebdo'))
+        self.assertEqual(len(emplois), sum(quotas.values()))
+        self.assertEqual(Counter(matiere for _, matiere, _, _, _ in emplois), Counter(quotas))
+        self.assertEqual(len({(classe, jour, heure) for classe, _, jour, heure, _ in emplois}), len(emplois))
+        self.assertEqual(len({(salle, jour, heure) for _, _, jour, heure, salle in emplois}), len(emplois))
+
+    def test_infeasible_constraints_raise(self):
+        with self.assertRaises(timetable.TimetableError):
+            timetable.generate(self.ecole, salles=['S1'])
+
+
+class TimetableIndexTests(TestCase):
+    """Index d'intervalles : conflits refusés à l'enregistrement, occupation à jour."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=1, eleves_par_classe=1,
+                     matieres=1, jours=1)
+        self.ecole = Ecole.objects.get(nom='École 1')
+        self.classes = list(ClasseScolaire.objects.for_ecole(self.ecole)[:2])
+        self.cours = EmploiDuTemps.objects.create(
+            classe=self.classes[0], jour='lundi', heure=time(8, 0), heure_fin=time(9, 0), salle='Salle A',
+        )
+
+    def emploi(self, classe, debut, fin, salle):
+        return EmploiDuTemps(classe=classe, jour='lundi', heure=debut, heure_fin=fin, salle=salle)
+
+    def test_overlapping_course_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.emploi(self.classes[1], time(8, 30), time(9, 30), ' salle  a ').save()  # même salle
+        with self.assertRaises(ValidationError):
+            self.emploi(self.classes[0], time(7, 30), time(8, 15), 'Salle B').full_clean()  # même classe
+        self.emploi(self.classes[1], time(9, 0), time(10, 0), 'Salle A').save()  # contigu : permis
+        self.cours.heure_fin = time(9, 30)
+        with self.assertRaises(ValidationError):
+            self.cours.save()
+
+    def test_conflict_check_reads_the_database(self):
+        # bulk_create n'émet pas de signal : l'index en mémoire ne voit pas ce cours
+        timetable.get_index(self.ecole.pk)
+        EmploiDuTemps.objects.bulk_create([self.emploi(self.classes[1], time(10, 0), time(11, 0), 'Salle C')])
+        emploi = self.emploi(self.classes[0], time(10, 30), time(11, 30), 'SALLE c')
+        with self.assertNumQueries(1):
+            found = timetable.conflicts(emploi)
+        self.assertEqual([str(cours) for cours in found], [f"{str(self.classes[1]).strip()} (Salle C) 10:00-11:00"])
+
+    def test_accented_rooms_match_in_database_and_index(self):
+        # SQLite ne replie la casse que pour l'ASCII : les deux chemins comparent cle_salle
+        EmploiDuTemps.objects.bulk_create([self.emploi(self.classes[1], time(10, 0), time(11, 0), 'Salle  Été')])
+        with self.assertRaises(ValidationError):
+            self.emploi(self.classes[0], time(10, 30), time(11, 30), 'SALLE ÉTÉ').save()
+        self.assertFalse(timetable.salle_libre(self.ecole, 'salle été', 'lundi', time(10, 30)))
+
+    def test_index_finds_courses_hidden_by_older_overlaps(self):
+        # Données anciennes qui se chevauchent : un long cours commencé avant un cours court
+        index = timetable.IntervalIndex([
+            ('lundi', timetable.Cours(1, 480, 720, 1, '6e A', 'Salle A', '')),
+            ('lundi', timetable.Cours(2, 540, 600, 2, '5e A', 'Salle A', '')),
+        ])
+        self.assertEqual([cours.id for cours in index.overlapping('salle', 'salle a', 'lundi', 630, 660)], [1])
+        self.assertEqual(index.at('salle', 'Salle A', 'lundi', 650).id, 1)
+        self.assertEqual(index.at('salle', 'Salle A', 'lundi', 570).id, 2)
+        self.assertIsNone(index.at('salle', 'Salle A', 'lundi', 720))
+
+    def test_occupancy_lookup_follows_changes(self):
+        self.assertFalse(timetable.salle_libre(self.ecole, 'Salle A', 'lundi', time(8, 59)))
+        self.assertTrue(timetable.salle_libre(self.ecole, 'Salle A', 'lundi', time(9, 0), time(11, 0)))
+        self.assertEqual(timetable.cours_de_classe(self.ecole, self.classes[0].pk, 'lundi', time(8, 0)).id, self.cours.pk)
+        self.cours.salle = 'Salle B'
+        self.cours.save()
+        self.assertTrue(timetable.salle_libre(self.ecole, 'Salle A', 'lundi', time(8, 30)))
+        self.cours.delete()
+        self.assertIsNone(timetable.cours_de_classe(self.ecole, self.classes[0].pk, 'lundi', time(8, 0)))
+
+    def test_occupation_endpoint(self):
+        self.client.force_login(User.objects.filter(role='directeur', ecole=self.ecole).first())
+        url = reverse('schoolcopal:timetable_occupation')
+        data = self.client.get(url, {'salle': 'Salle A', 'jour': 'lundi', 'heure': '08:30'}).json()
+        self.assertFalse(data['libre'])
+        self.assertEqual(data['cours'][0]['debut'], '08:00')
+        data = self.client.get(url, {'classe': self.classes[0].pk, 'jour': 'lundi', 'heure': '09:00'}).json()
+        self.assertIsNone(data['cours'])
+        self.assertEqual(self.client.get(url, {'heure': '25:00', 'classe': 1}).status_code, 400)
+
+
+class AuditLogTests(TestCase):
+    """Journal d'audit : qui a changé quelle note, écrit en un seul INSERT par requête."""
+
+    def setUp(self):
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=1, eleves_par_classe=3,
+                     matieres=2, jours=1)
+        self.enseignant = Enseignant.objects.filter(classe__isnull=False).select_related('user').first()
+        self.notes = Note.objects.filter(eleve__classe=self.enseignant.classe)
+
+    def test_note_update_is_logged_with_author(self):
+        note = self.notes.first()
+        self.client.force_login(self.enseignant.user)
+        self.client.post(reverse('schoolcopal:note_update', args=[note.pk]), {
+            'eleve': note.eleve_id, 'matiere': note.matiere_id, 'valeur': '3.25',
+            'trimestre': note.trimestre, 'sequence': note.sequence,
+        })
+        entry = AuditLog.objects.get(model='schoolcopal.note', object_id=note.pk)
+        self.assertEqual((entry.action, entry.user_id), ('update', self.enseignant.user_id))
+        self.assertEqual(entry.changes, {'valeur': [str(note.valeur), '3.25']})
+
+    def test_batch_is_flushed_in_one_insert(self):
+        changed = self.notes.exclude(valeur=10).count()
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile), audit.capture(self.enseignant.user):
+            for note in self.notes:
+                note.valeur = 10
+                note.save()
+            note.delete()
+        inserts = [shape for shape in profile.shapes.elements() if 'INSERT INTO "schoolcopal_auditlog"' in shape]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AuditLog.objects.filter(action='update').count(), changed)
+        self.assertEqual(AuditLog.objects.get(action='delete').changes['deleted_at'][0], None)
+
+    def test_admin_bulk_soft_delete_is_logged_once(self):
+        admin_user = User.objects.create_user('al-admin', 'al-admin@example.com', 'pw', role='admin')
+        request = HttpRequest()
+        request.user = admin_user
+        ids = list(self.notes.values_list('pk', flat=True))
+        with self.assertNumQueries(5):  # SAVEPOINT, lecture, INSERT du journal, UPDATE, RELEASE
+            mark_as_deleted(None, request, Note.objects.filter(pk__in=ids))
+        entries = AuditLog.objects.filter(model='schoolcopal.note', action='delete')
+        self.assertEqual(sorted(entries.values_list('object_id', flat=True)), sorted(ids))
+        self.assertEqual(set(entries.values_list('user_id', flat=True)), {admin_user.pk})
+
+        mark_as_deleted(None, request, Note.objects.filter(pk__in=ids))  # déjà supprimées : rien
+        Note.objects.filter(pk__in=ids).update(deleted_at=timezone.now() - timedelta(days=400))
+        compaction.compact(vacuum=False)
+        self.assertFalse(Note.objects.filter(pk__in=ids).exists())
+        self.assertEqual(entries.count(), len(ids))  # pas de seconde entrée au compactage
+
+    def test_hard_delete_checks_existing_entries_once_per_batch(self):
+        ids = sorted(self.notes.values_list('pk', flat=True))
+        journalisees, muettes = ids[:2], ids[2:]
+        request = HttpRequest()
+        request.user = User.objects.create_user('ad-admin', 'ad-admin@example.com', 'pw', role='admin')
+        mark_as_deleted(None, request, Note.objects.filter(pk__in=journalisees))
+        Note.objects.filter(pk__in=muettes).update(deleted_at=timezone.now())  # sans journal
+        # lecture, DELETE, puis une vérification et un INSERT pour tout le lot
+        with self.assertNumQueries(4), audit.capture():
+            Note._base_manager.filter(pk__in=ids).delete()
+        entries = AuditLog.objects.filter(model='schoolcopal.note', action='delete')
+        self.assertEqual(sorted(entries.values_list('object_id', flat=True)), ids)
+
+    def test_entries_are_append_only(self):
+        with audit.capture():
+            Note.objects.filter(pk=self.notes.first().pk).first().save()  # aucune modification : rien
+        self.assertFalse(AuditLog.objects.exists())
+        entry = AuditLog.objects.create(model='schoolcopal.note', object_id=1, action='update', changes={})
+        with self.assertRaises(ValidationError):
+            entry.save()
+        with self.assertRaises(ValidationError):
+            entry.delete()
+
+
+class AnneeScolaireTests(TestCase):
+    """Années scolaires : rattachement par défaut et archivage des années clôturées."""
+
+    def setUp(self):
+        cache.clear()
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=1, eleves_par_classe=2,
+                     matieres=2, jours=2)
+        self.ecole = Ecole.objects.get(nom='École 1')
+        self.annee = AnneeScolaire.objects.get(ecole=self.ecole, active=True)
+        self.eleve = Eleve.objects.for_ecole(self.ecole).first()
+
+    def test_new_rows_join_the_active_year(self):
+        paiement = Paiement.objects.create(eleve=self.eleve, montant=1000, date_paiement=self.annee.debut, mode='cash')
+        self.assertEqual(paiement.annee_id, self.annee.pk)
+
+    def test_closed_year_is_archived_and_stays_readable(self):
+        notes = Note.objects.filter(annee=self.annee).count()
+        valeurs = dict(Note.objects.filter(eleve=self.eleve).values_list('pk', 'valeur'))
+        AnneeScolaire.objects.filter(pk=self.annee.pk).update(active=False, cloturee=True)
+        libelle, debut, fin = AnneeScolaire.bornes(self.annee.fin + timedelta(days=1))
+        AnneeScolaire.objects.create(ecole=self.ecole, libelle=libelle, debut=debut, fin=fin, active=True)
+        self.assertEqual(loaders.notes_par_eleve([self.eleve.pk]), {})  # année en cours seulement
+
+        call_command('archive_annees', stdout=StringIO(), ecole=self.ecole.pk, batch_size=50)
+        self.annee.refresh_from_db()
+        self.assertIsNotNone(self.annee.archivee_le)
+        for model in archives.ARCHIVES:
+            self.assertFalse(model.objects.filter(annee=self.annee).exists(), model)
+        self.assertEqual(archives.lignes(self.annee, Note).count(), notes)
+        self.assertEqual(dict(archives.lignes(self.annee, Note).filter(eleve=self.eleve).values_list('pk', 'valeur')), valeurs)
+        with self.assertRaises(ValidationError):
+            NoteArchive.objects.first().save()
+
+    def test_active_year_is_not_archived(self):
+        with self.assertRaises(archives.ArchiveError):
+            archives.archiver(self.annee)
+
+
+@override_settings(TOMBSTONE_RETENTION={'default': 30})
+class CompactionTests(TestCase):
+    """Compactage : seules les lignes supprimées depuis plus que la rétention, sans cascade."""
+
+    def setUp(self):
+        call_command('seed_school', stdout=StringIO(), ecoles=1, classes_par_niveau=1, eleves_par_classe=2,
+                     matieres=1, jours=1)
+        self.eleve = Eleve.objects.first()
+        self.long_ago = timezone.now() - timedelta(days=40)
+
+    def test_expired_tombstones_are_removed_and_exported(self):
+        notes = list(Note.objects.filter(eleve=self.eleve).order_by('pk').values_list('pk', flat=True))
+        Note.objects.filter(pk__in=notes[1:]).update(deleted_at=self.long_ago)
+        Note.objects.filter(pk=notes[0]).update(deleted_at=timezone.now() - timedelta(days=5))
+        with tempfile.TemporaryDirectory() as directory:
+            report = compaction.compact(batch_size=2, export_dir=directory)
+            with open(os.path.join(directory, 'schoolcopal.note.jsonl')) as stream:
+                self.assertEqual(len(stream.readlines()), len(notes) - 1)
+        self.assertEqual(report['schoolcopal.note'], len(notes) - 1)
+        self.assertEqual(list(Note.objects.filter(eleve=self.eleve).values_list('pk', flat=True)), notes[:1])
+        # Suppression logique faite par update() (sans journal) : la suppression réelle est journalisée
+        self.assertEqual(AuditLog.objects.filter(action='delete').count(), len(notes) - 1)
+
+    def test_audit_log_written_once_per_batch(self):
+        Note.objects.update(deleted_at=self.long_ago)
+        total = Note._base_manager.count()
+        # Par lot : SAVEPOINT, lecture du lot, lecture et DELETE de la suppression,
+        # vérification du journal, INSERT du journal, RELEASE ; puis le lot vide final
+        with self.assertNumQueries(7 * 2 + 3):
+            removed = compaction.compact_model(Note, batch_size=total // 2 + 1)
+        self.assertEqual(removed, total)
+        self.assertEqual(AuditLog.objects.filter(model='schoolcopal.note', action='delete').count(), total)
+
+    def test_referenced_rows_are_kept(self):
+        Eleve.objects.filter(pk=self.eleve.pk).update(deleted_at=self.long_ago)
+        report = compaction.compact()
+        self.assertEqual(report['schoolcopal.eleve'], 0)
+        self.assertTrue(Note.objects.filter(eleve=self.eleve).exists())
+        for model in (Note, Frequence, Paiement):
+            model.objects.filter(eleve=self.eleve).update(deleted_at=self.long_ago)
+        call_command('compact_tombstones', stdout=StringIO(), no_vacuum=True)
+        self.assertFalse(Eleve.objects.filter(pk=self.eleve.pk).exists())
+
+    def test_pupils_with_archived_rows_are_kept(self):
+        annee = AnneeScolaire.objects.get(ecole=self.eleve.ecole, active=True)
+        AnneeScolaire.objects.filter(pk=annee.pk).update(active=False, cloturee=True)
+        annee.refresh_from_db()
+        archives.archiver(annee)
+        self.assertFalse(Note.objects.filter(eleve=self.eleve).exists())
+        Eleve.objects.filter(pk=self.eleve.pk).update(deleted_at=self.long_ago)
+
+        report = compaction.compact(vacuum=False)
+        self.assertEqual(report['schoolcopal.eleve'], 0)
+        self.assertTrue(Eleve.objects.filter(pk=self.eleve.pk).exists())
+        self.assertTrue(NoteArchive.objects.filter(eleve=self.eleve).exists())
+
+
+class EffectifTests(TestCase):
+    """Compteurs d'effectifs : tenus à jour par Eleve.save, recalculés en cas d'écart."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(nom="École Effectifs", type='publique', adresse="Douala")
+        self.classes = [
+            ClasseScolaire.objects.create(ecole=self.ecole, niveau='CP', section=section, capacite=2)
+            for section in 'AB'
+        ]
+        self.parent = User.objects.create_user('e-parent', 'e-parent@example.com', 'pw', role='parent', ecole=self.ecole)
+
+    def inscrire(self, classe, sexe='fille'):
+        return Eleve.objects.create(ecole=self.ecole, classe=classe, nom="Eto", prenom="Ada", age=7, sexe=sexe,
+                                    parent_id=self.parent)
+
+    def effectifs(self, obj):
+        obj.refresh_from_db()
+        return obj.effectif, obj.effectif_garcons, obj.effectif_filles
+
+    def test_enroll_transfer_and_delete(self):
+        eleve = self.inscrire(self.classes[0])
+        self.inscrire(self.classes[0], sexe='garcon')
+        self.assertEqual(self.effectifs(self.classes[0]), (2, 1, 1))
+        self.assertEqual(self.effectifs(self.ecole), (2, 1, 1))
+
+        eleve = Eleve.objects.get(pk=eleve.pk)
+        eleve.classe = self.classes[1]
+        eleve.save()
+        self.assertEqual(self.effectifs(self.classes[0]), (1, 1, 0))
+        self.assertEqual(self.effectifs(self.classes[1]), (1, 0, 1))
+        self.assertEqual(self.effectifs(self.ecole), (2, 1, 1))
+
+        eleve.delete()  # suppression logique
+        self.assertEqual(self.effectifs(self.classes[1]), (0, 0, 0))
+        Eleve.objects.filter(classe=self.classes[0]).delete()  # suppression réelle
+        self.assertEqual(self.effectifs(self.ecole), (0, 0, 0))
+
+    def test_reconciliation_fixes_drift(self):
+        self.inscrire(self.classes[0])
+        Eleve.objects.update(deleted_at=timezone.now())  # contourne Eleve.save
+        self.assertEqual(self.effectifs(self.classes[0]), (1, 0, 1))
+        out = StringIO()
+        call_command('recompter_effectifs', stdout=out, ecole=self.ecole.pk)
+        self.assertIn("1 écoles et 1 classes corrigées", out.getvalue())
+        self.assertEqual(self.effectifs(self.classes[0]), (0, 0, 0))
+
+    def test_form_reads_capacity_from_counter(self):
+        self.inscrire(self.classes[0])
+        self.inscrire(self.classes[0])
+        data = {'ecole': self.ecole.pk, 'classe': self.classes[0].pk, 'nom': "Abena", 'prenom': "Luc", 'age': 7,
+                'sexe': 'garcon', 'parent_name': "P", 'parent_email': 'p@example.com', 'parent_phone': '690000000'}
+        with CaptureQueriesContext(connection) as queries:
+            form = EleveForm(data, ecole=self.ecole)
+            self.assertFalse(form.is_valid())
+        self.assertIn('classe', form.errors)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        form = EleveForm(dict(data, classe=self.classes[1].pk), ecole=self.ecole)
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class PromotionTests(TestCase):
+    """Promotion en masse : un UPDATE par classe, redoublants laissés en place."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(nom="École Promotion", type='publique', adresse="Yaoundé")
+        self.classes = {
+            niveau: ClasseScolaire.objects.create(ecole=self.ecole, niveau=niveau, section='A')
+            for niveau in promotion.NIVEAUX
+        }
+        self.parent = User.objects.create_user('p-parent', 'p-parent@example.com', 'pw', role='parent', ecole=self.ecole,
+                                               telephone='690000000')
+        self.eleves = {
+            niveau: [
+                Eleve.objects.create(ecole=self.ecole, classe=classe, nom="Mbia", prenom=f"{niveau}{i}", age=8,
+                                     sexe='fille', parent_id=self.parent)
+                for i in range(2)
+            ]
+            for niveau, classe in self.classes.items()
+        }
+
+    def classe(self, eleve):
+        return Eleve.objects.values_list('classe__niveau', flat=True).get(pk=eleve.pk)
+
+    def test_promotes_each_level_once_and_keeps_repeaters(self):
+        matiere = Matiere.objects.create(classe=self.classes['CP'], nom="Calcul")
+        faible, bon = self.eleves['CP']
+        for trimestre, valeur in ((1, 6), (2, 8)):
+            Note.objects.create(eleve=faible, matiere=matiere, valeur=valeur, trimestre=trimestre)
+            Note.objects.create(eleve=bon, matiere=matiere, valeur=14, trimestre=trimestre)
+
+        plan = promotion.planifier(self.ecole, seuil=10, redoublants=[self.eleves['CE2'][0].pk])
+        self.assertEqual((plan.promus, plan.sortants, plan.redoublants), (8, 2, 2))
+        with self.assertNumQueries(len(promotion.NIVEAUX) + 6):
+            self.assertEqual(promotion.appliquer(plan), 10)
+
+        self.assertEqual(self.classe(faible), 'CP')
+        self.assertEqual(self.classe(bon), 'CE1')
+        self.assertEqual(self.classe(self.eleves['SIL'][0]), 'CP')
+        self.assertEqual(self.classe(self.eleves['CE2'][0]), 'CE2')
+        self.assertEqual(self.classe(self.eleves['CE2'][1]), 'CM1')
+        # Sortants de CM2 : retirés de l'école, dernière classe conservée
+        sortant = Eleve.objects.get(pk=self.eleves['CM2'][0].pk)
+        self.assertEqual((sortant.classe_id, sortant.deleted_at is not None), (self.classes['CM2'].pk, True))
+        cp, cm2 = self.classes['CP'], self.classes['CM2']
+        cp.refresh_from_db()
+        cm2.refresh_from_db()
+        self.assertEqual((cp.effectif, cm2.effectif), (3, 2))
+        self.ecole.refresh_from_db()
+        self.assertEqual(self.ecole.effectif, len(promotion.NIVEAUX) * 2 - 2)
+
+    def test_dry_run_and_explicit_transfer(self):
+        cp, ce1 = self.classes['CP'], self.classes['CE1']
+        out = StringIO()
+        call_command('promouvoir_eleves', stdout=out, ecole=self.ecole.pk, dry_run=True)
+        self.assertIn("10 promus, 2 sortants", out.getvalue())
+        self.assertIn("-> sortie : 2 sortants", out.getvalue())
+        self.assertEqual(Eleve.objects.filter(classe=cp).count(), 2)
+
+        # Échange CP <-> CE1 : chaque élève n'est déplacé qu'une fois
+        call_command('promouvoir_eleves', '--vers', f'{cp.pk}:{ce1.pk}', f'{ce1.pk}:{cp.pk}',
+                     stdout=StringIO(), ecole=self.ecole.pk)
+        self.assertEqual(self.classe(self.eleves['CP'][0]), 'CE1')
+        self.assertEqual(self.classe(self.eleves['CE1'][0]), 'CP')
+        self.assertEqual(self.classe(self.eleves['SIL'][0]), 'SIL')
+
+    def test_update_view_skips_unchanged_parent(self):
+        admin = User.objects.create_user('p-admin', 'p-admin@example.com', 'pw', role='admin', ecole=self.ecole)
+        self.client.force_login(admin)
+        eleve = self.eleves['CP'][0]
+        data = {'ecole': self.ecole.pk, 'classe': eleve.classe_id, 'nom': "Mbia", 'prenom': "Zoé", 'age': 8,
+                'sexe': 'fille', 'parent_name': self.parent.username, 'parent_email': self.parent.email,
+                'parent_phone': self.parent.telephone}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('schoolcopal:eleve_update', args=[eleve.pk]), data)
+        self.assertRedirects(response, reverse('schoolcopal:eleve_list'), fetch_redirect_response=False)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertFalse([sql for sql in updates if 'schoolcopal_user' in sql.split(' SET ')[0]])
+        self.assertEqual(len([sql for sql in updates if 'schoolcopal_eleve' in sql.split(' SET ')[0]]), 1)
+
+
+class DoublonTests(TestCase):
+    """Doublons : blocage (nom, année de naissance, niveau) puis similarité des prénoms."""
+
+    def setUp(self):
+        self.ecole = Ecole.objects.create(nom="École Doublons", type='publique', adresse="Bafoussam")
+        self.cp = ClasseScolaire.objects.create(ecole=self.ecole, niveau='CP', section='A')
+        self.ce1 = ClasseScolaire.objects.create(ecole=self.ecole, niveau='CE1', section='A')
+        self.parent = User.objects.create_user('d-parent@example.com', 'd-parent@example.com', 'pw', role='parent',
+                                               ecole=self.ecole, telephone='690 00 00 00')
+        self.eleve = self.inscrire("N'Guessan", "Élodie", self.cp)
+
+    def inscrire(self, nom, prenom, classe, age=7):
+        return Eleve.objects.create(ecole=self.ecole, classe=classe, nom=nom, prenom=prenom, age=age, sexe='fille',
+                                    parent_id=self.parent)
+
+    def data(self, **kwargs):
+        return dict({'ecole': self.ecole.pk, 'classe': self.cp.pk, 'nom': "NGUESSAN", 'prenom': "Elodie",
+                     'age': 7, 'sexe': 'fille', 'parent_name': "P", 'parent_email': 'd-parent@example.com',
+                     'parent_phone': '690000000'}, **kwargs)
+
+    def test_form_flags_similar_student_in_same_block(self):
+        form = EleveForm(self.data(), ecole=self.ecole)
+        self.assertFalse(form.is_valid())
+        self.assertIn("Élodie N'Guessan (CP A)", form.non_field_errors()[0])
+        self.assertTrue(EleveForm(self.data(ignorer_doublons=True), ecole=self.ecole).is_valid())
+        self.assertTrue(EleveForm(self.data(classe=self.ce1.pk), ecole=self.ecole).is_valid())
+        self.assertTrue(EleveForm(self.data(prenom="Marc"), ecole=self.ecole).is_valid())
+        self.assertTrue(EleveForm(self.data(age=9), ecole=self.ecole).is_valid())
+        with self.assertNumQueries(1):  # bloc lu via l'index de recherche
+            doublons.candidats(self.ecole, Eleve(nom="Nguessan", prenom="Elodie", age=7, classe=self.cp))
+
+    def test_batch_scan_compares_within_blocks(self):
+        double = self.inscrire("Nguessan", "Elodi", self.cp)
+        self.inscrire("Nguessan", "Elodie", self.ce1)
+        self.inscrire("Mbia", "Elodie", self.cp)
+        autre = User.objects.create_user('d-autre', 'D-Parent@example.com', 'pw', role='parent', ecole=self.ecole)
+
+        paires = doublons.eleves_en_double(self.ecole)
+        self.assertEqual([(d.premier.pk, d.second.pk) for d in paires], [(self.eleve.pk, double.pk)])
+        self.assertEqual([(d.premier.pk, d.second.pk) for d in doublons.parents_en_double(self.ecole)],
+                         [(self.parent.pk, autre.pk)])
+        out = StringIO()
+        call_command('detecter_doublons', stdout=out, ecole=self.ecole.pk)
+        self.assertIn("1 élèves et 1 parents en double", out.getvalue())
+
+    def test_create_view_reuses_sibling_parent(self):
+        admin = User.objects.create_user('d-admin@example.com', 'd-admin@example.com', 'pw', role='admin', ecole=self.ecole)
+        self.client.force_login(admin)
+        response = self.client.post(reverse('schoolcopal:eleve_create'), self.data(prenom="Marc"))
+        self.assertRedirects(response, reverse('schoolcopal:eleve_list'), fetch_redirect_response=False)
+        self.assertEqual(Eleve.objects.filter(parent_id=self.parent).count(), 2)
+        self.assertEqual(User.objects.filter(role='parent').count(), 1)
+
+        response = self.client.post(reverse('schoolcopal:eleve_create'),
+                                    self.data(prenom="Paul", parent_email='d-admin@example.com'))
+        self.assertIn('parent_email', response.context['form'].errors)
+
+
+class TendanceTests(TestCase):
+    """Séries temporelles : instantanés ensemblistes, graphiques lus dans Tendance seulement."""
+
+    def setUp(self):
+        cache.clear()  # année active en cache
+        self.ecole = Ecole.objects.create(nom="École Tendances", type='publique', adresse="Garoua")
+        self.classe = ClasseScolaire.objects.create(ecole=self.ecole, niveau='CP', section='A')
+        self.matiere = Matiere.objects.create(classe=self.classe, nom="Lecture")
+        parent = User.objects.create_user('t-parent', 't-parent@example.com', 'pw', role='parent', ecole=self.ecole)
+        self.directeur = User.objects.create_user('t-dir', 't-dir@example.com', 'pw', role='directeur', ecole=self.ecole)
+        self.eleves = [
+            Eleve.objects.create(ecole=self.ecole, classe=self.classe, nom="Bello", prenom=f"E{i}", age=7,
+                                 sexe='garcon', parent_id=parent)
+            for i in range(3)
+        ]
+        self.today = timezone.localdate()
+        self.lundi = tendances.debut_semaine(self.today)
+        il_y_a_trois_mois = timezone.now() - timedelta(days=95)
+        Eleve.objects.filter(pk__in=[e.pk for e in self.eleves[:2]]).update(created_at=il_y_a_trois_mois)
+        self.eleves[2].delete()
+
+    def paiement(self, jour, montant, statut='paye'):
+        return Paiement.objects.create(eleve=self.eleves[0], montant=montant, date_paiement=jour, statut=statut,
+                                       mode='cash')
+
+    @SHARED_CACHE
+    def test_snapshots_and_chart_endpoint(self):
+        ancien = self.lundi - timedelta(weeks=12)
+        self.paiement(ancien, 5000)
+        self.paiement(self.lundi, 2000)
+        self.paiement(self.lundi, 1500)
+        self.paiement(self.lundi, 9999, statut='impaye')
+        for eleve, present in zip(self.eleves[:2], (True, False)):
+            Frequence.objects.create(eleve=eleve, date=self.lundi, present=present)
+        for eleve, valeur in zip(self.eleves[:2], (12, 15)):
+            Note.objects.create(eleve=eleve, matiere=self.matiere, valeur=valeur, trimestre=1, sequence=1)
+
+        totals = tendances.instantanes(self.ecole, complet=True)
+        self.assertEqual(totals['paiements'], 2)
+        series = tendances.series(self.ecole)
+        self.assertEqual([p['valeur'] for p in series['effectif']][0], 2)
+        self.assertEqual(series['effectif'][-1]['valeur'], 2)  # l'élève supprimé n'est plus compté
+        self.assertEqual([(p['periode'], p['valeur']) for p in series['paiements']],
+                         [(ancien.isoformat(), 5000.0), (self.lundi.isoformat(), 3500.0)])
+        self.assertEqual(series['absences'][0]['valeur'], 50.0)
+        self.assertEqual((series['moyenne'][0]['sequence'], series['moyenne'][0]['valeur']), (1, 13.5))
+
+        # Nuit suivante : seule la fenêtre récente est recalculée, l'historique reste en place
+        Paiement.objects.filter(date_paiement=ancien).update(deleted_at=timezone.now())
+        self.paiement(self.lundi, 500)
+        tendances.instantanes(self.ecole)
+        points = tendances.series(self.ecole, ['paiements'])['paiements']
+        self.assertEqual([p['valeur'] for p in points], [5000.0, 4000.0])
+
+        self.client.force_login(self.directeur)
+        url = reverse('schoolcopal:directeur_tendances')
+        self.client.get(url)
+        with self.assertNumQueries(1):  # points de l'école (session et profil en cache)
+            response = self.client.get(url, {'indicateur': 'paiements', 'depuis': self.lundi.isoformat()})
+        self.assertEqual(response.json()['series'], {'paiements': [
+            {'periode': self.lundi.isoformat(), 'valeur': 4000.0, 'effectif': 3},
+        ]})
+        self.assertEqual(self.client.get(url, {'indicateur': 'inconnu'}).status_code, 400)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_nightly_task_snapshots_every_school(self):
+        self.paiement(self.lundi, 1000)
+        snapshot_tendances()
+        self.assertTrue(Tendance.objects.filter(ecole=self.ecole, indicateur='paiements', periode=self.lundi).exists())
+        self.assertTrue(Tendance.objects.filter(ecole=self.ecole, indicateur='effectif').exists())
+
+
+class AuthCacheTests(TestCase):
+    """Utilisateur de la session en cache : invalidé à chaque modification, sans cache local par processus."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('a-parent', 'a-parent@example.com', 'pw', role='parent')
+        self.client.force_login(self.user)
+
+    def request(self):
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(self.client.session.session_key)
+        return request
+
+    @SHARED_CACHE
+    def test_authentication_costs_no_query_once_cached(self):
+        self.client.force_login(self.user)  # session créée avec le moteur cached_db
+        self.assertEqual(get_user(self.request()), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user(self.request()).pk, self.user.pk)
+
+    @SHARED_CACHE
+    def test_password_change_and_deactivation_evict_cached_user(self):
+        get_user(self.request())
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+
+        self.user.set_password('nouveau')
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        # Hachage du mot de passe changé : la session n'est plus valide
+        self.assertTrue(get_user(self.request()).is_anonymous)
+
+        self.client.force_login(self.user)
+        get_user(self.request())
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertTrue(get_user(self.request()).is_anonymous)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_process_local_cache_is_not_used(self):
+        self.assertEqual(get_user(self.request()), self.user)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+
+@override_settings(QUERY_PROFILING=True, DEBUG=True)
+class QueryProfilingTests(TestCase):
+    """Profilage par vue : en-têtes de débogage, budgets des tableaux de bord, synthèse."""
+    DASHBOARDS = [f'{role}_dashboard{suffix}' for role in ('admin', 'directeur', 'enseignant', 'parent')
+                  for suffix in ('', '_async')]
+
+    def setUp(self):
+        cache.clear()
+        profiling.store.clear()
+        call_command('seed_school', stdout=StringIO(), classes_par_niveau=1, eleves_par_classe=3, matieres=2, jours=1)
+        enseignant = Enseignant.objects.filter(classe__isnull=False).select_related('user').first()
+        self.users = {
+            'admin': User.objects.create_user('q-admin', 'q-admin@example.com', 'pw', role='admin',
+                                              ecole_id=enseignant.ecole_id),
+            'directeur': User.objects.filter(role='directeur').first(),
+            'enseignant': enseignant.user,
+            'parent': User.objects.filter(role='parent', enfants__isnull=False).first(),
+        }
+
+    def tearDown(self):
+        profiling.store.clear()
+
+    def budget(self, name):
+        return getattr(resolve(reverse(f'schoolcopal:{name}')).func, 'query_budget', None)
+
+    def test_headers_match_executed_queries(self):
+        self.client.force_login(self.users['directeur'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('schoolcopal:directeur_dashboard'))
+        self.assertEqual(int(response['X-Query-Count']), len(queries))
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        for header in ('X-Query-Time-Ms', 'X-View-Time-Ms', 'X-Render-Time-Ms'):
+            self.assertIn(header, response)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_dashboards_stay_within_budget_with_cold_caches(self):
+        for name in self.DASHBOARDS:
+            self.assertIsNotNone(self.budget(name), name)
+            cache.clear()
+            self.client.force_login(self.users[name.split('_')[0]])
+            self.assertEqual(self.client.get(reverse(f'schoolcopal:{name}')).status_code, 200, name)
+
+    def test_budget_overrun_is_logged_or_raised(self):
+        self.client.force_login(self.users['directeur'])
+        url = reverse('schoolcopal:directeur_dashboard')
+        with override_settings(QUERY_BUDGETS={'schoolcopal:directeur_dashboard': 1}):
+            with self.assertLogs('schoolcopal.profiling', 'WARNING') as logs:
+                self.client.get(url)
+            self.assertIn("pour un budget de 1", logs.output[0])
+            with override_settings(QUERY_BUDGET_STRICT=True), self.assertLogs('django.request', 'ERROR'):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(url)
+
+    def test_summary_endpoint(self):
+        self.client.force_login(self.users['admin'])
+        for _ in range(2):
+            self.client.get(reverse('schoolcopal:admin_dashboard'))
+        summary = self.client.get(reverse('schoolcopal:profiling_summary')).json()
+        dashboard = summary['schoolcopal:admin_dashboard']
+        self.assertEqual(dashboard['samples'], 2)
+        self.assertLessEqual(dashboard['queries_max'], self.budget('admin_dashboard'))
+        with override_settings(QUERY_PROFILING=False):
+            self.assertEqual(self.client.get(reverse('schoolcopal:profiling_summary')).status_code, 404)
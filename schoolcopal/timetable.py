@@ -0,0 +1,460 @@
+"""
+Génération d'emplois du temps sans conflit.
+
+Chaque cours (classe, matière, enseignant) occupe un créneau de la semaine, autant de fois
+que Matiere.heures_hebdo. Les disponibilités sont des masques de bits (bit i = créneau i) :
+créneaux occupés par chaque classe, par chaque enseignant, et créneaux où toutes les salles
+sont prises. Recherche en profondeur avec retour arrière : on place d'abord un cours de la
+classe la plus contrainte (le moins de créneaux libres par cours restant), de préférence
+un jour où la matière n'a pas encore lieu, sur le créneau le moins chargé.
+
+L'occupation des salles et des classes est servie par un index d'intervalles par école
+(IntervalIndex), gardé en mémoire dans chaque processus et reconstruit quand la version
+de l'école, partagée par le cache, change (signaux sur EmploiDuTemps, save()).
+Le contrôle des conflits à l'enregistrement interroge la base (index (salle_cle, jour, heure)
+et (classe, jour, heure)) : il ne dépend pas d'un index en mémoire peut-être en retard.
+"""
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ClasseScolaire, EmploiDuTemps, Enseignant, Matiere, cle_salle
+
+JOURS = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi')
+JOURS_SEMAINE = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche')
+CRENEAUX = (time(7, 30), time(8, 30), time(9, 30), time(10, 45), time(11, 45), time(13, 30))
+DUREE = timedelta(minutes=60)
+MAX_STEPS = 200_000
+BATCH_SIZE = 2000
+
+
+class TimetableError(Exception):
+    """Aucun emploi du temps trouvé avec ces contraintes."""
+
+
+class Solver:
+    """
+    Place des cours (classe, matière, enseignant ou None) sur slot_count créneaux,
+    day_size créneaux par jour, avec au plus room_count cours simultanés.
+    """
+
+    def __init__(self, lessons, slot_count, day_size, room_count, max_steps=MAX_STEPS):
+        if slot_count > 0 and slot_count % day_size:
+            raise ValueError("slot_count doit être un multiple de day_size")
+        self.slot_count = slot_count
+        self.room_count = room_count
+        self.max_steps = max_steps
+        self.day_masks = [((1 << day_size) - 1) << start for start in range(0, slot_count, day_size)]
+        self.day_of_slot = [slot // day_size for slot in range(slot_count)]
+
+        # Cours à placer, par classe : matières au plus gros quota d'abord
+        self.todo = {}
+        for lesson in sorted(lessons, key=lambda lesson: lesson[0]):
+            self.todo.setdefault(lesson[0], []).append(lesson)
+        quotas = {}
+        for lesson in lessons:
+            quotas[lesson[:2]] = quotas.get(lesson[:2], 0) + 1
+        for todo in self.todo.values():
+            todo.sort(key=lambda lesson: (-quotas[lesson[:2]], lesson[1]))
+            todo.reverse()  # pile : le prochain cours est en fin de liste
+
+        self.all_slots = (1 << slot_count) - 1
+        self.class_busy = dict.fromkeys(self.todo, 0)
+        self.teacher_busy = {lesson[2]: 0 for lesson in lessons if lesson[2] is not None}
+        # Cours restants par (classe, enseignant) : vérification en avant et choix des créneaux
+        self.remaining = {}
+        for lesson in lessons:
+            if lesson[2] is not None:
+                self.remaining[lesson[0], lesson[2]] = self.remaining.get((lesson[0], lesson[2]), 0) + 1
+        self.teachers_by_class, self.classes_by_teacher = {}, {}
+        for classe, teacher in self.remaining:
+            self.teachers_by_class.setdefault(classe, set()).add(teacher)
+            self.classes_by_teacher.setdefault(teacher, set()).add(classe)
+        self.load = [0] * slot_count
+        self.full = 0
+        self.placed = {classe: [] for classe in self.todo}  # pile de (cours, créneau)
+        self.subject_slots = {}  # (classe, matière) -> créneaux déjà attribués
+        self.steps = 0
+
+    def free(self, classe, teacher=None):
+        """Créneaux où la classe (et l'enseignant) sont libres et une salle reste disponible."""
+        busy = self.class_busy[classe] | self.full
+        if teacher is not None:
+            busy |= self.teacher_busy[teacher]
+        return ~busy & self.all_slots
+
+    def slack(self, classe):
+        """Marge de la classe : créneaux libres moins cours restants, au plus juste par enseignant."""
+        slack = self.free(classe).bit_count() - len(self.todo[classe])
+        for teacher in self.teachers_by_class.get(classe, ()):
+            count = self.remaining[classe, teacher]
+            if count:
+                slack = min(slack, self.free(classe, teacher).bit_count() - count)
+        return slack
+
+    def choose(self):
+        """Classe restant à placer la plus contrainte, ou None si tout est placé."""
+        best, best_key = None, None
+        for classe, todo in self.todo.items():
+            if not todo:
+                continue
+            key = (self.slack(classe), -len(todo))
+            if best_key is None or key < best_key:
+                best, best_key = classe, key
+        return best
+
+    def candidates(self, classe):
+        """
+        Créneaux possibles du prochain cours, les moins contraignants d'abord : ceux qui ne
+        prennent pas un créneau libre d'un autre enseignant de la classe, un jour sans cette
+        matière, puis les moins chargés.
+        """
+        lesson = self.todo[classe][-1]
+        mask = self.free(classe, lesson[2])
+        reserved = 0
+        for teacher in self.teachers_by_class.get(classe, ()):
+            if teacher != lesson[2] and self.remaining[classe, teacher]:
+                reserved |= ~self.teacher_busy[teacher]
+        used_days = 0
+        for slot in self.subject_slots.get(lesson[:2], ()):
+            used_days |= self.day_masks[self.day_of_slot[slot]]
+        slots = [slot for slot in range(self.slot_count) if mask >> slot & 1]
+        slots.sort(key=lambda slot: (reserved >> slot & 1, used_days >> slot & 1, self.load[slot], slot))
+        return slots
+
+    def place(self, classe, slot):
+        lesson = self.todo[classe].pop()
+        bit = 1 << slot
+        self.class_busy[classe] |= bit
+        if lesson[2] is not None:
+            self.teacher_busy[lesson[2]] |= bit
+            self.remaining[classe, lesson[2]] -= 1
+        self.load[slot] += 1
+        if self.load[slot] == self.room_count:
+            self.full |= bit
+        self.subject_slots.setdefault(lesson[:2], []).append(slot)
+        self.placed[classe].append((lesson, slot))
+
+    def unplace(self, classe):
+        lesson, slot = self.placed[classe].pop()
+        bit = 1 << slot
+        self.class_busy[classe] &= ~bit
+        if lesson[2] is not None:
+            self.teacher_busy[lesson[2]] &= ~bit
+            self.remaining[classe, lesson[2]] += 1
+        self.load[slot] -= 1
+        self.full &= ~bit
+        self.subject_slots[lesson[:2]].pop()
+        self.todo[classe].append(lesson)
+
+    def feasible(self, classe, slot):
+        """
+        Vérification en avant : chaque classe touchée garde assez de créneaux libres, pour
+        l'ensemble de ses cours et pour chacun de ses enseignants ; chaque enseignant touché
+        garde assez de créneaux communs avec ses classes.
+        """
+        teacher = self.placed[classe][-1][0][2]
+        if self.full >> slot & 1:
+            classes, teachers = self.todo, self.classes_by_teacher
+        else:
+            classes = {classe} | self.classes_by_teacher.get(teacher, set())
+            teachers = () if teacher is None else (teacher,)
+        if any(self.todo[other] and self.slack(other) < 0 for other in classes):
+            return False
+        for other in teachers:
+            count, reachable = 0, 0
+            for client in self.classes_by_teacher[other]:
+                if self.remaining[client, other]:
+                    count += self.remaining[client, other]
+                    reachable |= self.free(client, other)
+            if reachable.bit_count() < count:
+                return False
+        return True
+
+    def advance(self, frame):
+        """Place le cours du cadre sur son prochain créneau viable ; False si aucun."""
+        classe, candidates, index = frame
+        while index < len(candidates):
+            slot = candidates[index]
+            index += 1
+            self.steps += 1
+            if self.steps > self.max_steps:
+                raise TimetableError(f"Recherche interrompue après {self.max_steps} essais.")
+            self.place(classe, slot)
+            if self.feasible(classe, slot):
+                frame[2] = index
+                return True
+            self.unplace(classe)
+        frame[2] = index
+        return False
+
+    def solve(self):
+        """Liste de (cours, créneau) couvrant tous les cours ; TimetableError sinon."""
+        lessons = [lesson for todo in self.todo.values() for lesson in todo]
+        per_teacher = {}
+        for lesson in lessons:
+            per_teacher[lesson[2]] = per_teacher.get(lesson[2], 0) + 1
+        per_teacher.pop(None, None)
+        if (len(lessons) > self.slot_count * self.room_count
+                or any(len(todo) > self.slot_count for todo in self.todo.values())
+                or any(count > self.slot_count for count in per_teacher.values())):
+            raise TimetableError("Trop d'heures de cours pour les créneaux et salles disponibles.")
+
+        frames = []
+        while True:
+            classe = self.choose()
+            if classe is None:
+                break
+            frames.append([classe, self.candidates(classe), 0])
+            while not self.advance(frames[-1]):
+                frames.pop()
+                if not frames:
+                    raise TimetableError("Aucun emploi du temps sans conflit n'existe pour ces contraintes.")
+                self.unplace(frames[-1][0])
+        return [placement for placed in self.placed.values() for placement in placed]
+
+
+def assign_rooms(placements, classes, salles):
+    """
+    Salle de chaque cours : la salle « attitrée » de la classe si elle est libre sur le créneau,
+    sinon la première salle libre. Renvoie {index du cours dans placements: salle}.
+    """
+    home = {classe: salles[index % len(salles)] for index, classe in enumerate(classes)}
+    by_slot = {}
+    for index, (lesson, slot) in enumerate(placements):
+        by_slot.setdefault(slot, []).append(index)
+    rooms = {}
+    for indexes in by_slot.values():
+        free = list(salles)
+        waiting = []
+        for index in indexes:
+            salle = home[placements[index][0][0]]
+            if salle in free:
+                free.remove(salle)
+                rooms[index] = salle
+            else:
+                waiting.append(index)
+        for index in waiting:
+            rooms[index] = free.pop(0)
+    return rooms
+
+
+def fin_de(heure, duree=DUREE):
+    return (datetime.combine(date.min, heure) + duree).time()
+
+
+def generate(ecole, salles=None, jours=JOURS, creneaux=CRENEAUX, duree=DUREE, max_steps=MAX_STEPS):
+    """
+    Emploi du temps hebdomadaire de l'école (EmploiDuTemps non enregistrés).
+    salles : noms des salles disponibles, par défaut une par classe.
+    """
+    classes = list(
+        ClasseScolaire.objects.for_ecole(ecole).filter(deleted_at__isnull=True).order_by('niveau', 'section', 'pk')
+    )
+    enseignants = dict(
+        Enseignant.objects.filter(classe__in=classes, deleted_at__isnull=True).values_list('classe_id', 'pk')
+    )
+    matieres = Matiere.objects.filter(classe__in=classes, deleted_at__isnull=True).values_list(
+        'classe_id', 'pk', 'heures_hebdo'
+    )
+    lessons = [
+        (classe_id, matiere_id, enseignants.get(classe_id))
+        for classe_id, matiere_id, heures in matieres for _ in range(heures)
+    ]
+    salles = list(salles or [f"Salle {classe}".strip() for classe in classes])
+    if not lessons:
+        return []
+
+    placements = Solver(lessons, len(jours) * len(creneaux), len(creneaux), len(salles), max_steps).solve()
+    rooms = assign_rooms(placements, [classe.pk for classe in classes], salles)
+    return [
+        EmploiDuTemps(
+            classe_id=lesson[0], matiere_id=lesson[1], salle=rooms[index],
+            jour=jours[slot // len(creneaux)], heure=creneaux[slot % len(creneaux)],
+            heure_fin=fin_de(creneaux[slot % len(creneaux)], duree),
+        )
+        for index, (lesson, slot) in enumerate(placements)
+    ]
+
+
+@transaction.atomic
+def save(ecole, emplois):
+    """Remplace l'emploi du temps de l'école par emplois (bulk_create)."""
+    # Une seule invalidation pour toute l'école, pas une par cours supprimé
+    _state.bulk = True
+    try:
+        EmploiDuTemps.objects.for_ecole(ecole).delete()
+    finally:
+        _state.bulk = False
+    emplois = EmploiDuTemps.objects.bulk_create(emplois, batch_size=BATCH_SIZE)
+    changed(ecole.pk)
+    return emplois
+
+
+# Index d'intervalles de l'occupation
+
+def minutes(heure):
+    return heure.hour * 60 + heure.minute
+
+
+def hhmm(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class Cours:
+    """Cours de l'index : intervalle [debut, fin[ en minutes et de quoi le décrire."""
+    __slots__ = ('id', 'debut', 'fin', 'classe_id', 'classe', 'salle', 'matiere')
+
+    def __init__(self, id, debut, fin, classe_id, classe, salle, matiere):
+        self.id, self.debut, self.fin = id, debut, fin
+        self.classe_id, self.classe, self.salle, self.matiere = classe_id, classe, salle, matiere
+
+    def __str__(self):
+        return f"{self.classe} ({self.salle}) {hhmm(self.debut)}-{hhmm(self.fin)}"
+
+    def as_dict(self):
+        return {
+            'id': self.id, 'classe': self.classe, 'salle': self.salle, 'matiere': self.matiere,
+            'debut': hhmm(self.debut), 'fin': hhmm(self.fin),
+        }
+
+
+class IntervalIndex:
+    """
+    Cours d'une école triés par début, par (salle, jour) et par (classe, jour).
+    Le maximum cumulé des fins permet de retrouver par bisection, en O(log n), le premier
+    cours encore en cours, même si des données anciennes se chevauchent.
+    """
+
+    def __init__(self, cours_par_jour):
+        self.series = {}
+        for jour, cours in cours_par_jour:
+            for key in (('salle', cle_salle(cours.salle), jour), ('classe', cours.classe_id, jour)):
+                self.series.setdefault(key, []).append(cours)
+        self.debuts, self.fins = {}, {}
+        for key, series in self.series.items():
+            series.sort(key=lambda cours: cours.debut)
+            self.debuts[key] = [cours.debut for cours in series]
+            self.fins[key] = list(accumulate((cours.fin for cours in series), max))
+
+    def _key(self, kind, value, jour):
+        return (kind, cle_salle(value) if kind == 'salle' else value, jour)
+
+    def at(self, kind, value, jour, minute):
+        """Cours de la salle ou de la classe en cours à cette minute, ou None."""
+        found = self.overlapping(kind, value, jour, minute, minute + 1)
+        return found[-1] if found else None
+
+    def overlapping(self, kind, value, jour, debut, fin, exclude=None):
+        """Cours de la salle ou de la classe chevauchant [debut, fin[."""
+        key = self._key(kind, value, jour)
+        start = bisect_right(self.fins.get(key, ()), debut)
+        stop = bisect_left(self.debuts.get(key, ()), fin)
+        return [
+            cours for cours in self.series.get(key, [])[start:stop]
+            if cours.fin > debut and cours.id != exclude
+        ]
+
+
+def version_key(ecole_id):
+    return f"timetable:version:{ecole_id}"
+
+
+_indexes = {}  # ecole_id -> (version, IntervalIndex), propre au processus
+_state = threading.local()  # bulk : save() invalide elle-même, les signaux s'abstiennent
+
+
+def bulk_in_progress():
+    return getattr(_state, 'bulk', False)
+
+
+def invalidate(ecole_id):
+    """Nouvelle version de l'emploi du temps : chaque processus reconstruira son index."""
+    cache.set(version_key(ecole_id), uuid.uuid4().hex, settings.TIMETABLE_INDEX_TIMEOUT)
+
+
+def changed(ecole_id):
+    """
+    Invalide tout de suite (la transaction courante voit ses écritures) et de nouveau au
+    commit, un autre processus ayant pu reconstruire entre-temps un index sans elles.
+    """
+    invalidate(ecole_id)
+    transaction.on_commit(lambda: invalidate(ecole_id))
+
+
+def build_index(ecole_id):
+    emplois = EmploiDuTemps.objects.filter(classe__ecole_id=ecole_id, deleted_at__isnull=True)\
+        .select_related('classe', 'matiere')
+    return IntervalIndex(
+        (emploi.jour, Cours(
+            emploi.pk, minutes(emploi.heure), minutes(emploi.heure_fin), emploi.classe_id,
+            str(emploi.classe).strip(), emploi.salle, emploi.matiere.nom if emploi.matiere_id else '',
+        ))
+        for emploi in emplois
+    )
+
+
+def get_index(ecole_id):
+    """Index de l'école, reconstruit seulement si sa version a changé."""
+    key = version_key(ecole_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(key, version, settings.TIMETABLE_INDEX_TIMEOUT)
+        version = cache.get(key, version)
+    cached = _indexes.get(ecole_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    index = build_index(ecole_id)
+    _indexes[ecole_id] = (version, index)
+    return index
+
+
+def conflicts(emploi):
+    """
+    Cours actifs de la même école chevauchant emploi, dans sa salle ou pour sa classe.
+    Une requête sur les index (salle_cle, jour, heure) et (classe, jour, heure) ; même clé
+    cle_salle que l'index en mémoire.
+    """
+    emplois = (
+        EmploiDuTemps.objects.filter(
+            Q(salle_cle=cle_salle(emploi.salle), classe__ecole_id=emploi.classe.ecole_id)
+            | Q(classe_id=emploi.classe_id),
+            jour=emploi.jour, heure__lt=emploi.heure_fin, heure_fin__gt=emploi.heure, deleted_at__isnull=True,
+        )
+        .exclude(pk=emploi.pk).select_related('classe', 'matiere').order_by('heure', 'pk')
+    )
+    return [
+        Cours(
+            autre.pk, minutes(autre.heure), minutes(autre.heure_fin), autre.classe_id,
+            str(autre.classe).strip(), autre.salle, autre.matiere.nom if autre.matiere_id else '',
+        )
+        for autre in emplois
+    ]
+
+
+def salle_libre(ecole, salle, jour, debut, fin=None):
+    """La salle est-elle libre sur [debut, fin[ (ou à l'instant debut) ?"""
+    index = get_index(ecole.pk)
+    if fin is None:
+        return index.at('salle', salle, jour, minutes(debut)) is None
+    return not index.overlapping('salle', salle, jour, minutes(debut), minutes(fin))
+
+
+def cours_de_classe(ecole, classe_id, jour, heure):
+    """Cours de la classe à cette heure, ou None."""
+    return get_index(ecole.pk).at('classe', classe_id, jour, minutes(heure))
+
+
+def maintenant():
+    """(jour, heure) locaux courants, pour les requêtes « en ce moment »."""
+    now = timezone.localtime()
+    return JOURS_SEMAINE[now.weekday()], now.time()
@@ -13,7 +13,13 @@ from schoolcopal.views.admin import views as admin_views
 from schoolcopal.views.parent import views as parent_views
 from schoolcopal.views.enseignant import views as enseignant_views
 from schoolcopal.views.directeur import views as directeur_views
-from .views.enseignant.views import enseignant_dashboard, NoteCreateView, NoteUpdateView, NoteDeleteView
+
+# Autocomplétion des champs de relation
+from schoolcopal.views.autocomplete import views as autocomplete_views
+
+# Occupation des salles et des classes (emploi du temps)
+from schoolcopal.views.timetable import views as timetable_views
+from .views.enseignant.views import enseignant_dashboard, enseignant_dashboard_async, NoteCreateView, NoteUpdateView, NoteDeleteView
 
 app_name = "schoolcopal"
 
@@ -31,6 +37,8 @@ urlpatterns = [
 
     # ---------------------- Admin ---------------------
     path("school-admin/dashboard/", admin_views.admin_dashboard, name="admin_dashboard"),
+    path("school-admin/dashboard/async/", admin_views.admin_dashboard_async, name="admin_dashboard_async"),
+    path("school-admin/profiling/", admin_views.profiling_summary, name="profiling_summary"),
 
     # Élèves
     path("school-admin/eleves/", admin_views.EleveListView.as_view(), name="eleve_list"),
@@ -70,9 +78,12 @@ urlpatterns = [
 
     # ---------------------- Parent --------------------
     path("parent/dashboard/", parent_views.parent_dashboard, name="parent_dashboard"),
+    path("parent/dashboard/async/", parent_views.parent_dashboard_async, name="parent_dashboard_async"),
+    path("parent/api/enfants/", parent_views.parent_api, name="parent_api"),
 
     # ------------------- Enseignant -------------------
     path('enseignant/dashboard/', enseignant_dashboard, name='enseignant_dashboard'),
+    path('enseignant/dashboard/async/', enseignant_dashboard_async, name='enseignant_dashboard_async'),
     # URLs pour les notes des enseignants
     path('enseignant/notes/create/<int:eleve_id>/', NoteCreateView.as_view(), name='note_create'),
     path('enseignant/notes/update/<int:pk>/', NoteUpdateView.as_view(), name='note_update'),
@@ -80,4 +91,12 @@ urlpatterns = [
 
     # ------------------- Directeur --------------------
     path("directeur/dashboard/", directeur_views.directeur_dashboard, name="directeur_dashboard"),
+    path("directeur/dashboard/async/", directeur_views.directeur_dashboard_async, name="directeur_dashboard_async"),
+    path("directeur/tendances/", directeur_views.tendances, name="directeur_tendances"),
+
+    # ----------------- Autocomplétion -----------------
+    path("autocomplete/<slug:kind>/", autocomplete_views.autocomplete, name="autocomplete"),
+
+    # ------------------ Emploi du temps -----------------
+    path("emploi-du-temps/occupation/", timetable_views.occupation, name="timetable_occupation"),
 ]
@@ -1,4 +1,7 @@
 # utils.py
+import re
+import unicodedata
+
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -9,3 +12,17 @@ def create_user_with_password(username, email, role, raw_password):
     user._raw_password = raw_password
     user.save()
     return user
+
+
+APOSTROPHES = re.compile(r"['’ʼ`]")
+
+
+def normaliser(texte):
+    """
+    Forme de comparaison d'un texte : minuscules, sans accents ni ponctuation,
+    apostrophes retirées, mots séparés par une espace
+    (« Élodie N'Guessan-Ekotto » -> « elodie nguessan ekotto »).
+    """
+    decompose = unicodedata.normalize('NFKD', APOSTROPHES.sub('', texte or ''))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', sans_accents.lower()).split())
@@ -1,77 +1,150 @@
-from django.contrib.auth.decorators import login_required
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
+from django.db.models import Prefetch
 from django.contrib import messages
 from ...models import User, Ecole, ClasseScolaire, Eleve, Enseignant, Matiere, Paiement, Notification
 from ...forms import EleveForm, EnseignantForm, MatiereForm, ClasseScolaireForm, DirecteurForm,AdminForm
 from django.utils import timezone
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from ...mixins import (
+    AdminRequiredMixin, EcoleScopedMixin, EcoleScopedFormMixin, IndexedSearchListMixin, async_role_required, role_required,
+)
+from ... import doublons, loaders, profiling
+from ...pagination import KeysetPaginationMixin
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 
-@login_required
+def _dashboard_context(ecole, classes, enseignants, directeurs, admins, **totals):
+    """Contexte commun aux versions WSGI et ASGI du tableau de bord admin."""
+    context = {
+        'school': ecole,
+        'eleves_by_class': {classe: classe.eleves_actifs for classe in classes},
+        'eleves_count_by_class': {classe: classe.effectif for classe in classes},
+        'enseignants': enseignants,
+        'matieres_by_class': {classe: classe.matieres_actives for classe in classes},
+        'directeurs': directeurs,
+        'admins': admins,  # Ajouté pour afficher dans le tableau
+        'total_admins': len(admins),  # Pour les statistiques
+        'total_classes': len(classes),
+        'total_teachers': len(enseignants),
+        'classes': classes,  # Ajouté pour la liste des classes
+        'title': _('Admin Dashboard'),
+    }
+    context.update(totals)
+    return context
+
+@profiling.query_budget(16)
+@role_required('admin')
 def admin_dashboard(request):
     """
     Admin dashboard: Overview of school stats, users, classes, payments, notifications.
     Only accessible if user.role == 'admin'.
     """
-    if request.user.role != 'admin':
-        return redirect('schoolcopal:login')
-
-    default_school = Ecole.get_default_ecole()
+    default_school = request.profile.ecole
 
-    # Liste des élèves classés par classe (salle)
-    classes = ClasseScolaire.objects.filter(ecole=default_school, deleted_at__isnull=True)
-    eleves_by_class = {classe: Eleve.objects.filter(classe=classe, deleted_at__isnull=True) for classe in classes}
-    eleves_count_by_class = {classe: eleves_by_class[classe].count() for classe in classes}
+    # Liste des élèves classés par classe (salle), matières préchargées : 3 requêtes au total
+    classes = list(
+        ClasseScolaire.objects.filter(ecole=default_school, deleted_at__isnull=True).prefetch_related(
+            Prefetch('eleves', queryset=Eleve.objects.filter(deleted_at__isnull=True), to_attr='eleves_actifs'),
+            Prefetch('matieres', queryset=Matiere.objects.filter(deleted_at__isnull=True), to_attr='matieres_actives'),
+        )
+    )
 
     # Liste des enseignants avec classe et salaire
-    enseignants = Enseignant.objects.filter(deleted_at__isnull=True).select_related('classe', 'user')
-
-    # Liste des matières par classe
-    matieres_by_class = {classe: classe.get_matieres() for classe in classes}
+    enseignants = list(
+        Enseignant.objects.for_ecole(default_school).filter(deleted_at__isnull=True).select_related('classe', 'user')
+    )
 
     # Liste des directeurs
-    directeurs = User.objects.filter(role='directeur', deleted_at__isnull=True)
+    directeurs = list(User.objects.for_ecole(default_school).filter(role='directeur', deleted_at__isnull=True))
 
     # Liste des admins
-    admins = User.objects.filter(role='admin', deleted_at__isnull=True)
-
-    context = {
-        'school': default_school,
-        'eleves_by_class': eleves_by_class,
-        'eleves_count_by_class': eleves_count_by_class,
-        'enseignants': enseignants,
-        'matieres_by_class': matieres_by_class,
-        'directeurs': directeurs,
-        'admins': admins,  # Ajouté pour afficher dans le tableau
-        'total_admins': admins.count(),  # Pour les statistiques
-        'total_students': default_school.eleves.filter(deleted_at__isnull=True).count(),
-        'total_classes': classes.count(),
-        'total_teachers': enseignants.count(),
-        'total_users': User.objects.filter(deleted_at__isnull=True).count(),
-        'classes': classes,  # Ajouté pour la liste des classes
-        'pending_payments': Paiement.objects.filter(statut='impaye', deleted_at__isnull=True).count(),
-        'recent_notifications': Notification.objects.filter(deleted_at__isnull=True).order_by('-created_at')[:5],
-        'title': _('Admin Dashboard'),
-    }
+    admins = list(User.objects.for_ecole(default_school).filter(role='admin', deleted_at__isnull=True))
+
+    context = _dashboard_context(
+        default_school, classes, enseignants, directeurs, admins,
+        # Compteur à jour (l'école de la requête vient du cache)
+        total_students=Ecole.objects.filter(pk=default_school.pk).values_list('effectif', flat=True).first(),
+        total_users=User.objects.for_ecole(default_school).filter(deleted_at__isnull=True).count(),
+        pending_payments=Paiement.objects.for_ecole(default_school).annee_active().filter(statut='impaye', deleted_at__isnull=True).count(),
+        recent_notifications=Notification.objects.for_ecole(default_school).filter(deleted_at__isnull=True).select_related('destinataire').order_by('-created_at')[:5],
+    )
     return render(request, 'admin/dashboard.html', context)
 
+@profiling.query_budget(16)
+@async_role_required('admin')
+async def admin_dashboard_async(request):
+    """
+    admin_dashboard pour ASGI : les panneaux indépendants (listes et compteurs)
+    sont chargés simultanément avec asyncio.gather.
+    """
+    default_school = request.ecole
+    users = User.objects.for_ecole(default_school).filter(deleted_at__isnull=True)
+
+    (classes, eleves, matieres, enseignants, directeurs, admins, notifications,
+     total_students, total_users, pending_payments) = await asyncio.gather(
+        loaders.alist(ClasseScolaire.objects.filter(ecole=default_school, deleted_at__isnull=True)),
+        # prefetch_related n'est pas disponible en itération asynchrone : regroupement en Python
+        loaders.alist(Eleve.objects.filter(classe__ecole=default_school, classe__deleted_at__isnull=True, deleted_at__isnull=True)),
+        loaders.alist(Matiere.objects.filter(classe__ecole=default_school, classe__deleted_at__isnull=True, deleted_at__isnull=True)),
+        loaders.alist(Enseignant.objects.for_ecole(default_school).filter(deleted_at__isnull=True).select_related('classe', 'user')),
+        loaders.alist(users.filter(role='directeur')),
+        loaders.alist(users.filter(role='admin')),
+        loaders.alist(Notification.objects.for_ecole(default_school).filter(deleted_at__isnull=True).select_related('destinataire').order_by('-created_at')[:5]),
+        Ecole.objects.filter(pk=default_school.pk).values_list('effectif', flat=True).afirst(),
+        users.acount(),
+        Paiement.objects.for_ecole(default_school).annee_active().filter(statut='impaye', deleted_at__isnull=True).acount(),
+    )
+    eleves_par_classe = defaultdict(list)
+    for eleve in eleves:
+        eleves_par_classe[eleve.classe_id].append(eleve)
+    matieres_par_classe = defaultdict(list)
+    for matiere in matieres:
+        matieres_par_classe[matiere.classe_id].append(matiere)
+    for classe in classes:
+        classe.eleves_actifs = eleves_par_classe[classe.id]
+        classe.matieres_actives = matieres_par_classe[classe.id]
+
+    context = _dashboard_context(
+        default_school, classes, enseignants, directeurs, admins,
+        total_students=total_students,
+        total_users=total_users,
+        pending_payments=pending_payments,
+        recent_notifications=notifications,
+    )
+    return await sync_to_async(render)(request, 'admin/dashboard.html', context)
+
+@role_required('admin')
+def profiling_summary(request):
+    """
+    Rolling per-view query and latency summary collected by QueryProfilingMiddleware.
+    Only available when settings.QUERY_PROFILING is enabled.
+    """
+    if not settings.QUERY_PROFILING:
+        raise Http404
+    return JsonResponse(profiling.store.summary())
+
 # CRUD for Eleve
-class EleveListView(ListView):
+class EleveListView(AdminRequiredMixin, EcoleScopedMixin, IndexedSearchListMixin, KeysetPaginationMixin, ListView):
     model = Eleve
+    search_kind = 'eleve'
     template_name = 'admin/eleve_list.html'
     context_object_name = 'eleves'
     paginate_by = 20
+    keyset_ordering = ('nom', 'prenom')
 
     def get_queryset(self):
-        return Eleve.objects.filter(deleted_at__isnull=True)
+        return super().get_queryset().filter(deleted_at__isnull=True).select_related('classe')
 
-class EleveCreateView(CreateView):
+class EleveCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = Eleve
     form_class = EleveForm
     template_name = 'admin/eleve_form.html'
@@ -79,25 +152,29 @@ class EleveCreateView(CreateView):
 
     def form_valid(self, form):
         """
-        Crée un utilisateur Parent puis enregistre l'élève en le liant au parent.
+        Crée (ou retrouve) l'utilisateur Parent puis enregistre l'élève en le liant au parent.
         """
         # Infos du parent
         parent_name = form.cleaned_data.get("parent_name")
         parent_email = form.cleaned_data.get("parent_email")
         parent_phone = form.cleaned_data.get("parent_phone")
 
-        # Génération d’un mot de passe aléatoire
-        raw_password = User.objects.make_random_password()
-
-        parent_user = User(
-            username=parent_email,
-            email=parent_email,
-            telephone=parent_phone,
-            role="parent",
-            password=make_password(raw_password),
-        )
-        parent_user._raw_password = raw_password  # Pour le signal d’envoi d’email
-        parent_user.save()
+        # Frères et sœurs : le parent déjà inscrit (même e-mail) est réutilisé
+        parent_user = doublons.parent_existant(self.request.ecole, parent_email)
+        if parent_user is None:
+            # Génération d’un mot de passe aléatoire
+            raw_password = User.objects.make_random_password()
+
+            parent_user = User(
+                username=parent_email,
+                email=parent_email,
+                telephone=parent_phone,
+                role="parent",
+                ecole=self.request.ecole,
+                password=make_password(raw_password),
+            )
+            parent_user._raw_password = raw_password  # Pour le signal d’envoi d’email
+            parent_user.save()
 
         # Création de l’élève lié au parent
         eleve = form.save(commit=False)
@@ -107,7 +184,7 @@ class EleveCreateView(CreateView):
         messages.success(self.request, _("Student and parent created successfully."))
         return redirect(self.success_url)
 
-class EleveUpdateView(UpdateView):
+class EleveUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     model = Eleve
     form_class = EleveForm
     template_name = 'admin/eleve_form.html'
@@ -118,8 +195,7 @@ class EleveUpdateView(UpdateView):
         Pré-remplit les champs du parent dans le formulaire.
         """
         initial = super().get_initial()
-        eleve = self.get_object()
-        parent = getattr(eleve, "parent_id", None)
+        parent = getattr(self.object, "parent_id", None)
         if parent:
             initial.update({
                 "parent_name": parent.username,  # ou un autre champ pour le nom
@@ -136,17 +212,24 @@ class EleveUpdateView(UpdateView):
 
         parent = eleve.parent_id
         if parent:
-            parent.username = form.cleaned_data.get("parent_name")
-            parent.email = form.cleaned_data.get("parent_email")
-            parent.telephone = form.cleaned_data.get("parent_phone")
-            parent.save()
+            # Le parent n'est réécrit que si l'un de ses champs a changé
+            champs = {
+                "username": form.cleaned_data.get("parent_name"),
+                "email": form.cleaned_data.get("parent_email"),
+                "telephone": form.cleaned_data.get("parent_phone"),
+            }
+            modifies = [champ for champ, valeur in champs.items() if getattr(parent, champ) != valeur]
+            if modifies:
+                for champ in modifies:
+                    setattr(parent, champ, champs[champ])
+                parent.save(update_fields=modifies)
 
         eleve.save()
 
         messages.success(self.request, _("Student and parent updated successfully."))
-        return super().form_valid(form)
+        return redirect(self.success_url)
 
-class EleveDeleteView(DeleteView):
+class EleveDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = Eleve
     template_name = "admin/eleve_confirm_delete.html"
     success_url = reverse_lazy('schoolcopal:eleve_list')
@@ -158,16 +241,19 @@ class EleveDeleteView(DeleteView):
         return redirect(self.success_url)
 
 # CRUD for Enseignant
-class EnseignantListView(ListView):
+class EnseignantListView(AdminRequiredMixin, EcoleScopedMixin, IndexedSearchListMixin, KeysetPaginationMixin, ListView):
     model = Enseignant
+    search_kind = 'enseignant'
+    search_lookup = 'user_id'
     template_name = 'admin/enseignant_list.html'
     context_object_name = 'enseignants'
     paginate_by = 20
+    keyset_ordering = ('user__username',)
 
     def get_queryset(self):
-        return Enseignant.objects.filter(deleted_at__isnull=True)
+        return super().get_queryset().filter(deleted_at__isnull=True).select_related('user', 'classe')
 
-class EnseignantCreateView(CreateView):
+class EnseignantCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = Enseignant
     form_class = EnseignantForm
     template_name = 'admin/enseignant_form.html'
@@ -179,7 +265,8 @@ class EnseignantCreateView(CreateView):
             username=form.cleaned_data["username"],
             email=form.cleaned_data["email"],
             telephone=form.cleaned_data["telephone"],
-            role="enseignant"
+            role="enseignant",
+            ecole=self.request.ecole,
         )
         raw_password = form.cleaned_data["password1"]
         user.set_password(raw_password)
@@ -194,7 +281,7 @@ class EnseignantCreateView(CreateView):
         messages.success(self.request, _("Enseignant créé avec succès."))
         return redirect(self.success_url)
 
-class EnseignantUpdateView(UpdateView):
+class EnseignantUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     """
     Update view for teacher (Enseignant) with User data prefilled.
     """
@@ -238,7 +325,7 @@ class EnseignantUpdateView(UpdateView):
         messages.success(self.request, _("Teacher updated successfully."))
         return redirect(self.success_url)
 
-class EnseignantDeleteView(DeleteView):
+class EnseignantDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = Enseignant
     template_name = "admin/enseignant_confirm_delete.html"
     success_url = reverse_lazy('schoolcopal:enseignant_list')
@@ -250,16 +337,17 @@ class EnseignantDeleteView(DeleteView):
         return redirect(self.success_url)
 
 # CRUD for Matiere
-class MatiereListView(ListView):
+class MatiereListView(AdminRequiredMixin, EcoleScopedMixin, KeysetPaginationMixin, ListView):
     model = Matiere
     template_name = 'admin/matiere_list.html'
     context_object_name = 'matieres'
     paginate_by = 20
+    keyset_ordering = ('nom',)
 
     def get_queryset(self):
-        return Matiere.objects.filter(deleted_at__isnull=True)
+        return super().get_queryset().filter(deleted_at__isnull=True).select_related('classe')
 
-class MatiereCreateView(CreateView):
+class MatiereCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = Matiere
     form_class = MatiereForm
     template_name = 'admin/matiere_form.html'
@@ -269,7 +357,7 @@ class MatiereCreateView(CreateView):
         messages.success(self.request, _('Subject created successfully.'))
         return super().form_valid(form)
 
-class MatiereUpdateView(UpdateView):
+class MatiereUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     model = Matiere
     form_class = MatiereForm
     template_name = 'admin/matiere_form.html'
@@ -279,7 +367,7 @@ class MatiereUpdateView(UpdateView):
         messages.success(self.request, _('Subject updated successfully.'))
         return super().form_valid(form)
 
-class MatiereDeleteView(DeleteView):
+class MatiereDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = Matiere
     template_name = "admin/matiere_confirm_delete.html"
     success_url = reverse_lazy('schoolcopal:matiere_list')
@@ -291,16 +379,17 @@ class MatiereDeleteView(DeleteView):
         return redirect(self.success_url)
 
 # CRUD for ClasseScolaire
-class ClasseScolaireListView(ListView):
+class ClasseScolaireListView(AdminRequiredMixin, EcoleScopedMixin, KeysetPaginationMixin, ListView):
     model = ClasseScolaire
     template_name = 'admin/classescolaire_list.html'
     context_object_name = 'classes'
     paginate_by = 20
+    keyset_ordering = ('niveau', 'section')
 
     def get_queryset(self):
-        return ClasseScolaire.objects.filter(deleted_at__isnull=True)
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
-class ClasseScolaireCreateView(CreateView):
+class ClasseScolaireCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = ClasseScolaire
     form_class = ClasseScolaireForm
     template_name = 'admin/classescolaire_form.html'
@@ -310,7 +399,7 @@ class ClasseScolaireCreateView(CreateView):
         messages.success(self.request, _('Class created successfully.'))
         return super().form_valid(form)
 
-class ClasseScolaireUpdateView(UpdateView):
+class ClasseScolaireUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     model = ClasseScolaire
     form_class = ClasseScolaireForm
     template_name = 'admin/classescolaire_form.html'
@@ -320,7 +409,7 @@ class ClasseScolaireUpdateView(UpdateView):
         messages.success(self.request, _('Class updated successfully.'))
         return super().form_valid(form)
 
-class ClasseScolaireDeleteView(DeleteView):
+class ClasseScolaireDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = ClasseScolaire
     template_name = "admin/classescolaire_confirm_delete.html"
     success_url = reverse_lazy('schoolcopal:classescolaire_list')
@@ -332,16 +421,17 @@ class ClasseScolaireDeleteView(DeleteView):
         return redirect(self.success_url)
 
 # CRUD for Directeur (User with role='directeur')
-class DirecteurListView(ListView):
+class DirecteurListView(AdminRequiredMixin, EcoleScopedMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = 'admin/directeur_list.html'
     context_object_name = 'directeurs'
     paginate_by = 20
+    keyset_ordering = ('username',)
 
     def get_queryset(self):
-        return User.objects.filter(role='directeur', deleted_at__isnull=True)
+        return super().get_queryset().filter(role='directeur', deleted_at__isnull=True)
 
-class DirecteurCreateView(CreateView):
+class DirecteurCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = User
     form_class = DirecteurForm
     template_name = 'admin/directeur_form.html'
@@ -360,7 +450,7 @@ class DirecteurCreateView(CreateView):
         messages.success(self.request, _('Director created successfully.'))
         return redirect(self.success_url)
 
-class DirecteurUpdateView(UpdateView):
+class DirecteurUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     model = User
     form_class = DirecteurForm
     template_name = 'admin/directeur_form.html'
@@ -370,7 +460,7 @@ class DirecteurUpdateView(UpdateView):
         messages.success(self.request, _('Director updated successfully.'))
         return super().form_valid(form)
 
-class DirecteurDeleteView(DeleteView):
+class DirecteurDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = User
     template_name = "admin/directeur_confirm_delete.html"
     success_url = reverse_lazy('schoolcopal:directeur_list')
@@ -403,25 +493,20 @@ class DirecteurDeleteView(DeleteView):
 
 User = get_user_model()
 
-# Mixin pour restreindre l'accès aux admins
-class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
-    def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.role == 'admin'
-
-
 # Liste des admins
-class AdminListView(AdminRequiredMixin, ListView):
+class AdminListView(AdminRequiredMixin, EcoleScopedMixin, KeysetPaginationMixin, ListView):
     model = User
     template_name = 'admin/admin_list.html'
     context_object_name = 'admins'
     paginate_by = 20
+    keyset_ordering = ('username',)
 
     def get_queryset(self):
-        return User.objects.filter(role='admin', deleted_at__isnull=True)
+        return super().get_queryset().filter(role='admin', deleted_at__isnull=True)
 
 
 # Créer un admin
-class AdminCreateView(AdminRequiredMixin, CreateView):
+class AdminCreateView(AdminRequiredMixin, EcoleScopedFormMixin, CreateView):
     model = User
     form_class = AdminForm
     template_name = 'admin/admin_form.html'
@@ -451,14 +536,14 @@ class AdminCreateView(AdminRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class AdminUpdateView(AdminRequiredMixin, UpdateView):
+class AdminUpdateView(AdminRequiredMixin, EcoleScopedFormMixin, UpdateView):
     model = User
     form_class = AdminForm
     template_name = 'admin/admin_form.html'
     success_url = reverse_lazy('schoolcopal:admin_list')
 
     def get_queryset(self):
-        return User.objects.filter(role='admin', deleted_at__isnull=True)
+        return super().get_queryset().filter(role='admin', deleted_at__isnull=True)
 
     def form_valid(self, form):
         user = self.get_object()
@@ -498,13 +583,13 @@ class AdminUpdateView(AdminRequiredMixin, UpdateView):
         return super().form_invalid(form)
 
 # Supprimer un admin (soft delete)
-class AdminDeleteView(AdminRequiredMixin, DeleteView):
+class AdminDeleteView(AdminRequiredMixin, EcoleScopedMixin, DeleteView):
     model = User
     template_name = 'admin/admin_confirm_delete.html'
     success_url = reverse_lazy('schoolcopal:admin_list')
 
     def get_queryset(self):
-        return User.objects.filter(role='admin', deleted_at__isnull=True)
+        return super().get_queryset().filter(role='admin', deleted_at__isnull=True)
 
     def delete(self, request, *args, **kwargs):
         self.object = self.get_object()
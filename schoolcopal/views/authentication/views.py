@@ -4,12 +4,14 @@ from django.urls import reverse_lazy
 from django.shortcuts import render, redirect
 from django.views import View
 from schoolcopal.forms import CustomAuthenticationForm, CustomPasswordResetForm, CustomSetPasswordForm, VerificationCodeForm
+from schoolcopal.mixins import RateLimitMixin
 from schoolcopal.models import PasswordResetCode, User
-from django.utils import timezone
 from datetime import timedelta
 
-class CustomLoginView(LoginView):
+class CustomLoginView(RateLimitMixin, LoginView):
     """Custom login view with role-based redirection."""
+    ratelimit_scope = 'login'
+    ratelimit_field = 'username'
     form_class = CustomAuthenticationForm
     template_name = 'authentication/login.html'
     success_url = reverse_lazy('schoolcopal:admin_dashboard')
@@ -34,8 +36,10 @@ class CustomLogoutView(LogoutView):
     """Custom logout view redirecting to login page."""
     next_page = reverse_lazy('schoolcopal:login')
 
-class CustomPasswordResetView(PasswordResetView):
+class CustomPasswordResetView(RateLimitMixin, PasswordResetView):
     """Custom password reset view with verification code generation."""
+    ratelimit_scope = 'password_reset'
+    ratelimit_field = 'email'
     form_class = CustomPasswordResetForm
     template_name = 'authentication/password_reset_form.html'
     email_template_name = 'authentication/password_reset_email.html'
@@ -45,13 +49,9 @@ class CustomPasswordResetView(PasswordResetView):
     def form_valid(self, form):
         """Generate and save verification code before sending email."""
         email = form.cleaned_data['email']
-        users = User.objects.filter(email=email, deleted_at__isnull=True)
-        if users.exists():
-            user = users.first()
-            reset_code = PasswordResetCode.objects.create(
-                user=user,
-                expires_at=timezone.now() + timedelta(hours=1)
-            )
+        user = User.objects.filter(email=email, deleted_at__isnull=True).first()
+        if user is not None:
+            reset_code = PasswordResetCode.issue(user, timedelta(hours=1))
             self.extra_email_context = {'verification_code': reset_code.code}
             self.request.session['reset_email'] = email
             self.request.session['uidb64'] = self.get_uid(user)
@@ -68,27 +68,34 @@ class CustomPasswordResetView(PasswordResetView):
         from django.contrib.auth.tokens import default_token_generator
         return default_token_generator.make_token(user)
 
-class CustomPasswordResetDoneView(View):
+class CustomPasswordResetDoneView(RateLimitMixin, View):
     """View to enter verification code."""
     template_name = 'authentication/password_reset_done.html'
+    ratelimit_scope = 'password_reset_code'
+
+    def get_ratelimit_idents(self, request):
+        # Les codes sont essayés pour l'adresse mémorisée en session
+        idents = super().get_ratelimit_idents(request)
+        email = request.session.get('reset_email')
+        return idents + [f"email:{email}"] if email else idents
 
     def get(self, request):
         form = VerificationCodeForm()
         return render(request, self.template_name, {'form': form})
 
     def post(self, request):
-        form = VerificationCodeForm(request.POST, user=None)
+        email = request.session.get('reset_email')
+        user = User.objects.filter(email=email, deleted_at__isnull=True).first() if email else None
+        if user is None:
+            return render(request, self.template_name, {
+                'form': VerificationCodeForm(request.POST),
+                'error': _("Invalid session. Please request a new password reset.")
+            })
+        form = VerificationCodeForm(request.POST, user=user)
         if form.is_valid():
-            email = request.session.get('reset_email')
-            if not email or not User.objects.filter(email=email, deleted_at__isnull=True).exists():
-                return render(request, self.template_name, {
-                    'form': form,
-                    'error': _("Invalid session. Please request a new password reset.")
-                })
-            user = User.objects.get(email=email, deleted_at__isnull=True)
-            form = VerificationCodeForm(request.POST, user=user)
-            if form.is_valid():
-                return redirect('schoolcopal:password_reset_confirm', uidb64=request.session.get('uidb64'), token=request.session.get('token'))
+            # Code à usage unique
+            PasswordResetCode.objects.filter(user=user).delete()
+            return redirect('schoolcopal:password_reset_confirm', uidb64=request.session.get('uidb64'), token=request.session.get('token'))
         return render(request, self.template_name, {'form': form})
 
 class CustomPasswordResetConfirmView(PasswordResetConfirmView):
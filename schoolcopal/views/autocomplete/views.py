@@ -0,0 +1,106 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+
+from ... import search
+from ...mixins import role_required
+from ...models import User, Ecole, ClasseScolaire, Eleve, Matiere
+from ...pagination import KeysetPaginator
+
+PAGE_SIZE = 20
+
+
+class Source:
+    """Relation proposée en autocomplétion : queryset de base, tri, libellé et recherche."""
+
+    def __init__(self, queryset, ordering, label, search_kind=None, prefix_fields=()):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.label = label
+        self.search_kind = search_kind
+        self.prefix_fields = prefix_fields
+
+    def filter(self, queryset, query, ecole):
+        if not query:
+            return queryset
+        if self.search_kind:
+            return queryset.filter(pk__in=search.object_ids(query, self.search_kind, ecole))
+        condition = None
+        for field in self.prefix_fields:
+            lookup = queryset.filter(**{f"{field}__istartswith": query})
+            condition = lookup if condition is None else condition | lookup
+        return condition
+
+
+SOURCES = {
+    'eleve': Source(
+        lambda: Eleve.objects.filter(deleted_at__isnull=True),
+        ('nom', 'prenom'), lambda eleve: f"{eleve.prenom} {eleve.nom}", search_kind='eleve',
+    ),
+    'parent': Source(
+        lambda: User.objects.filter(role='parent', deleted_at__isnull=True),
+        ('username',), search.libelle_user, search_kind='parent',
+    ),
+    'matiere': Source(
+        lambda: Matiere.objects.filter(deleted_at__isnull=True).select_related('classe'),
+        ('nom',), str, prefix_fields=('nom',),
+    ),
+    'classe': Source(
+        lambda: ClasseScolaire.objects.filter(deleted_at__isnull=True),
+        ('niveau', 'section'), str, prefix_fields=('niveau', 'section'),
+    ),
+    'ecole': Source(
+        lambda: Ecole.objects.filter(deleted_at__isnull=True),
+        ('nom',), str, prefix_fields=('nom',),
+    ),
+}
+
+# Un enseignant ne voit que les élèves et matières de sa classe
+ENSEIGNANT_KINDS = ('eleve', 'matiere')
+
+
+def _scoped_queryset(request, kind):
+    """(queryset limité au périmètre de l'utilisateur, clé de ce périmètre pour le cache)."""
+    queryset = SOURCES[kind].queryset()
+    ecole = request.ecole
+    if request.user.role == 'enseignant':
+        classe = request.profile.classe
+        if kind not in ENSEIGNANT_KINDS or classe is None:
+            raise Http404
+        return queryset.filter(classe=classe), f"classe:{classe.pk}"
+    if kind == 'ecole':
+        return queryset.filter(pk=ecole.pk), f"ecole:{ecole.pk}"
+    return queryset.for_ecole(ecole), f"ecole:{ecole.pk}"
+
+
+@require_GET
+@role_required('admin', 'enseignant')
+@cache_control(private=True, max_age=settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+def autocomplete(request, kind):
+    """
+    Choix paginés (par curseur) d'une relation, filtrés par ?q=, au format
+    {"results": [{"id", "text"}], "next": curseur ou null}. Réponses mises en cache.
+    """
+    if kind not in SOURCES:
+        raise Http404
+    source = SOURCES[kind]
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor') or None
+    queryset, scope = _scoped_queryset(request, kind)
+
+    digest = hashlib.md5(f"{query}:{cursor}".encode()).hexdigest()
+    key = f"autocomplete:{kind}:{scope}:{digest}"
+    data = cache.get(key)
+    if data is None:
+        queryset = source.filter(queryset, query, request.ecole)
+        page = KeysetPaginator(queryset, PAGE_SIZE, source.ordering, count_mode=None).page(cursor)
+        data = {
+            'results': [{'id': obj.pk, 'text': source.label(obj)} for obj in page],
+            'next': page.next_cursor if page.has_next() else None,
+        }
+        cache.set(key, data, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return JsonResponse(data)
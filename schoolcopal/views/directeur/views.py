@@ -1,27 +1,90 @@
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
+import asyncio
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import TemplateView
-from schoolcopal.models import User, Ecole, ClasseScolaire, Eleve, Enseignant, Paiement, Notification
+from schoolcopal.models import User, Ecole, ClasseScolaire, Eleve, Enseignant, Paiement, Notification, Tendance
+from schoolcopal.mixins import async_role_required, role_required
+from schoolcopal.profiling import query_budget
+from schoolcopal import tendances as series_tendances
+
+def _rapport(ecole, effectif):
+    """Même contenu que Ecole.generate_rapport(), d'après le compteur fraîchement lu."""
+    return {'nom': ecole.nom, 'total_eleves': effectif}
 
-@login_required
+
+@query_budget(10)
+@role_required('directeur')
 def directeur_dashboard(request):
     """
     Director dashboard: Global school stats, reports, users management.
     Only accessible if user.role == 'directeur'.
     """
-    if request.user.role != 'directeur':
-        return redirect('login')
-
-    default_school = Ecole.get_default_ecole()  # Singleton school
+    default_school = request.profile.ecole
+    # Compteur et rapport à jour (l'école de la requête vient du cache)
+    effectif, rapport = Ecole.objects.filter(pk=default_school.pk).values_list('effectif', 'rapport').first()
 
     context = {
         'school': default_school,
-        'total_students': default_school.eleves.filter(deleted_at__isnull=True).count(),
+        'total_students': effectif,
         'total_classes': default_school.classes.count(),
-        'total_teachers': Enseignant.objects.filter(deleted_at__isnull=True).count(),
-        'total_parents': User.objects.filter(role='parent', deleted_at__isnull=True).count(),
-        'recent_report': default_school.generate_rapport(),  # From Ecole.generate_rapport()
+        'total_teachers': Enseignant.objects.for_ecole(default_school).filter(deleted_at__isnull=True).count(),
+        'total_parents': User.objects.for_ecole(default_school).filter(role='parent', deleted_at__isnull=True).count(),
+        # Rapport de la nuit (tasks.generate_school_report), à défaut celui du compteur
+        'recent_report': rapport or _rapport(default_school, effectif),
         'title': _('Director Dashboard'),
     }
-    return render(request, 'directeur/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'directeur/dashboard.html', context)
+
+@query_budget(10)
+@async_role_required('directeur')
+async def directeur_dashboard_async(request):
+    """directeur_dashboard pour ASGI : les compteurs et le rapport de la nuit sont lus simultanément."""
+    default_school = request.ecole
+
+    (effectif, rapport), total_classes, teachers, users = await asyncio.gather(
+        Ecole.objects.filter(pk=default_school.pk).values_list('effectif', 'rapport').afirst(),
+        default_school.classes.acount(),
+        Enseignant.objects.for_ecole(default_school).aaggregate(
+            total=Count('id', filter=Q(deleted_at__isnull=True)),
+        ),
+        User.objects.for_ecole(default_school).aaggregate(
+            parents=Count('id', filter=Q(role='parent', deleted_at__isnull=True)),
+        ),
+    )
+
+    context = {
+        'school': default_school,
+        'total_students': effectif,
+        'total_classes': total_classes,
+        'total_teachers': teachers['total'],
+        'total_parents': users['parents'],
+        'recent_report': rapport or _rapport(default_school, effectif),
+        'title': _('Director Dashboard'),
+    }
+    return await sync_to_async(render)(request, 'directeur/dashboard.html', context)
+
+
+@require_GET
+@role_required('directeur')
+def tendances(request):
+    """
+    Données des graphiques de tendance de l'école : ?indicateur= (répétable, tous par défaut),
+    ?depuis=AAAA-MM-JJ. Lit uniquement les points calculés la nuit (tendances.instantanes).
+    """
+    indicateurs = request.GET.getlist('indicateur')
+    if set(indicateurs) - {code for code, _label in Tendance.INDICATEURS}:
+        return HttpResponseBadRequest("Indicateur inconnu.")
+    try:
+        depuis = date.fromisoformat(request.GET['depuis']) if request.GET.get('depuis') else None
+    except ValueError:
+        return HttpResponseBadRequest("Date invalide.")
+    return JsonResponse({
+        'ecole': request.ecole.pk,
+        'series': series_tendances.series(request.ecole, indicateurs, depuis),
+    })
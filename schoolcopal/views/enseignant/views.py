@@ -1,82 +1,103 @@
-from django.contrib.auth.decorators import login_required
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db import models
-from ...models import Enseignant, Eleve, Matiere, Note
+from ...models import Note
+from ... import loaders
+from ...profiling import query_budget
 from ...forms import NoteForm
+from ...mixins import EnseignantRequiredMixin, async_role_required, role_required
 
-@login_required
+@query_budget(10)
+@role_required('enseignant')
 def enseignant_dashboard(request):
     """
     Teacher dashboard: View all student info, subjects, notes by subject/trimestre/sequence, and averages by sequence/trimestre.
     Only accessible if user.role == 'enseignant'.
     """
-    if request.user.role != 'enseignant':
-        return redirect('schoolcopal:login')
-
-    teacher = Enseignant.objects.get(user_id=request.user.id)
-    assigned_class = teacher.classe
+    assigned_class = request.profile.classe
 
     if not assigned_class:
         messages.error(request, _('No class assigned. Contact admin.'))
         return render(request, 'enseignant/dashboard.html', {'title': _('Teacher Dashboard')})
 
     # List of students with all info
-    students = assigned_class.get_eleves().select_related('classe')
-
-    # Number of students
-    total_students = students.count()
+    students = list(assigned_class.get_eleves().select_related('classe').order_by('nom', 'prenom'))
 
     # List of subjects for the class
-    subjects = assigned_class.get_matieres()
+    subjects = list(assigned_class.get_matieres().order_by('nom'))
+
+    # Notes and averages for the whole class, one query each
+    student_ids = [student.id for student in students]
+    notes = loaders.notes_par_eleve(student_ids)
+    averages = loaders.moyennes_par_eleve(student_ids)
+
+    context = _dashboard_context(assigned_class, students, subjects, notes, averages)
+    return render(request, 'enseignant/dashboard.html', context)
+
+@query_budget(10)
+@async_role_required('enseignant')
+async def enseignant_dashboard_async(request):
+    """
+    enseignant_dashboard pour ASGI : élèves et matières, puis notes et moyennes,
+    sont chargés simultanément.
+    """
+    assigned_class = await sync_to_async(lambda: request.profile.classe)()
 
-    # Notes by student, subject, trimestre, and sequence
+    if not assigned_class:
+        messages.error(request, _('No class assigned. Contact admin.'))
+        return await sync_to_async(render)(request, 'enseignant/dashboard.html', {'title': _('Teacher Dashboard')})
+
+    students, subjects = await asyncio.gather(
+        loaders.alist(assigned_class.get_eleves().select_related('classe').order_by('nom', 'prenom')),
+        loaders.alist(assigned_class.get_matieres().order_by('nom')),
+    )
+    student_ids = [student.id for student in students]
+    notes, averages = await asyncio.gather(
+        loaders.anotes_par_eleve(student_ids),
+        loaders.amoyennes_par_eleve(student_ids),
+    )
+
+    context = _dashboard_context(assigned_class, students, subjects, notes, averages)
+    return await sync_to_async(render)(request, 'enseignant/dashboard.html', context)
+
+def _dashboard_context(assigned_class, students, subjects, notes, averages):
+    """Notes par élève, matière et trimestre (ordonnées par séquence), et moyennes."""
+    subjects_by_id = {subject.id: subject for subject in subjects}
     notes_by_student = {}
+    averages_by_student = {}
     for student in students:
-        notes_by_subject = {}
-        for subject in subjects:
-            notes_by_trimester = {}
-            for trimestre in [1,2,3]:
-                notes = Note.objects.filter(
-                    eleve=student, matiere=subject, trimestre=trimestre, deleted_at__isnull=True
-                ).order_by('sequence')
-                notes_by_trimester[trimestre] = notes
-            notes_by_subject[subject] = notes_by_trimester
+        notes_by_subject = {subject: {trimestre: [] for trimestre in loaders.TRIMESTRES} for subject in subjects}
+        for note in notes.get(student.id, []):
+            if note.matiere_id in subjects_by_id:
+                notes_by_subject[subjects_by_id[note.matiere_id]][note.trimestre].append(note)
+        student.notes_by_subject = notes_by_subject
+        student.averages = averages[student.id]
         notes_by_student[student] = notes_by_subject
+        averages_by_student[student] = student.averages
 
-    # Averages by sequence and trimester for each student
-    averages_by_student = {}
-    for student in students:
-        averages = {'by_sequence': {}, 'by_trimester': {}}
-        for trimestre in [1,2,3]:
-            # Average by trimester
-            avg_trimester = student.notes.filter(
-                trimestre=trimestre, deleted_at__isnull=True
-            ).aggregate(avg=models.Avg('valeur'))['avg'] or 0
-            averages['by_trimester'][trimestre] = round(avg_trimester, 2)
-            # Average by sequence
-            for sequence in range(1, 7):
-                avg_sequence = student.notes.filter(
-                    trimestre=trimestre, sequence=sequence, deleted_at__isnull=True
-                ).aggregate(avg=models.Avg('valeur'))['avg'] or 0
-                averages['by_sequence'].setdefault(trimestre, {})[sequence] = round(avg_sequence, 2)
-        averages_by_student[student] = averages
-
-    context = {
+    return {
         'assigned_class': assigned_class,
         'students': students,
-        'total_students': total_students,
+        'total_students': len(students),
         'subjects': subjects,
         'notes_by_student': notes_by_student,
         'averages_by_student': averages_by_student,
         'title': _('Teacher Dashboard'),
     }
-    return render(request, 'enseignant/dashboard.html', context)
 
-class NoteCreateView(CreateView):
+def _notes_de_la_classe(request):
+    """Notes actives de la classe de l'enseignant, dans son école ; aucune sans classe assignée."""
+    classe = request.profile.classe
+    if classe is None:
+        return Note.objects.none()
+    return Note.objects.for_ecole(request.ecole).filter(eleve__classe=classe, deleted_at__isnull=True)
+
+class NoteCreateView(EnseignantRequiredMixin, CreateView):
     """View to add a note for a student."""
     model = Note
     form_class = NoteForm
@@ -85,35 +106,42 @@ class NoteCreateView(CreateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['teacher'] = Enseignant.objects.get(user_id=self.request.user.id)
+        kwargs['teacher'] = self.request.profile.enseignant
         return kwargs
 
     def form_valid(self, form):
         messages.success(self.request, _('Note added successfully.'))
         return super().form_valid(form)
 
-class NoteUpdateView(UpdateView):
+class NoteUpdateView(EnseignantRequiredMixin, UpdateView):
     """View to update a note for a student."""
     model = Note
     form_class = NoteForm
     template_name = 'enseignant/note_form.html'
     success_url = reverse_lazy('schoolcopal:enseignant_dashboard')
 
+    def get_queryset(self):
+        # Only notes of the teacher's own class
+        return _notes_de_la_classe(self.request)
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['teacher'] = Enseignant.objects.get(user_id=self.request.user.id)
+        kwargs['teacher'] = self.request.profile.enseignant
         return kwargs
 
     def form_valid(self, form):
         messages.success(self.request, _('Note updated successfully.'))
         return super().form_valid(form)
 
-class NoteDeleteView(DeleteView):
+class NoteDeleteView(EnseignantRequiredMixin, DeleteView):
     """View to delete a note for a student."""
     model = Note
     template_name = 'enseignant/note_confirm_delete.html'
     success_url = reverse_lazy('schoolcopal:enseignant_dashboard')
 
+    def get_queryset(self):
+        return _notes_de_la_classe(self.request)
+
     def delete(self, request, *args, **kwargs):
         self.object = self.get_object()
         self.object.soft_delete()
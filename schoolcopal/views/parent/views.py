@@ -1,44 +1,137 @@
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import render
 from django.utils.translation import gettext_lazy as _
-from ...models import Eleve, Note
-from django.db.models import Avg
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+from ...mixins import async_role_required, role_required
+from ...models import AnneeScolaire
+from ... import loaders
+from ...profiling import query_budget
 
-@login_required
+@query_budget(10)
+@role_required('parent')
 def parent_dashboard(request):
     """
     Parent dashboard: View all information about their children, notes by subject, and averages by trimester.
     Only accessible if user.role == 'parent'.
     """
-    if request.user.role != 'parent':
-        return redirect('schoolcopal:login')
+    # Children of the parent, resolved once by RoleProfileMiddleware
+    children = request.profile.enfants
+
+    child_ids = [child.id for child in children]
+    subjects_by_class = loaders.matieres_par_classe({child.classe_id for child in children if child.classe_id})
+    notes = loaders.notes_par_eleve(child_ids)
+    averages = loaders.moyennes_par_eleve(child_ids)
+
+    context = {
+        'children_data': _children_data(children, subjects_by_class, notes, averages),
+        'title': _('Parent Dashboard'),
+    }
+    return render(request, 'parent/dashboard.html', context)
 
-    # Get the children of the parent
-    children = Eleve.objects.filter(parent_id=request.user, deleted_at__isnull=True).select_related('classe')
+@query_budget(10)
+@async_role_required('parent')
+async def parent_dashboard_async(request):
+    """parent_dashboard pour ASGI : matières, notes et moyennes chargées simultanément."""
+    children = await sync_to_async(lambda: request.profile.enfants)()
 
+    child_ids = [child.id for child in children]
+    subjects_by_class, notes, averages = await asyncio.gather(
+        loaders.amatieres_par_classe({child.classe_id for child in children if child.classe_id}),
+        loaders.anotes_par_eleve(child_ids),
+        loaders.amoyennes_par_eleve(child_ids),
+    )
+
+    context = {
+        'children_data': _children_data(children, subjects_by_class, notes, averages),
+        'title': _('Parent Dashboard'),
+    }
+    return await sync_to_async(render)(request, 'parent/dashboard.html', context)
+
+def _children_data(children, subjects_by_class, notes, averages):
     children_data = []
     for child in children:
         # Notes by subject
-        notes_by_subject = {}
-        subjects = child.classe.matieres.all() if child.classe else []
-        for subject in subjects:
-            notes = Note.objects.filter(eleve=child, matiere=subject, deleted_at__isnull=True).order_by('trimestre')
-            notes_by_subject[subject] = notes
-
-        # Averages by trimester (using integers 1,2,3)
-        averages = {}
-        for trimestre in [1, 2, 3]:
-            avg = child.notes.filter(trimestre=trimestre, deleted_at__isnull=True).aggregate(avg=Avg('valeur'))['avg'] or 0
-            averages[trimestre] = round(avg, 2)
+        notes_by_subject = {subject: [] for subject in subjects_by_class.get(child.classe_id, [])}
+        by_id = {subject.id: subject for subject in notes_by_subject}
+        for note in notes.get(child.id, []):
+            if note.matiere_id in by_id:
+                notes_by_subject[by_id[note.matiere_id]].append(note)
 
         children_data.append({
             'child': child,
             'notes_by_subject': notes_by_subject,
-            'averages': averages,
+            'averages': averages[child.id]['by_trimester'],
         })
+    return children_data
 
-    context = {
-        'children_data': children_data,
-        'title': _('Parent Dashboard'),
-    }
-    return render(request, 'parent/dashboard.html', context)
+
+# À incrémenter quand la forme du JSON change (invalide les ETag déjà distribués)
+API_VERSION = 1
+
+
+def _api_version(request):
+    """
+    (dernière modification, ETag) des données des enfants du parent,
+    calculés une seule fois par requête, sans construire la réponse.
+    """
+    if not hasattr(request, '_parent_api_version'):
+        children = request.profile.enfants
+        child_ids = [child.id for child in children]
+        modifie, lignes = loaders.derniere_modification(
+            child_ids, {child.classe_id for child in children if child.classe_id}
+        )
+        # Année en cours de chaque école : les données affichées en dépendent
+        annees = [AnneeScolaire.active_id(ecole_id) for ecole_id in sorted({child.ecole_id for child in children})]
+        empreinte = f"{API_VERSION}:{request.user.pk}:{child_ids}:{annees}:{modifie}:{lignes}"
+        request._parent_api_version = (modifie, hashlib.md5(empreinte.encode()).hexdigest())
+    return request._parent_api_version
+
+
+@require_GET
+@gzip_page
+@role_required('parent')
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: _api_version(request)[1],
+    last_modified_func=lambda request: _api_version(request)[0],
+)
+def parent_api(request):
+    """
+    API JSON en lecture seule du portail parent : enfants, notes, moyennes, présences et soldes.
+    Réponses compressées ; ETag/Last-Modified permettent un 304 sans reconstruire le contenu.
+    """
+    children = request.profile.enfants
+    child_ids = [child.id for child in children]
+    subjects_by_class = loaders.matieres_par_classe({child.classe_id for child in children if child.classe_id})
+    notes = loaders.notes_par_eleve(child_ids)
+    averages = loaders.moyennes_par_eleve(child_ids)
+    presences = loaders.frequences_par_eleve(child_ids)
+    soldes = loaders.soldes_par_eleve(child_ids)
+
+    enfants = []
+    for child in children:
+        enfants.append({
+            'id': child.id,
+            'nom': child.nom,
+            'prenom': child.prenom,
+            'date_naissance': child.date_naissance,
+            'classe': str(child.classe) if child.classe_id else None,
+            'matieres': {subject.id: subject.nom for subject in subjects_by_class.get(child.classe_id, [])},
+            'notes': [
+                {'matiere': note.matiere_id, 'trimestre': note.trimestre, 'sequence': note.sequence, 'valeur': note.valeur}
+                for note in notes.get(child.id, [])
+            ],
+            'moyennes': {
+                'trimestres': averages[child.id]['by_trimester'],
+                'sequences': averages[child.id]['by_sequence'],
+            },
+            'presences': presences[child.id],
+            'soldes': soldes[child.id],
+        })
+    return JsonResponse({'enfants': enfants}, json_dumps_params={'separators': (',', ':')})
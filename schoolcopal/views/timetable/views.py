@@ -0,0 +1,55 @@
+from datetime import time
+
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.views.decorators.http import require_GET
+
+from ... import timetable
+from ...mixins import role_required
+
+
+def _heure(value):
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@require_GET
+@role_required('admin', 'directeur', 'enseignant')
+def occupation(request):
+    """
+    Occupation d'une salle (?salle=) ou d'une classe (?classe=) le jour ?jour= à l'heure
+    ?heure= (maintenant par défaut), servie par l'index d'intervalles de l'école.
+    Avec ?fin=, indique si la salle est libre sur tout l'intervalle [heure, fin[.
+    """
+    jour, heure = timetable.maintenant()
+    jour = request.GET.get('jour', jour)
+    heure = _heure(request.GET['heure']) if 'heure' in request.GET else heure
+    fin = _heure(request.GET['fin']) if 'fin' in request.GET else None
+    if heure is None or 'fin' in request.GET and (fin is None or fin <= heure):
+        return HttpResponseBadRequest("Heure invalide.")
+    index = timetable.get_index(request.ecole.pk)
+    debut = timetable.minutes(heure)
+
+    if request.GET.get('salle'):
+        salle = request.GET['salle']
+        if fin is not None:
+            cours = index.overlapping('salle', salle, jour, debut, timetable.minutes(fin))
+        else:
+            cours = [found] if (found := index.at('salle', salle, jour, debut)) else []
+        return JsonResponse({
+            'salle': salle, 'jour': jour, 'heure': heure.strftime('%H:%M'),
+            'libre': not cours, 'cours': [c.as_dict() for c in cours],
+        })
+
+    classe = request.GET.get('classe', '')
+    if request.user.role == 'enseignant':
+        # Un enseignant ne consulte que sa propre classe
+        classe = str(request.profile.classe_id or '')
+    if not classe.isdigit():
+        return HttpResponseBadRequest("Paramètre salle ou classe requis.")
+    cours = index.at('classe', int(classe), jour, debut)
+    return JsonResponse({
+        'classe': int(classe), 'jour': jour, 'heure': heure.strftime('%H:%M'),
+        'cours': cours.as_dict() if cours else None,
+    })
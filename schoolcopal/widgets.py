@@ -0,0 +1,42 @@
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    <select> qui ne rend que l'option sélectionnée : les autres choix sont chargés
+    à la demande depuis l'endpoint schoolcopal:autocomplete (js/autocomplete.js).
+    Le rendu du formulaire ne dépend donc plus de la taille de la table ;
+    la validation reste celle du queryset du ModelChoiceField.
+    """
+
+    class Media:
+        js = ['js/autocomplete.js']
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = reverse('schoolcopal:autocomplete', args=[self.kind])
+        return context
+
+    def selected_choices(self, value):
+        """(pk, libellé) des seules valeurs sélectionnées, en une requête."""
+        queryset = getattr(self.choices, 'queryset', None)
+        values = [v for v in value if v not in ('', None)]
+        if queryset is None or not values:
+            return []
+        try:
+            return [(obj.pk, str(obj)) for obj in queryset.filter(pk__in=values)]
+        except (ValueError, TypeError):
+            return []
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        self.choices = [('', '---------')] + self.selected_choices(value)
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
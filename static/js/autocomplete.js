@@ -0,0 +1,70 @@
+// Autocomplétion des <select data-autocomplete-url> (schoolcopal/widgets.py) :
+// un champ de recherche charge les choix par pages depuis l'endpoint JSON.
+(function () {
+    "use strict";
+
+    const DELAY = 250;
+
+    function setup(select) {
+        const url = select.dataset.autocompleteUrl;
+        const input = document.createElement("input");
+        input.type = "search";
+        input.placeholder = "Rechercher…";
+        input.className = select.className;
+        input.autocomplete = "off";
+        const more = document.createElement("a");
+        more.href = "#";
+        more.textContent = "Plus de résultats…";
+        more.hidden = true;
+        select.before(input);
+        select.after(more);
+
+        let next = null;
+        let timer = null;
+        let controller = null;
+
+        function load(cursor) {
+            const params = new URLSearchParams({ q: input.value.trim() });
+            if (cursor) params.set("cursor", cursor);
+            if (controller) controller.abort();
+            controller = new AbortController();
+            fetch(`${url}?${params}`, { credentials: "same-origin", signal: controller.signal })
+                .then((response) => (response.ok ? response.json() : { results: [], next: null }))
+                .then((data) => render(data, Boolean(cursor)))
+                .catch(() => {});
+        }
+
+        function render(data, append) {
+            const selected = select.value;
+            if (!append) {
+                // Conserve l'option vide et la valeur sélectionnée
+                for (const option of Array.from(select.options)) {
+                    if (option.value && option.value !== selected) option.remove();
+                }
+            }
+            for (const item of data.results) {
+                if (String(item.id) === selected) continue;
+                select.add(new Option(item.text, item.id));
+            }
+            next = data.next;
+            more.hidden = !next;
+        }
+
+        input.addEventListener("input", () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => load(null), DELAY);
+        });
+        more.addEventListener("click", (event) => {
+            event.preventDefault();
+            if (next) load(next);
+        });
+        select.addEventListener("focus", function first() {
+            select.removeEventListener("focus", first);
+            load(null);
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", () => {
+        document.querySelectorAll("select[data-autocomplete-url]").forEach(setup);
+    });
+})();